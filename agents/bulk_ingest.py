@@ -0,0 +1,206 @@
+import io
+import json
+import os
+import zipfile
+from pathlib import Path
+
+from agents.scraping_agent import ScrapingAgent
+
+_WHITESPACE = " \t\n\r"
+
+
+class JSONArrayStream:
+    """
+    Incremental reader for `{"meta": {...}, "results": [ ... ]}` documents,
+    the layout of the OpenFDA bulk download files.
+
+    Top-level values other than `key` are decoded and discarded; elements of
+    the `key` array are yielded one at a time. Only the current read buffer
+    and one element are held in memory.
+    """
+
+    def __init__(self, stream, key="results", buffer_size=1 << 16):
+        self.stream = stream
+        self.key = key
+        self.buffer_size = buffer_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.buffer_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop the consumed prefix so the buffer never grows with the file
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return None
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos}")
+        self.pos += 1
+
+    def _decode_value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # Value cut by the end of the buffer: read more and retry
+                if not self._fill():
+                    raise
+                continue
+            # A number at the very end of the buffer may be incomplete
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def __iter__(self):
+        self._expect("{")
+        if self._peek() == "}":
+            return
+
+        while True:
+            name = self._decode_value()
+            self._expect(":")
+
+            if name == self.key and self._peek() == "[":
+                self.pos += 1
+                if self._peek() == "]":
+                    self.pos += 1
+                else:
+                    while True:
+                        yield self._decode_value()
+                        sep = self._peek()
+                        self.pos += 1
+                        if sep == "]":
+                            break
+                        if sep != ",":
+                            raise ValueError(f"Malformed array near offset {self.pos}")
+            else:
+                self._decode_value()
+
+            sep = self._peek()
+            self.pos += 1
+            if sep == "}":
+                return
+            if sep != ",":
+                raise ValueError(f"Malformed object near offset {self.pos}")
+
+
+class ChunkedStore:
+    """
+    Directory of JSONL parts (part-00000.jsonl, ...) of at most
+    `chunk_size` records each, plus a manifest written when ingestion ends.
+    Records are written as they come; nothing is buffered across chunks.
+    """
+
+    def __init__(self, out_dir, chunk_size=10000):
+        self.out_dir = Path(out_dir)
+        self.chunk_size = chunk_size
+        self.parts = []
+        self._file = None
+        self._count_in_part = 0
+        self.total = 0
+
+    def __enter__(self):
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        return self
+
+    def _roll(self):
+        if self._file is not None:
+            self._file.close()
+            self.parts[-1]["count"] = self._count_in_part
+        name = f"part-{len(self.parts):05d}.jsonl"
+        self._file = open(self.out_dir / name, "w", encoding="utf-8")
+        self.parts.append({"file": name, "count": 0})
+        self._count_in_part = 0
+
+    def write(self, record):
+        if self._file is None or self._count_in_part >= self.chunk_size:
+            self._roll()
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._count_in_part += 1
+        self.total += 1
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._file is not None:
+            self._file.close()
+            self.parts[-1]["count"] = self._count_in_part
+
+        if exc_type is None:
+            manifest = {"total": self.total, "chunk_size": self.chunk_size, "parts": self.parts}
+            tmp = self.out_dir / "manifest.json.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=4)
+            os.replace(tmp, self.out_dir / "manifest.json")
+
+    @staticmethod
+    def iter_records(out_dir):
+        """
+        Streams records back from a finished store, part by part.
+        """
+        out_dir = Path(out_dir)
+        with open(out_dir / "manifest.json", "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        for part in manifest["parts"]:
+            with open(out_dir / part["file"], "r", encoding="utf-8") as f:
+                for line in f:
+                    yield json.loads(line)
+
+
+def iter_bulk_labels(zip_path):
+    """
+    Yields raw label dicts from an OpenFDA bulk export
+    (e.g. drug-label-0001-of-0013.json.zip), one at a time.
+    """
+    with zipfile.ZipFile(zip_path) as archive:
+        for member in archive.namelist():
+            if not member.endswith(".json"):
+                continue
+            with archive.open(member) as raw:
+                text = io.TextIOWrapper(raw, encoding="utf-8")
+                yield from JSONArrayStream(text)
+
+
+def ingest_bulk(zip_paths, out_dir="data/raw/bulk", chunk_size=10000):
+    """
+    Streams every label of the given bulk files through the same projection
+    as ScrapingAgent.fetch_paginated and writes the records to a chunked
+    store. Labels without a brand name are skipped. Duplicate brands are
+    kept in file order; readers building a dict get last-wins semantics,
+    like fetch_paginated.
+    """
+    seen = skipped = 0
+    with ChunkedStore(out_dir, chunk_size) as store:
+        for zip_path in zip_paths:
+            print(f"[Bulk] Reading {zip_path}...")
+            for entry in iter_bulk_labels(zip_path):
+                seen += 1
+                projected = ScrapingAgent.project(entry)
+                if projected is None:
+                    skipped += 1
+                    continue
+                store.write(projected[1])
+
+                if seen % 50000 == 0:
+                    print(f"[Bulk] {seen} labels read, {store.total} kept")
+
+    print(f"[Bulk] Done: {seen} labels, {store.total} kept, {skipped} without brand name, "
+          f"{len(store.parts)} parts in {out_dir}")
+    return store.total
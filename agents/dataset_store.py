@@ -0,0 +1,249 @@
+import hashlib
+import json
+import mmap
+import struct
+from collections.abc import Mapping
+
+MAGIC = b"MEDSTOR2"
+
+# Fields the TF-IDF index and the recommendations read: decoded when the
+# store opens. Everything else is decoded per drug, on demand.
+EAGER_FIELDS = ("name", "symptoms", "category", "tags", "clean_indications")
+
+_KEY_FIELD = "__key__"
+
+_MISSING = object()
+
+
+def _encode_field(values):
+    """
+    Encodes one column. Returns (header info, offsets bytes, blob bytes).
+
+    str columns: UTF-8 values back to back, offsets[i]..offsets[i+1].
+    json columns: a JSON array "[v0,v1,...]"; offsets[i] is where element
+    i starts, so it spans offsets[i]..offsets[i+1]-1 (the comma or "]").
+    """
+    present = [v for v in values if v is not _MISSING]
+    kind = "str" if all(isinstance(v, str) for v in present) else "json"
+    missing = [row for row, v in enumerate(values) if v is _MISSING]
+
+    offsets, chunks = [], []
+    if kind == "str":
+        pos = 0
+        for v in values:
+            encoded = b"" if v is _MISSING else v.encode("utf-8")
+            offsets.append(pos)
+            chunks.append(encoded)
+            pos += len(encoded)
+        offsets.append(pos)
+        blob = b"".join(chunks)
+    else:
+        pos = 1
+        for v in values:
+            encoded = json.dumps(None if v is _MISSING else v, ensure_ascii=False).encode("utf-8")
+            offsets.append(pos)
+            chunks.append(encoded)
+            pos += len(encoded) + 1
+        offsets.append(pos)
+        blob = b"[" + b",".join(chunks) + b"]"
+
+    info = {"type": kind, "ascii": blob.isascii(), "missing": missing}
+    return info, struct.pack(f"<{len(offsets)}Q", *offsets), blob
+
+
+def convert_json(json_path, store_path):
+    """
+    Converts a {name: record} JSON dataset into the binary store format:
+    MAGIC, uint64 header length, JSON header, then per field an array of
+    n+1 uint64 offsets followed by the field's values (see _encode_field).
+
+    The header keeps the SHA-256 of the source JSON so index snapshots
+    built from either file are interchangeable.
+    """
+    with open(json_path, "rb") as f:
+        raw = f.read()
+    data = json.loads(raw)
+
+    fields = []
+    for entry in data.values():
+        for field in entry:
+            if field not in fields:
+                fields.append(field)
+
+    sections = [(_KEY_FIELD,) + _encode_field(list(data.keys()))]
+    for field in fields:
+        values = [entry.get(field, _MISSING) for entry in data.values()]
+        sections.append((field,) + _encode_field(values))
+
+    header = {
+        "count": len(data),
+        "source_sha256": hashlib.sha256(raw).hexdigest(),
+        "fields": {},
+    }
+    cursor = 0
+    for field, info, offsets, blob in sections:
+        header["fields"][field] = dict(info, offsets=cursor, blob=cursor + len(offsets), length=len(blob))
+        cursor += len(offsets) + len(blob)
+        cursor += -cursor % 8     # keep offset arrays 8-byte aligned
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    header_bytes += b" " * (-(len(MAGIC) + 8 + len(header_bytes)) % 8)
+
+    with open(store_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for field, info, offsets, blob in sections:
+            f.write(offsets)
+            f.write(blob)
+            f.write(b"\0" * (-(len(offsets) + len(blob)) % 8))
+
+    return header
+
+
+class LazyRecord(Mapping):
+    """
+    One medication backed by the store: eager fields come from memory,
+    the others are decoded from the mapped file on access.
+    """
+
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store, row):
+        self._store = store
+        self._row = row
+
+    def __getitem__(self, field):
+        value = self._store._value(field, self._row)
+        if value is _MISSING:
+            raise KeyError(field)
+        return value
+
+    def __iter__(self):
+        for field in self._store.fields:
+            if self._store._value(field, self._row) is not _MISSING:
+                yield field
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"LazyRecord({self._store.keys_list[self._row]!r})"
+
+
+class MedicationStore(Mapping):
+    """
+    Read-only {name: record} mapping over a file written by convert_json().
+
+    The file is memory-mapped. Fields in `eager` are decoded when the store
+    opens; all other fields are decoded per record, on demand.
+    """
+
+    def __init__(self, path, eager=EAGER_FIELDS):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"[Store] Not a medication store: {path}")
+        (header_len,) = struct.unpack_from("<Q", self._mm, len(MAGIC))
+        start = len(MAGIC) + 8
+        self.header = json.loads(self._mm[start:start + header_len])
+        self._base = start + header_len
+
+        self.count = self.header["count"]
+        self.source_sha256 = self.header["source_sha256"]
+        self.fields = [f for f in self.header["fields"] if f != _KEY_FIELD]
+        self._missing = {
+            field: set(info["missing"]) for field, info in self.header["fields"].items()
+        }
+
+        self._offsets = {}
+        for field, info in self.header["fields"].items():
+            at = self._base + info["offsets"]
+            self._offsets[field] = memoryview(self._mm)[at:at + 8 * (self.count + 1)].cast("Q")
+
+        self.keys_list = self._decode_column(_KEY_FIELD)
+        self._rows = {key: row for row, key in enumerate(self.keys_list)}
+        self._eager = {
+            field: self._decode_column(field)
+            for field in eager if field in self.header["fields"]
+        }
+
+    def _blob(self, field):
+        info = self.header["fields"][field]
+        at = self._base + info["blob"]
+        return self._mm[at:at + info["length"]]
+
+    def _decode_column(self, field):
+        info = self.header["fields"][field]
+        offsets = self._offsets[field].tolist()
+
+        if info["type"] == "json":
+            values = json.loads(self._blob(field))
+        elif info["ascii"]:
+            # Byte offsets are character offsets: one decode, then slices
+            text = self._blob(field).decode("ascii")
+            values = [text[offsets[i]:offsets[i + 1]] for i in range(self.count)]
+        else:
+            blob = self._blob(field)
+            values = [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(self.count)]
+
+        for row in info["missing"]:
+            values[row] = _MISSING
+        return values
+
+    def _value(self, field, row):
+        column = self._eager.get(field)
+        if column is not None:
+            return column[row]
+
+        info = self.header["fields"].get(field)
+        if info is None or row in self._missing[field]:
+            return _MISSING
+
+        offsets = self._offsets[field]
+        at = self._base + info["blob"]
+        if info["type"] == "json":
+            return json.loads(self._mm[at + offsets[row]:at + offsets[row + 1] - 1])
+        return self._mm[at + offsets[row]:at + offsets[row + 1]].decode("utf-8")
+
+    def __getitem__(self, key):
+        return LazyRecord(self, self._rows[key])
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def __iter__(self):
+        return iter(self.keys_list)
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        for view in self._offsets.values():
+            view.release()
+        self._offsets = {}
+        self._mm.close()
+        self._file.close()
+
+
+def is_store(path):
+    return str(path).endswith(".medstore")
+
+
+def load_dataset(path, eager=EAGER_FIELDS):
+    """
+    Opens a dataset, JSON or binary store. Returns (data, sha256 of the
+    source JSON), the hash being what index snapshots are keyed on.
+    """
+    if is_store(path):
+        store = MedicationStore(path, eager=eager)
+        return store, store.source_sha256
+
+    with open(path, "rb") as f:
+        raw = f.read()
+    return json.loads(raw), hashlib.sha256(raw).hexdigest()
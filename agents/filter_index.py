@@ -0,0 +1,257 @@
+import bisect
+import json
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+# Nom utilisable dans une expression -> champ du dataset
+FIELDS = {
+    "category": "category",
+    "tag": "tags",
+    "tags": "tags",
+    "substance": "substance_name",
+    "substance_name": "substance_name",
+}
+
+TOKEN = re.compile(
+    r'\s*(?:(?P<paren>[()])'
+    r'|(?P<field>[A-Za-z_]+):(?:"(?P<quoted>[^"]*)"|(?P<bare>[^\s()"]+))'
+    r'|(?P<op>AND|OR|NOT)(?=[\s()]|$)'
+    r'|(?P<minus>-)'
+    r'|(?P<other>\S+))',
+    re.IGNORECASE
+)
+
+
+def normalize_value(value):
+    return " ".join(str(value).lower().split())
+
+
+def field_values(entry, field):
+    """
+    Normalized filter values of one medication for a dataset field.
+    """
+    raw = entry.get(field)
+    if not raw:
+        return set()
+    if field == "tags":
+        return {normalize_value(tag) for tag in raw if tag}
+    values = {normalize_value(raw)}
+    if field == "substance_name":
+        # "ZINC OXIDE, OCTINOXATE" : chaque partie compte aussi
+        # (ainsi que "MENTHOL" pour "MENTHOL, UNSPECIFIED FORM")
+        values.update(normalize_value(part) for part in str(raw).split(",") if part.strip())
+    return values
+
+
+def parse(expression):
+    """
+    Parses a filter expression into a hashable tree.
+
+        category:allergy tag:fever              implicit AND
+        category:"cold & flu" OR tag:cough
+        NOT category:homeopathic                also: -category:homeopathic
+        substance:ibuprofen* (tag:pain OR tag:fever)
+
+    Values are case-insensitive; a trailing * matches every value with
+    that prefix. Raises ValueError on syntax errors or unknown fields.
+    """
+    tokens = []
+    for match in TOKEN.finditer(expression):
+        kind = match.lastgroup
+        if kind in ("quoted", "bare"):
+            kind = "field"
+        if kind == "other":
+            raise ValueError(f"[Filter] Unexpected '{match.group('other')}' in filter "
+                             f"(expected field:value, AND, OR, NOT or parentheses)")
+        tokens.append((kind, match))
+
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else (None, None)
+
+    def advance():
+        nonlocal position
+        position += 1
+        return tokens[position - 1]
+
+    def parse_or():
+        nodes = [parse_and()]
+        while peek()[0] == "op" and peek()[1].group("op").upper() == "OR":
+            advance()
+            nodes.append(parse_and())
+        return nodes[0] if len(nodes) == 1 else ("or",) + tuple(nodes)
+
+    def parse_and():
+        nodes = [parse_not()]
+        while True:
+            kind, match = peek()
+            if kind == "op" and match.group("op").upper() == "AND":
+                advance()
+            elif kind is None or kind == "op" and match.group("op").upper() == "OR" \
+                    or kind == "paren" and match.group("paren") == ")":
+                break
+            nodes.append(parse_not())
+        return nodes[0] if len(nodes) == 1 else ("and",) + tuple(nodes)
+
+    def parse_not():
+        kind, match = peek()
+        if kind == "minus" or kind == "op" and match.group("op").upper() == "NOT":
+            advance()
+            return ("not", parse_not())
+        return parse_atom()
+
+    def parse_atom():
+        kind, match = peek()
+        if kind is None:
+            raise ValueError("[Filter] Unexpected end of filter")
+        advance()
+        if kind == "paren" and match.group("paren") == "(":
+            node = parse_or()
+            kind, match = peek()
+            if kind != "paren" or match.group("paren") != ")":
+                raise ValueError("[Filter] Missing ')'")
+            advance()
+            return node
+        if kind != "field":
+            raise ValueError(f"[Filter] Unexpected '{match.group().strip()}'")
+
+        name = match.group("field").lower()
+        if name not in FIELDS:
+            raise ValueError(f"[Filter] Unknown field '{name}' (expected one of {', '.join(sorted(FIELDS))})")
+        value = match.group("quoted") if match.group("quoted") is not None else match.group("bare")
+        prefix = value.endswith("*")
+        value = normalize_value(value.rstrip("*"))
+        if not value and not prefix:
+            raise ValueError(f"[Filter] Empty value for '{name}'")
+        return ("term", FIELDS[name], value, prefix)
+
+    if not tokens:
+        raise ValueError("[Filter] Empty filter")
+    tree = parse_or()
+    if position != len(tokens):
+        raise ValueError(f"[Filter] Unexpected '{tokens[position][1].group().strip()}'")
+    return tree
+
+
+class FilterIndex:
+    """
+    Posting lists over the metadata fields used to restrict a search:
+    category, tags and substance_name.
+
+    For every (field, value) the sorted row numbers of the medications
+    carrying that value are stored once, at index time; an expression is
+    evaluated into a boolean row mask (AND / OR / NOT on bitmaps) before
+    any document is scored. Masks of recent expressions are cached.
+
+    Layout inside the TF-IDF snapshot directory:
+        filters.json   {field: {value: [start, end]}} into filter_rows.npy
+        filter_rows.npy  concatenated posting lists (int32)
+    """
+
+    MASK_CACHE_SIZE = 64
+
+    def __init__(self, postings, rows, n_docs):
+        self.postings = postings        # field -> {value: (start, end)}
+        self.rows = rows
+        self.n_docs = n_docs
+        self._sorted_values = {field: sorted(values) for field, values in postings.items()}
+        self._masks = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, data):
+        lists = {field: {} for field in set(FIELDS.values())}
+        for row, entry in enumerate(data.values()):
+            for field, by_value in lists.items():
+                for value in field_values(entry, field):
+                    by_value.setdefault(value, []).append(row)
+
+        postings, chunks, offset = {}, [], 0
+        for field, by_value in lists.items():
+            postings[field] = {}
+            for value, ids in by_value.items():
+                postings[field][value] = (offset, offset + len(ids))
+                chunks.append(ids)
+                offset += len(ids)
+
+        rows = np.fromiter((row for ids in chunks for row in ids), dtype=np.int32, count=offset)
+        return cls(postings, rows, len(data))
+
+    def save(self, index_dir):
+        index_dir = Path(index_dir)
+        np.save(index_dir / "filter_rows.npy", self.rows)
+        with open(index_dir / "filters.json", "w", encoding="utf-8") as f:
+            json.dump({"n_docs": self.n_docs, "postings": self.postings}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, index_dir, mmap=True):
+        index_dir = Path(index_dir)
+        with open(index_dir / "filters.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        rows = np.load(index_dir / "filter_rows.npy", mmap_mode="r" if mmap else None)
+        postings = {
+            field: {value: tuple(span) for value, span in values.items()}
+            for field, values in meta["postings"].items()
+        }
+        return cls(postings, rows, meta["n_docs"])
+
+    def values(self, field):
+        """
+        Known values of a field (for help texts and autocompletion).
+        """
+        return list(self._sorted_values.get(FIELDS.get(field, field), []))
+
+    def _term_rows(self, field, value, prefix):
+        spans = self.postings.get(field, {})
+        if not prefix:
+            span = spans.get(value)
+            return [self.rows[span[0]:span[1]]] if span else []
+
+        values = self._sorted_values.get(field, [])
+        first = bisect.bisect_left(values, value)
+        matched = []
+        for v in values[first:]:
+            if not v.startswith(value):
+                break
+            start, end = spans[v]
+            matched.append(self.rows[start:end])
+        return matched
+
+    def _evaluate(self, node):
+        kind = node[0]
+        if kind == "term":
+            mask = np.zeros(self.n_docs, dtype=bool)
+            for rows in self._term_rows(*node[1:]):
+                mask[rows] = True
+            return mask
+        if kind == "not":
+            return ~self._evaluate(node[1])
+
+        masks = [self._evaluate(child) for child in node[1:]]
+        combine = np.logical_and if kind == "and" else np.logical_or
+        return combine.reduce(masks)
+
+    def mask(self, expression):
+        """
+        Boolean row mask of the medications matching `expression` (a string
+        or an already parsed tree). The returned array is read-only.
+        """
+        tree = parse(expression) if isinstance(expression, str) else expression
+        with self._lock:
+            mask = self._masks.get(tree)
+            if mask is not None:
+                self._masks.move_to_end(tree)
+                return mask
+
+        mask = self._evaluate(tree)
+        mask.flags.writeable = False
+        with self._lock:
+            self._masks[tree] = mask
+            while len(self._masks) > self.MASK_CACHE_SIZE:
+                self._masks.popitem(last=False)
+        return mask
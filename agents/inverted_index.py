@@ -0,0 +1,115 @@
+import numpy as np
+
+from agents.tfidf_index import top_k_indices
+
+
+class InvertedIndex:
+    """
+    Posting-list view of a TF-IDF matrix.
+
+    For each term we keep the sorted ids of the documents containing it, the
+    matching TF-IDF weights and the maximum weight of the list. A query only
+    touches the postings of its own terms, and MaxScore pruning stops adding
+    new candidates once the remaining terms can no longer lift an unseen
+    document into the top-k.
+
+    Scores are the same dot products as the brute-force path (documents are
+    L2-normalised), and ties are broken by lowest row index, so results match
+    RAGSearchAgent's default backend.
+    """
+
+    def __init__(self, tfidf_matrix):
+        csc = tfidf_matrix.tocsc()
+        csc.sort_indices()
+
+        self.n_docs = csc.shape[0]
+        self.indptr = csc.indptr
+        self.doc_ids = csc.indices
+        self.weights = csc.data
+
+        lengths = np.diff(self.indptr)
+        self.max_weights = np.zeros(csc.shape[1], dtype=np.float64)
+        non_empty = lengths > 0
+        if non_empty.any():
+            self.max_weights[non_empty] = np.maximum.reduceat(
+                self.weights, self.indptr[:-1][non_empty]
+            )
+
+    def postings(self, term):
+        start, end = self.indptr[term], self.indptr[term + 1]
+        return self.doc_ids[start:end], self.weights[start:end]
+
+    def top_k(self, query_vec, k, allowed=None):
+        """
+        Returns (doc_indices, scores) of the k best documents for a 1-row
+        sparse query vector, best first.
+
+        `allowed` (boolean mask over documents, see agents.filter_index)
+        drops the other documents from the postings before they are scored.
+        """
+        terms = query_vec.indices
+        query_weights = query_vec.data
+        k = min(k, self.n_docs if allowed is None else int(np.count_nonzero(allowed)))
+        if k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float64)
+
+        # Termes par borne supérieure décroissante (MaxScore)
+        upper_bounds = query_weights * self.max_weights[terms]
+        order = np.argsort(-upper_bounds, kind="stable")
+        terms, query_weights, upper_bounds = terms[order], query_weights[order], upper_bounds[order]
+        # remaining[i] = best score an unseen doc can get from terms i..end
+        remaining = np.concatenate([np.cumsum(upper_bounds[::-1])[::-1], [0.0]])
+
+        candidates = np.empty(0, dtype=self.doc_ids.dtype)
+        partial = np.empty(0, dtype=np.float64)
+        threshold = -np.inf
+
+        for i, term in enumerate(terms):
+            docs, weights = self.postings(term)
+            if allowed is not None:
+                # Les bornes MaxScore restent valides (seulement moins serrées)
+                keep = allowed[docs]
+                docs, weights = docs[keep], weights[keep]
+            if len(docs) == 0:
+                continue
+            contributions = query_weights[i] * weights
+
+            if len(candidates) >= k and remaining[i] < threshold:
+                # Plus aucun document non vu ne peut entrer dans le top-k :
+                # on complète seulement les scores des candidats restants.
+                pos = np.searchsorted(docs, candidates)
+                pos = np.minimum(pos, len(docs) - 1)
+                hit = docs[pos] == candidates
+                partial[hit] += contributions[pos[hit]]
+
+                # Candidats qui ne peuvent plus atteindre le seuil
+                threshold = np.partition(partial, len(partial) - k)[len(partial) - k]
+                keep = partial + remaining[i + 1] >= threshold
+                candidates, partial = candidates[keep], partial[keep]
+                continue
+
+            merged = np.concatenate([candidates, docs])
+            candidates, inverse = np.unique(merged, return_inverse=True)
+            partial = np.bincount(
+                inverse,
+                weights=np.concatenate([partial, contributions]),
+                minlength=len(candidates)
+            )
+
+            if len(candidates) >= k:
+                threshold = np.partition(partial, len(partial) - k)[len(partial) - k]
+
+        selected = top_k_indices(partial, k)
+        indices = candidates[selected]
+        scores = partial[selected]
+
+        if len(indices) < k:
+            # Moins de k documents partagent un terme : on complète avec des
+            # scores nuls dans l'ordre des lignes, comme la recherche exhaustive.
+            need = k - len(indices)
+            pool = np.arange(need + len(candidates)) if allowed is None else np.flatnonzero(allowed)
+            fill = np.setdiff1d(pool, candidates)[:need]
+            indices = np.concatenate([indices, fill])
+            scores = np.concatenate([scores, np.zeros(need)])
+
+        return indices, scores
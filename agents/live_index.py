@@ -0,0 +1,335 @@
+import threading
+from collections import Counter
+from collections.abc import Mapping
+
+import numpy as np
+from scipy.sparse import csr_matrix, vstack
+from sklearn.feature_extraction.text import CountVectorizer
+
+from agents.tfidf_index import VECTORIZER_PARAMS, document_text, top_k_indices
+
+
+def _widen(matrix, n_cols):
+    """
+    Same CSR arrays with more (empty) columns; no copy.
+    """
+    if matrix.shape[1] == n_cols:
+        return matrix
+    return csr_matrix((matrix.data, matrix.indices, matrix.indptr),
+                      shape=(matrix.shape[0], n_cols), copy=False)
+
+
+class _Segment:
+    """
+    Raw term counts for a block of rows, plus the matching names/entries.
+    `alive` marks rows that have not been deleted or replaced.
+    """
+
+    def __init__(self, counts, names, entries, alive=None):
+        self.counts = counts
+        self.names = names
+        self.entries = entries
+        self.alive = alive if alive is not None else np.ones(len(names), dtype=bool)
+
+    def __len__(self):
+        return len(self.names)
+
+
+class _IndexState:
+    """
+    Immutable view of the index. Writers build a new state and swap it in,
+    so a search always sees one consistent version.
+    """
+
+    def __init__(self, base, delta, positions, df, version):
+        self.base = base
+        self.delta = delta
+        self.positions = positions   # name -> (segment, row)
+        self.df = df
+        self.version = version
+        self.n_docs = int(base.alive.sum() + delta.alive.sum())
+        self._norms = None
+
+    @property
+    def n_terms(self):
+        return len(self.df)
+
+    def idf(self):
+        # Same formula as TfidfVectorizer(smooth_idf=True)
+        return np.log((1 + self.n_docs) / (1 + self.df)) + 1
+
+    def norms(self, idf):
+        # Calculées une seule fois par version de l'index
+        if self._norms is None:
+            squared = idf ** 2
+            self._norms = tuple(
+                np.sqrt(_widen(seg.counts, self.n_terms).multiply(
+                    _widen(seg.counts, self.n_terms)) @ squared)
+                for seg in (self.base, self.delta)
+            )
+        return self._norms
+
+
+class LiveEntries(Mapping):
+    """
+    Read-only name -> entry view of a LiveTfidfIndex: always the current
+    version, without a second copy of the data to keep in sync.
+    """
+
+    def __init__(self, index):
+        self._index = index
+
+    def __getitem__(self, name):
+        state = self._index._state
+        seg_id, row = state.positions[name]
+        return (state.base, state.delta)[seg_id].entries[row]
+
+    def __contains__(self, name):
+        return name in self._index._state.positions
+
+    def __iter__(self):
+        # positions n'est jamais modifié sur place : itération sûre
+        return iter(self._index._state.positions)
+
+    def __len__(self):
+        return len(self._index._state.positions)
+
+
+class LiveTfidfIndex:
+    """
+    TF-IDF index that supports upserts and deletes without a full refit.
+
+    Raw term counts are kept instead of normalised TF-IDF rows. Document
+    frequencies are updated on every change and IDF weights and document
+    norms are derived from them, so scores are identical to refitting a
+    TfidfVectorizer on the current documents. New or updated drugs are
+    appended to a small delta segment; old rows are tombstoned. compact()
+    folds the delta into the base segment, in a background thread when
+    the delta grows past `compact_threshold`.
+    """
+
+    def __init__(self, data, compact_threshold=1024):
+        self.compact_threshold = compact_threshold
+        self._analyzer = CountVectorizer(**VECTORIZER_PARAMS).build_analyzer()
+        self._write_lock = threading.Lock()
+        self._compaction = None
+
+        counter = CountVectorizer(**VECTORIZER_PARAMS)
+        names = list(data.keys())
+        if names:
+            counts = counter.fit_transform([document_text(e) for e in data.values()]).tocsr()
+            # Append-only vocabulary: columns are never reassigned
+            self.vocabulary = dict(counter.vocabulary_)
+        else:
+            counts = csr_matrix((0, 0), dtype=np.int64)
+            self.vocabulary = {}
+
+        df = np.bincount(counts.indices, minlength=counts.shape[1]).astype(np.int64)
+        base = _Segment(counts, names, [data[n] for n in names])
+        delta = _Segment(csr_matrix((0, counts.shape[1]), dtype=counts.dtype), [], [])
+        positions = {name: (0, row) for row, name in enumerate(names)}
+
+        self._state = _IndexState(base, delta, positions, df, version=0)
+
+    @property
+    def version(self):
+        return self._state.version
+
+    @property
+    def entries(self):
+        return LiveEntries(self)
+
+    def __len__(self):
+        return self._state.n_docs
+
+    def __contains__(self, name):
+        return name in self._state.positions
+
+    def analyze(self, text):
+        """
+        Terms of `text` as the index counts them, known to it or not.
+        """
+        return self._analyzer(text)
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+    def _count_row(self, entry):
+        counts = Counter(self._analyzer(document_text(entry)))
+        cols = []
+        for term in counts:
+            col = self.vocabulary.get(term)
+            if col is None:
+                col = len(self.vocabulary)
+                self.vocabulary[term] = col
+            cols.append(col)
+        order = np.argsort(cols)
+        indices = np.asarray(cols, dtype=np.int32)[order]
+        values = np.asarray(list(counts.values()), dtype=np.int64)[order]
+        return indices, values
+
+    @staticmethod
+    def _tombstone(state, name, df, segments):
+        seg_id, row = state.positions[name]
+        seg = segments[seg_id]
+        alive = seg.alive.copy()
+        alive[row] = False
+        segments[seg_id] = _Segment(seg.counts, seg.names, seg.entries, alive)
+
+        start, end = seg.counts.indptr[row], seg.counts.indptr[row + 1]
+        df[seg.counts.indices[start:end]] -= 1
+
+    def upsert(self, name, entry):
+        """
+        Adds a drug, or replaces it if the name already exists.
+        """
+        with self._write_lock:
+            state = self._state
+            indices, values = self._count_row(entry)
+
+            n_terms = len(self.vocabulary)
+            df = np.zeros(n_terms, dtype=np.int64)
+            df[:state.n_terms] = state.df
+            segments = [state.base, state.delta]
+
+            if name in state.positions:
+                self._tombstone(state, name, df, segments)
+            df[indices] += 1
+
+            row = csr_matrix((values, indices, [0, len(indices)]), shape=(1, n_terms))
+            delta = segments[1]
+            delta_counts = vstack([_widen(delta.counts, n_terms), row], format="csr")
+            segments[1] = _Segment(
+                delta_counts,
+                delta.names + [name],
+                delta.entries + [entry],
+                np.append(delta.alive, True)
+            )
+
+            positions = dict(state.positions)
+            positions[name] = (1, len(delta))
+
+            self._state = _IndexState(segments[0], segments[1], positions, df, state.version + 1)
+
+        self._maybe_compact()
+
+    def remove(self, name):
+        """
+        Deletes a drug. Returns False if it was not indexed.
+        """
+        with self._write_lock:
+            state = self._state
+            if name not in state.positions:
+                return False
+
+            df = state.df.copy()
+            segments = [state.base, state.delta]
+            self._tombstone(state, name, df, segments)
+
+            positions = dict(state.positions)
+            del positions[name]
+
+            self._state = _IndexState(segments[0], segments[1], positions, df, state.version + 1)
+
+        self._maybe_compact()
+        return True
+
+    # ------------------------------------------------------------------
+    # Compaction
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _compacted(state):
+        segments = (state.base, state.delta)
+        n_terms = state.n_terms
+
+        counts = vstack([_widen(seg.counts, n_terms) for seg in segments], format="csr")
+        alive = np.concatenate([seg.alive for seg in segments])
+        names = [n for seg in segments for n, ok in zip(seg.names, seg.alive) if ok]
+        entries = [e for seg in segments for e, ok in zip(seg.entries, seg.alive) if ok]
+
+        base = _Segment(counts[np.flatnonzero(alive)], names, entries)
+        delta = _Segment(csr_matrix((0, n_terms), dtype=counts.dtype), [], [])
+        positions = {name: (0, row) for row, name in enumerate(names)}
+
+        # Same version: compaction does not change any score
+        return _IndexState(base, delta, positions, state.df, state.version)
+
+    def compact(self):
+        """
+        Folds the delta segment and tombstones into a new base segment.
+        The merge runs without the write lock; if an update lands meanwhile
+        the merge is redone on the newer state.
+        """
+        for _ in range(3):
+            state = self._state
+            merged = self._compacted(state)
+            with self._write_lock:
+                if self._state is state:
+                    self._state = merged
+                    return
+
+        with self._write_lock:
+            self._state = self._compacted(self._state)
+
+    def _needs_compaction(self):
+        state = self._state
+        dead = len(state.base) + len(state.delta) - state.n_docs
+        return len(state.delta) >= self.compact_threshold or dead > max(len(state.base), 1) // 4
+
+    def _maybe_compact(self):
+        if not self._needs_compaction():
+            return
+        if self._compaction is not None and self._compaction.is_alive():
+            return
+        self._compaction = threading.Thread(target=self.compact, name="index-compaction", daemon=True)
+        self._compaction.start()
+
+    def wait_for_compaction(self):
+        if self._compaction is not None:
+            self._compaction.join()
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+    def _query_weights(self, state, query, idf):
+        weights = np.zeros(state.n_terms, dtype=np.float64)
+        for term, tf in Counter(self._analyzer(query)).items():
+            col = self.vocabulary.get(term)
+            # Terms absent from every live document are not in a refit vocabulary
+            if col is not None and col < state.n_terms and state.df[col] > 0:
+                weights[col] = tf * idf[col]
+
+        norm = np.linalg.norm(weights)
+        if norm > 0:
+            weights /= norm
+        return weights * idf
+
+    def search_batch(self, queries, top_k=5):
+        """
+        Returns, for each query, a list of (name, score, entry), best first.
+        """
+        state = self._state
+        idf = state.idf()
+        norms = state.norms(idf)
+        segments = (state.base, state.delta)
+        alive = np.concatenate([seg.alive for seg in segments])
+
+        results = []
+        for query in queries:
+            weights = self._query_weights(state, query, idf)
+
+            parts = []
+            for seg, seg_norms in zip(segments, norms):
+                raw = _widen(seg.counts, state.n_terms) @ weights
+                parts.append(np.divide(raw, seg_norms, out=np.zeros_like(raw), where=seg_norms > 0))
+            scores = np.concatenate(parts)
+            scores[~alive] = -np.inf
+
+            hits = []
+            for i in top_k_indices(scores, min(top_k, state.n_docs)):
+                seg = segments[0] if i < len(segments[0]) else segments[1]
+                row = i if i < len(segments[0]) else i - len(segments[0])
+                hits.append((seg.names[row], float(scores[i]), seg.entries[row]))
+            results.append(hits)
+
+        return results
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class LLMCache:
+    """
+    Persistent, content-addressed cache of raw LLM responses.
+
+    Entries are keyed on a SHA-256 of (model, prompt, temperature, max_tokens,
+    endpoint) and stored in SQLite (WAL mode), so several processes can share
+    the same cache file safely. A running total of the stored bytes is kept
+    in a `meta` row; when it exceeds `max_bytes`, the least recently used
+    entries are evicted down to 90% of the budget.
+
+    Lookups are plain reads. The recency of hits is recorded in memory and
+    written in batches (with the next put, or every TOUCH_BATCH hits).
+
+    Only the raw response text is cached: callers parse cached and fresh
+    responses with the same code. With bypass=True lookups are skipped but
+    fresh responses are still stored, which refreshes the cache.
+    """
+
+    TOUCH_BATCH = 64
+
+    def __init__(self, path="data/cache/llm_cache.sqlite", max_bytes=256 * 1024 * 1024, bypass=False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._touched = {}      # key -> last hit time, pas encore écrit
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries(last_used)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            # Total calculé une seule fois, pour un cache créé avant la table meta
+            conn.execute(
+                "INSERT OR IGNORE INTO meta (name, value)"
+                " SELECT 'bytes', COALESCE(SUM(size), 0) FROM entries"
+            )
+
+    def _conn(self):
+        # sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = _Transaction(conn)
+            conn = self._local.conn
+        return conn
+
+    @staticmethod
+    def make_key(model, prompt, temperature, max_tokens, base_url=None):
+        """
+        `base_url` is the endpoint when it is not the provider's default, so
+        answers of a local mock server never serve a real run.
+        """
+        fields = [model, prompt, temperature, max_tokens]
+        if base_url:
+            fields.append(base_url)
+        payload = json.dumps(fields, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _count(self, hit):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        if self.bypass:
+            self._count(False)
+            return None
+
+        # Lecture seule (autocommit) : les lecteurs ne prennent pas le verrou d'écriture
+        row = self._conn().conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        self._count(row is not None)
+        if row is None:
+            return None
+
+        with self._stats_lock:
+            self._touched[key] = time.time()
+            flush = len(self._touched) >= self.TOUCH_BATCH
+        if flush:
+            self.flush()
+        return row[0]
+
+    def _write_touches(self, conn):
+        with self._stats_lock:
+            touched, self._touched = self._touched, {}
+        conn.executemany(
+            "UPDATE entries SET last_used = ? WHERE key = ?",
+            [(when, key) for key, when in touched.items()]
+        )
+
+    def flush(self):
+        """
+        Writes the pending recency updates of cache hits.
+        """
+        if not self._touched:
+            return
+        with self._conn() as conn:
+            self._write_touches(conn)
+
+    @staticmethod
+    def _add_bytes(conn, delta):
+        conn.execute("UPDATE meta SET value = value + ? WHERE name = 'bytes'", (delta,))
+        return conn.execute("SELECT value FROM meta WHERE name = 'bytes'").fetchone()[0]
+
+    def put(self, key, value):
+        size = len(value.encode("utf-8"))
+        with self._conn() as conn:
+            self._write_touches(conn)
+            old = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time())
+            )
+            total = self._add_bytes(conn, size - (old[0] if old else 0))
+            if total > self.max_bytes:
+                self._evict(conn, total)
+
+    def delete(self, key):
+        with self._conn() as conn:
+            old = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            if old is not None:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._add_bytes(conn, -old[0])
+
+    def _evict(self, conn, total):
+        # Parcours de l'index LRU seulement quand le budget est dépassé
+        target = int(self.max_bytes * 0.9)
+        rows = conn.execute("SELECT key, size FROM entries ORDER BY last_used ASC")
+        victims, freed = [], 0
+        for key, size in rows:
+            if total - freed <= target:
+                break
+            victims.append((key,))
+            freed += size
+        conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+        self._add_bytes(conn, -freed)
+
+    def get_or_call(self, key, call):
+        """
+        Returns the cached response for `key`, or runs call() and stores its result.
+        """
+        value = self.get(key)
+        if value is None:
+            value = call()
+            self.put(key, value)
+        return value
+
+    def stats(self):
+        self.flush()
+        conn = self._conn().conn
+        entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        size = conn.execute("SELECT value FROM meta WHERE name = 'bytes'").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+
+class _Transaction:
+    """
+    Wraps a connection so `with conn:` runs one BEGIN IMMEDIATE ... COMMIT
+    transaction, serialising writers across processes.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
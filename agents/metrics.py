@@ -0,0 +1,350 @@
+"""
+Lightweight instrumentation: timing spans, counters and latency histograms,
+exported in Prometheus text format or as JSON.
+
+Disabled by default. While disabled, span() returns a shared no-op object
+and inc()/observe() return immediately, so instrumented code pays one
+function call and one flag check. Enable with metrics.enable() or the
+MEDASSIST_METRICS=1 environment variable.
+
+    from agents import metrics
+
+    with metrics.span("rag_score", backend="brute"):
+        ...
+    metrics.inc("scraper_responses_total", status="200")
+    print(metrics.export_prometheus())
+
+Spans opened with profile=True can additionally be sampled by a
+SlowRequestProfiler: the stacks of requests slower than a threshold are
+kept in collapsed ("folded") format, ready for flamegraph tools.
+"""
+import functools
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+PREFIX = "medassist_"
+
+# Secondes ; +Inf est implicite
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_enabled = os.environ.get("MEDASSIST_METRICS", "") not in ("", "0")
+_lock = threading.Lock()
+_counters = {}      # (name, labels) -> value
+_histograms = {}    # (name, labels) -> [bucket counts..., +Inf count], sum
+_profiler = None
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def enabled():
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, seconds, **labels):
+    """
+    Adds one observation (in seconds) to the histogram `name`.
+    """
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        entry = _histograms.get(key)
+        if entry is None:
+            entry = _histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0]
+        counts = entry[0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+        entry[1] += seconds
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("name", "labels", "profile", "start", "sampled")
+
+    def __init__(self, name, labels, profile):
+        self.name = name
+        self.labels = labels
+        self.profile = profile
+
+    def __enter__(self):
+        # Only the outermost profiled span of a thread owns its samples
+        self.sampled = self.profile and _profiler is not None and _profiler.begin()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        observe(f"{self.name}_seconds", elapsed, **self.labels)
+        if exc_type is not None:
+            inc(f"{self.name}_errors_total", **self.labels)
+        if self.sampled and _profiler is not None:
+            _profiler.end(self.name, elapsed)
+        return False
+
+
+def span(name, profile=False, **labels):
+    """
+    Context manager timing a block into the histogram `<name>_seconds`.
+    """
+    if not _enabled:
+        return _NOOP
+    return _Span(name, labels, profile)
+
+
+def timed(name, profile=False):
+    """
+    Decorator version of span().
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(name, {}, profile):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ----------------------------------------------------
+# Export
+# ----------------------------------------------------
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def _snapshot():
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: ([*entry[0]], entry[1]) for key, entry in _histograms.items()}
+    return counters, histograms
+
+
+def export_prometheus():
+    counters, histograms = _snapshot()
+    lines = []
+
+    for name in sorted({name for name, _ in counters}):
+        lines.append(f"# TYPE {PREFIX}{name} counter")
+        for (n, labels), value in sorted(counters.items()):
+            if n == name:
+                lines.append(f"{PREFIX}{name}{_format_labels(labels)} {value}")
+
+    for name in sorted({name for name, _ in histograms}):
+        lines.append(f"# TYPE {PREFIX}{name} histogram")
+        for (n, labels), (counts, total) in sorted(histograms.items()):
+            if n != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels, ('le', bound))} {cumulative}")
+            lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {total:.6f}")
+            lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {cumulative}")
+
+    return "\n".join(lines) + "\n"
+
+
+def _quantile(counts, q):
+    # Upper bound of the bucket holding the q-th observation (None: +Inf)
+    total = sum(counts)
+    if not total:
+        return 0.0
+    rank, seen = q * total, 0
+    for bound, count in zip(BUCKETS, counts):
+        seen += count
+        if seen >= rank:
+            return bound
+    return None
+
+
+def export_json():
+    counters, histograms = _snapshot()
+    out = {"counters": {}, "histograms": {}}
+    for (name, labels), value in sorted(counters.items()):
+        out["counters"].setdefault(name, []).append({"labels": dict(labels), "value": value})
+    for (name, labels), (counts, total) in sorted(histograms.items()):
+        count = sum(counts)
+        out["histograms"].setdefault(name, []).append({
+            "labels": dict(labels),
+            "count": count,
+            "sum": total,
+            "mean": total / count if count else 0.0,
+            "p50_le": _quantile(counts, 0.5),
+            "p99_le": _quantile(counts, 0.99),
+        })
+    return out
+
+
+def dump(path):
+    """
+    Writes the JSON export to `path` (.json) or the Prometheus text otherwise.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        if str(path).endswith(".json"):
+            json.dump(export_json(), f, indent=4)
+        else:
+            f.write(export_prometheus())
+
+
+# ----------------------------------------------------
+# Profiler
+# ----------------------------------------------------
+
+class SlowRequestProfiler:
+    """
+    Sampling profiler for spans opened with profile=True.
+
+    A background thread samples the stacks of threads currently inside a
+    profiled span every `interval` seconds. When a span lasts more than
+    `threshold` seconds its samples are kept (in `reports`, and in
+    `out_dir` as .folded files); faster spans are discarded.
+    """
+
+    def __init__(self, threshold=0.25, interval=0.005, out_dir=None, keep=20):
+        self.threshold = threshold
+        self.interval = interval
+        self.out_dir = out_dir
+        self.keep = keep
+        self.reports = []
+        self._seq = itertools.count()
+        self._active = {}       # thread id -> Counter of folded stacks
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name="metrics-profiler", daemon=True)
+
+    def start(self):
+        if self.out_dir:
+            os.makedirs(self.out_dir, exist_ok=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def begin(self):
+        tid = threading.get_ident()
+        with self._lock:
+            if tid in self._active:
+                return False
+            self._active[tid] = Counter()
+            return True
+
+    def end(self, name, elapsed):
+        with self._lock:
+            samples = self._active.pop(threading.get_ident(), None)
+        if samples is None or elapsed < self.threshold:
+            return
+
+        report = {"span": name, "seconds": elapsed, "time": time.time(), "stacks": dict(samples)}
+        with self._lock:
+            self.reports.append(report)
+            del self.reports[:-self.keep]
+
+        if self.out_dir:
+            path = os.path.join(self.out_dir, f"{name}-{int(report['time'] * 1000)}-{next(self._seq)}.folded")
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, count in samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            print(f"[Metrics] Slow {name} ({elapsed:.3f}s): profile saved to {path}")
+
+    @staticmethod
+    def _fold(frame):
+        parts = []
+        while frame is not None:
+            code = frame.f_code
+            parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        return ";".join(reversed(parts))
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                threads = list(self._active)
+            if not threads:
+                continue
+            frames = sys._current_frames()
+            for tid in threads:
+                frame = frames.get(tid)
+                if frame is None:
+                    continue
+                stack = self._fold(frame)
+                with self._lock:
+                    samples = self._active.get(tid)
+                    if samples is not None:
+                        samples[stack] += 1
+
+
+def profile_slow(threshold=0.25, interval=0.005, out_dir=None):
+    """
+    Starts the slow-request profiler (and enables metrics). Returns it.
+    """
+    global _profiler
+    enable()
+    if _profiler is not None:
+        _profiler.stop()
+    _profiler = SlowRequestProfiler(threshold, interval, out_dir).start()
+    return _profiler
+
+
+def stop_profiler():
+    global _profiler
+    if _profiler is not None:
+        _profiler.stop()
+        _profiler = None
@@ -0,0 +1,146 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class Overloaded(Exception):
+    """
+    Raised by MicroBatcher.submit() when the waiting queue is full.
+    """
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single requests into batched calls.
+
+    submit() queues one item and returns a Future. A collector thread takes
+    the first waiting item, keeps collecting for up to `max_wait` seconds
+    (or `max_batch` items), and runs `handler(items) -> results` for the
+    whole batch on a pool of `workers` threads. Items whose future was
+    cancelled, or whose `timeout` passed while they waited, are dropped
+    before the handler runs.
+
+    Backpressure: when every worker is busy the collector stops taking
+    items, the queue fills up, and submit() raises Overloaded once
+    `max_queue` items are waiting.
+    """
+
+    def __init__(self, handler, max_batch=32, max_wait=0.005, max_queue=256, workers=2, name="batcher"):
+        self.handler = handler
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.name = name
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._slots = threading.Semaphore(workers)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._closed = threading.Event()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.rejected = 0
+
+        self._collector = threading.Thread(target=self._collect, name=f"{name}-collector", daemon=True)
+        self._collector.start()
+
+    def submit(self, item, timeout=None):
+        if self._closed.is_set():
+            raise RuntimeError(f"[{self.name}] Batcher is closed")
+
+        future = Future()
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        try:
+            self._queue.put_nowait((item, future, deadline))
+        except queue.Full:
+            with self._stats_lock:
+                self.rejected += 1
+            raise Overloaded(f"[{self.name}] {self._queue.maxsize} requests already waiting")
+        return future
+
+    def _collect(self):
+        while not self._closed.is_set():
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            # Attend un worker libre avant de former le lot : les requêtes
+            # arrivées entre-temps rejoignent ce lot au lieu d'en créer un autre
+            self._slots.acquire()
+
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=max(remaining, 0)) if remaining > 0
+                                 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            self._pool.submit(self._run, batch)
+
+    def _live(self, batch):
+        # Le client a déjà abandonné : inutile de calculer sa réponse
+        now = time.monotonic()
+        live = []
+        for item, future, deadline in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            if deadline is not None and now > deadline:
+                future.set_exception(TimeoutError(f"[{self.name}] Request expired in the queue"))
+            else:
+                live.append((item, future))
+        return live
+
+    def _run(self, batch):
+        try:
+            batch = self._live(batch)
+            if not batch:
+                return
+
+            items = [item for item, _ in batch]
+            try:
+                results = list(self.handler(items))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                return
+
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+            # Handler incomplet : les requêtes sans résultat échouent au lieu d'attendre le timeout
+            for _, future in batch[len(results):]:
+                future.set_exception(RuntimeError(
+                    f"[{self.name}] Handler returned {len(results)} results for {len(batch)} items"
+                ))
+
+            with self._stats_lock:
+                self.batches += 1
+                self.items += len(batch)
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "mean_batch": self.items / self.batches if self.batches else 0.0,
+                "rejected": self.rejected,
+                "waiting": self._queue.qsize(),
+            }
+
+    def close(self):
+        self._closed.set()
+        self._collector.join()
+        self._pool.shutdown(wait=True)
+        # Requêtes jamais traitées : on les débloque
+        while True:
+            try:
+                _, future, _ = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if future.set_running_or_notify_cancel():
+                future.set_exception(RuntimeError(f"[{self.name}] Batcher closed"))
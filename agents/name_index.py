@@ -0,0 +1,161 @@
+import math
+import re
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+import numpy as np
+
+NAME_FIELDS = ("name", "generic_name", "substance_name")
+
+
+def normalize_name(text):
+    text = re.sub(r"[^a-z0-9]+", " ", str(text).lower())
+    return " ".join(text.split())
+
+
+def trigrams(text):
+    """
+    Distinct character trigrams of a normalized string, padded so that
+    short names and word boundaries still produce grams.
+    """
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FuzzyNameIndex:
+    """
+    Approximate lookup of medication names: maps noisy text (a typo, an
+    OCR read of a box) to dataset keys, through `name`, `generic_name` and
+    `substance_name`.
+
+    Every distinct normalized name is split into character trigrams, kept
+    in sorted posting arrays (trigram -> name ids). A query only reads the
+    postings of its rarest trigrams to find candidates (any name reaching
+    `min_similarity` must share one of them), then checks the candidates
+    against the other postings by binary search. Candidates are ranked by
+    trigram Jaccard similarity and the best ones re-scored with an edit
+    ratio.
+    """
+
+    def __init__(self, data, fields=NAME_FIELDS):
+        self.fields = fields
+
+        names = {}          # normalized name -> id
+        self.names = []     # id -> normalized name
+        self.owners = []    # id -> [(dataset key, field)]
+        seen = set()
+        for key, entry in data.items():
+            for field in fields:
+                value = key if field == "name" and not entry.get("name") else entry.get(field)
+                if not value:
+                    continue
+                # Multi-ingredient substances are also indexed one by one
+                variants = {normalize_name(value)}
+                if field == "substance_name" and "," in str(value):
+                    variants.update(normalize_name(part) for part in str(value).split(","))
+                for variant in variants:
+                    if not variant:
+                        continue
+                    name_id = names.get(variant)
+                    if name_id is None:
+                        name_id = names[variant] = len(self.names)
+                        self.names.append(variant)
+                        self.owners.append([])
+                    if (name_id, key) not in seen:
+                        seen.add((name_id, key))
+                        self.owners[name_id].append((key, field))
+
+        # A brand whose own name matches comes before one matching by substance
+        rank = {field: i for i, field in enumerate(fields)}
+        for owners in self.owners:
+            owners.sort(key=lambda owner: rank[owner[1]])
+
+        postings = defaultdict(list)
+        self.gram_counts = np.zeros(len(self.names), dtype=np.int32)
+        for name_id, name in enumerate(self.names):
+            grams = trigrams(name)
+            self.gram_counts[name_id] = len(grams)
+            for gram in grams:
+                postings[gram].append(name_id)
+
+        # ids are appended in increasing order: arrays are already sorted
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+        print(f"[Names] Fuzzy index: {len(self.names)} names, {len(self.postings)} trigrams")
+
+    def _candidates(self, query, min_similarity):
+        grams = trigrams(query)
+        known = sorted(
+            (self.postings[g] for g in grams if g in self.postings),
+            key=len
+        )
+        if not known:
+            return None, None, 0
+
+        # Jaccard >= s implies overlap >= s * |Q|: a match shares at least
+        # one of the |Q| - t + 1 rarest query trigrams
+        needed = max(1, math.ceil(min_similarity * len(grams)))
+        prefix = len(grams) - needed + 1
+        if prefix <= 0:
+            return None, None, 0
+
+        candidates = np.unique(np.concatenate(known[:prefix]))
+        overlap = np.zeros(len(candidates), dtype=np.int32)
+        for posting in known:
+            pos = np.searchsorted(posting, candidates)
+            pos[pos == len(posting)] = 0
+            overlap += posting[pos] == candidates
+
+        return candidates, overlap, len(grams)
+
+    def lookup(self, text, k=5, min_similarity=0.3, rerank=4):
+        """
+        Closest dataset entries for `text`, best first:
+        [{"name": key, "score": float, "matched": str, "field": str}].
+        """
+        query = normalize_name(text)
+        if not query or k <= 0:
+            return []
+
+        candidates, overlap, n_grams = self._candidates(query, min_similarity)
+        if candidates is None or len(candidates) == 0:
+            return []
+
+        jaccard = overlap / (n_grams + self.gram_counts[candidates] - overlap)
+        keep = jaccard >= min_similarity
+        candidates, jaccard = candidates[keep], jaccard[keep]
+
+        # Re-score only the best few by edit ratio
+        limit = min(len(candidates), k * rerank)
+        best = np.argsort(-jaccard, kind="stable")[:limit]
+        scored = []
+        for i in best:
+            name = self.names[candidates[i]]
+            ratio = SequenceMatcher(None, query, name).ratio()
+            scored.append(((ratio + float(jaccard[i])) / 2, int(candidates[i])))
+        scored.sort(key=lambda x: (-x[0], x[1]))
+
+        results, seen = [], set()
+        for score, name_id in scored:
+            for key, field in self.owners[name_id]:
+                if key in seen:
+                    continue
+                seen.add(key)
+                results.append({
+                    "name": key,
+                    "score": round(score, 4),
+                    "matched": self.names[name_id],
+                    "field": field,
+                })
+                if len(results) == k:
+                    return results
+        return results
+
+    def best_match(self, text, min_score=0.5):
+        """
+        Single most likely dataset key for `text`, or None.
+        """
+        results = self.lookup(text, k=1)
+        if results and results[0]["score"] >= min_score:
+            return results[0]["name"]
+        return None
@@ -0,0 +1,196 @@
+import ast
+import os
+import time
+
+import cv2
+import numpy as np
+import onnxruntime as ort
+
+
+def letterbox(image, size=640, color=(114, 114, 114)):
+    """
+    Resizes a BGR image to size x size keeping its aspect ratio, padding the
+    borders the way ultralytics does. Returns (image, gain, (pad_x, pad_y)).
+    """
+    h, w = image.shape[:2]
+    gain = min(size / h, size / w)
+    new_w, new_h = round(w * gain), round(h * gain)
+    pad_x, pad_y = (size - new_w) / 2, (size - new_h) / 2
+
+    if (new_w, new_h) != (w, h):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+    top, bottom = round(pad_y - 0.1), round(pad_y + 0.1)
+    left, right = round(pad_x - 0.1), round(pad_x + 0.1)
+    image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+    return image, gain, (left, top)
+
+
+def preprocess(image, size=640):
+    """
+    BGR uint8 image -> (1, 3, size, size) float32 RGB tensor in [0, 1].
+    """
+    padded, gain, pad = letterbox(image, size)
+    tensor = padded[:, :, ::-1].transpose(2, 0, 1)
+    tensor = np.ascontiguousarray(tensor, dtype=np.float32)[None] / 255.0
+    return tensor, gain, pad
+
+
+def nms(boxes, scores, iou_threshold):
+    """
+    Greedy non-maximum suppression on xyxy boxes. Returns kept indices,
+    best score first.
+    """
+    order = scores.argsort()[::-1]
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        x1 = np.maximum(boxes[i, 0], boxes[rest, 0])
+        y1 = np.maximum(boxes[i, 1], boxes[rest, 1])
+        x2 = np.minimum(boxes[i, 2], boxes[rest, 2])
+        y2 = np.minimum(boxes[i, 3], boxes[rest, 3])
+        inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+class OnnxBoxes:
+    """
+    Same attributes as ultralytics' Boxes that the VisionAgent reads.
+    """
+
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+
+    def __len__(self):
+        return len(self.conf)
+
+    def __getitem__(self, i):
+        return OnnxBoxes(self.xyxy[i:i + 1], self.conf[i:i + 1], self.cls[i:i + 1])
+
+
+class OnnxResult:
+    """
+    Detections for one image, duck-typed on ultralytics' Results
+    (boxes, names, plot()).
+    """
+
+    def __init__(self, image, boxes, names, speed=None):
+        self.orig_img = image
+        self.boxes = boxes
+        self.names = names
+        # ms per image, like ultralytics
+        self.speed = speed or {}
+
+    def plot(self):
+        image = self.orig_img.copy()
+        for (x1, y1, x2, y2), conf, cls in zip(self.boxes.xyxy, self.boxes.conf, self.boxes.cls):
+            p1, p2 = (int(x1), int(y1)), (int(x2), int(y2))
+            cv2.rectangle(image, p1, p2, (56, 56, 255), 2)
+            label = f"{self.names.get(int(cls), int(cls))} {conf:.2f}"
+            cv2.putText(image, label, (p1[0], max(p1[1] - 5, 12)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (56, 56, 255), 1, cv2.LINE_AA)
+        return image
+
+
+class OnnxYoloDetector:
+    """
+    Runs a YOLOv8 model exported to ONNX (tools/export_yolo.py) with
+    onnxruntime on CPU, without torch or ultralytics.
+
+    predict() mirrors YOLO.predict(): it accepts an image path or a list of
+    BGR arrays and returns one OnnxResult per image. Thresholds default to
+    the ultralytics ones so both backends give the same boxes.
+    """
+
+    def __init__(self, model_path, threads=None, conf=0.25, iou=0.7, max_det=300):
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input = self.session.get_inputs()[0]
+        self.conf = conf
+        self.iou = iou
+        self.max_det = max_det
+
+        # ultralytics writes the class names and image size into the metadata
+        meta = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(meta["names"]) if "names" in meta else {0: "drug-name"}
+        shape = self.input.shape
+        self.imgsz = shape[2] if isinstance(shape[2], int) else ast.literal_eval(meta.get("imgsz", "[640]"))[0]
+        self.dynamic_batch = not isinstance(shape[0], int)
+
+    def predict(self, source, device="cpu", verbose=False, batch=1, **kwargs):
+        if isinstance(source, (str, os.PathLike)):
+            image = cv2.imread(str(source))
+            if image is None:
+                raise FileNotFoundError(f"[VisionAgent] Cannot read image: {source}")
+            source = [image]
+
+        start = time.perf_counter()
+        tensors, metas = [], []
+        for image in source:
+            tensor, gain, pad = preprocess(image, self.imgsz)
+            tensors.append(tensor)
+            metas.append((gain, pad))
+        preprocessed = time.perf_counter()
+
+        # Exported with a fixed batch of 1: one run per image
+        step = max(batch, 1) if self.dynamic_batch else 1
+        outputs = []
+        for first in range(0, len(tensors), step):
+            stacked = np.concatenate(tensors[first:first + step])
+            outputs.extend(self.session.run(None, {self.input.name: stacked})[0])
+        inferred = time.perf_counter()
+
+        boxes = [
+            self._postprocess(output, gain, pad, image.shape)
+            for image, output, (gain, pad) in zip(source, outputs, metas)
+        ]
+        done = time.perf_counter()
+
+        n = max(len(boxes), 1)
+        speed = {
+            "preprocess": (preprocessed - start) * 1000 / n,
+            "inference": (inferred - preprocessed) * 1000 / n,
+            "postprocess": (done - inferred) * 1000 / n,
+        }
+        return [OnnxResult(image, b, self.names, speed) for image, b in zip(source, boxes)]
+
+    def _postprocess(self, output, gain, pad, shape):
+        # output: (4 + classes, anchors), boxes as centre x, centre y, w, h
+        predictions = output.T
+        class_scores = predictions[:, 4:]
+        cls = class_scores.argmax(axis=1)
+        conf = class_scores[np.arange(len(cls)), cls]
+
+        mask = conf > self.conf
+        xywh, conf, cls = predictions[mask, :4], conf[mask], cls[mask]
+
+        boxes = np.empty_like(xywh)
+        boxes[:, 0] = xywh[:, 0] - xywh[:, 2] / 2
+        boxes[:, 1] = xywh[:, 1] - xywh[:, 3] / 2
+        boxes[:, 2] = xywh[:, 0] + xywh[:, 2] / 2
+        boxes[:, 3] = xywh[:, 1] + xywh[:, 3] / 2
+
+        # NMS per class: boxes of different classes never overlap once offset
+        offset = cls[:, None].astype(np.float32) * 7680
+        keep = nms(boxes + offset, conf, self.iou)[:self.max_det]
+        boxes, conf, cls = boxes[keep], conf[keep], cls[keep]
+
+        # Back to original image coordinates
+        boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad[0]) / gain
+        boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad[1]) / gain
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, shape[1])
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, shape[0])
+
+        return OnnxBoxes(boxes, conf.astype(np.float32), cls.astype(np.float32))
@@ -2,6 +2,8 @@ import os
 from groq import Groq
 from dotenv import load_dotenv
 
+from agents.llm_cache import LLMCache
+
 load_dotenv()
 
 class QueryLLMAgent:
@@ -9,13 +11,15 @@ class QueryLLMAgent:
     Agent LLM utilisant Groq pour classifier les médicaments selon les symptômes.
     """
 
-    def __init__(self, model="llama-3.3-70b-versatile"):
+    def __init__(self, model="llama-3.3-70b-versatile", cache=None):
         api_key = os.getenv("GROQ_API_KEY")
         if not api_key:
             raise ValueError("GROQ_API_KEY manquant dans le fichier .env")
 
         self.client = Groq(api_key=api_key)
         self.model = model
+        # Cache disque optionnel des réponses (agents/llm_cache.py)
+        self.cache = cache
 
         print("[LLM] Groq Agent initialized.")
 
@@ -37,10 +41,16 @@ Output format example:
 ["pain", "fever", "headache"]
 """
 
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0
-        )
+        def call():
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0
+            )
+            return response.choices[0].message.content
+
+        if self.cache is None:
+            return call()
 
-        return response.choices[0].message.content
+        key = LLMCache.make_key(self.model, prompt, 0, None)
+        return self.cache.get_or_call(key, call)
@@ -1,55 +1,351 @@
 import json
 import os
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from agents import metrics
+from agents.dataset_store import load_dataset
+from agents.tfidf_index import RowFilter, TfidfSnapshot, default_index_dir, top_k_indices
 
 class RAGSearchAgent:
-    def __init__(self, dataset_path="data/enriched/openfda_enriched_500.json"):
+    # brute    : score every document with one sparse product
+    # inverted : posting lists + MaxScore, only documents sharing a query term
+    # live     : updatable index (upsert/remove) without refitting
+    # sharded  : brute split over worker processes (agents.sharded_search)
+    BACKENDS = ("brute", "inverted", "live", "sharded")
+
+    # lexical : TF-IDF seul (backend ci-dessus)
+    # dense   : embeddings LSA dans un index IVF (agents.dense_index)
+    # hybrid  : candidats des deux, reclassés sur un mélange des deux cosinus
+    RETRIEVAL_MODES = ("lexical", "dense", "hybrid")
+
+    # Candidats pris de chaque côté en mode hybrid, par résultat demandé
+    HYBRID_CANDIDATES = 4
+
+    def __init__(self, dataset_path="data/enriched/openfda_enriched_500.json",
+                 index_dir=None, use_snapshot=True, backend="brute",
+                 retrieval="lexical", dense_dtype="float32", nprobe=None, hybrid_weight=0.5,
+                 shards=None):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"[RAG] Unknown backend: {backend} (expected one of {self.BACKENDS})")
+        if retrieval not in self.RETRIEVAL_MODES:
+            raise ValueError(f"[RAG] Unknown retrieval mode: {retrieval} (expected one of {self.RETRIEVAL_MODES})")
+        if retrieval != "lexical" and backend == "live":
+            raise ValueError("[RAG] Dense retrieval is built offline and does not support backend='live'")
+
         self.dataset_path = dataset_path
+        self.backend = backend
+        self.retrieval = retrieval
+        # Poids du score TF-IDF dans le score hybride (1 - poids pour le dense)
+        self.hybrid_weight = hybrid_weight
+        self.index_dir = index_dir or default_index_dir(dataset_path)
 
         print("[RAG] Loading enriched dataset...")
-        with open(dataset_path, "r", encoding="utf-8") as f:
-            self.data = json.load(f)
+        # JSON ou format binaire .medstore (champs lourds décodés à la demande)
+        with metrics.span("rag_load"):
+            self.data, self.dataset_hash = load_dataset(dataset_path)
 
         print(f"[RAG] {len(self.data)} medications loaded.")
 
-        # Préparer les documents textuels pour TF-IDF
-        self.drug_names = list(self.data.keys())
-        self.corpus = []
+        # backend="live" n'a pas de snapshot : l'index live garde ses propres comptes de termes
+        snapshot = None
+        if backend != "live" and use_snapshot:
+            # Réutilise l'index sur disque si le dataset n'a pas changé
+            with metrics.span("rag_index_load"):
+                snapshot = TfidfSnapshot.load_or_build(self.data, self.dataset_hash, self.index_dir)
+        elif backend != "live":
+            # Préparer les documents textuels pour TF-IDF
+            print("[RAG] Building TF-IDF index...")
+            snapshot = TfidfSnapshot.build(self.data, self.dataset_hash)
+
+        self.drug_names = snapshot.drug_names if snapshot else None
+        self.vectorizer = snapshot.vectorizer if snapshot else None
+        self.tfidf_matrix = snapshot.matrix if snapshot else None
+        self.filter_index = snapshot.filters if snapshot else None
+
+        self._analyzer = None
+        # Masque de filtre -> RowFilter (lignes autorisées découpées une seule fois)
+        self._row_filters = OrderedDict()
+        self._row_filters_lock = threading.Lock()
 
-        for name, entry in self.data.items():
-            text = " ".join([
-                entry.get("clean_indications", ""),
-                " ".join(entry.get("symptoms", [])),
-                " ".join(entry.get("tags", [])),
-                entry.get("category", "")
-            ])
-            self.corpus.append(text)
+        self.inverted_index = None
+        if backend == "inverted":
+            from agents.inverted_index import InvertedIndex
+            print("[RAG] Building inverted index...")
+            self.inverted_index = InvertedIndex(self.tfidf_matrix)
 
-        print("[RAG] Building TF-IDF index...")
-        self.vectorizer = TfidfVectorizer(stop_words="english")
-        self.tfidf_matrix = self.vectorizer.fit_transform(self.corpus)
+        self.live_index = None
+        if backend == "live":
+            # Import local : tire scikit-learn (CountVectorizer)
+            from agents.live_index import LiveTfidfIndex
+            print("[RAG] Building updatable index...")
+            self.live_index = LiveTfidfIndex(self.data)
+            # Source unique : self.data est une vue sur l'index, à jour après chaque upsert
+            self.data = self.live_index.entries
+
+        self.sharded_index = None
+        if backend == "sharded":
+            from agents.sharded_search import ShardedSearch
+            print("[RAG] Starting shard workers...")
+            self.sharded_index = ShardedSearch(self.tfidf_matrix, n_shards=shards)
+
+        self.dense_index = None
+        if retrieval != "lexical":
+            from agents.dense_index import DenseIndex, dense_index_dir
+            with metrics.span("rag_dense_load"):
+                if use_snapshot:
+                    self.dense_index = DenseIndex.load_or_build(
+                        self.tfidf_matrix, self.dataset_hash,
+                        dense_index_dir(self.index_dir, dense_dtype), dtype=dense_dtype, nprobe=nprobe
+                    )
+                else:
+                    print("[RAG] Building dense index...")
+                    self.dense_index = DenseIndex.build(self.tfidf_matrix, self.dataset_hash, dtype=dense_dtype)
+                    if nprobe:
+                        self.dense_index.nprobe = nprobe
 
         print("[RAG] RAG Search Agent ready.")
 
-    def search(self, user_query, top_k=5):
+    @property
+    def index_version(self):
+        """
+        Changes whenever search results may change (dataset or live updates).
+        """
+        live_version = self.live_index.version if self.live_index is not None else 0
+        return (self.dataset_hash, live_version)
+
+    def query_terms(self, user_query):
+        """
+        Terms of a query as the index sees them (lowercased, stop words and
+        punctuation removed), sorted: two queries with the same terms get
+        the same scores.
+
+        With a fixed vocabulary, terms outside it are dropped (they cannot
+        change a score). The live backend keeps them: an upsert can add
+        them to its vocabulary at any time.
+        """
+        if self.live_index is not None:
+            return tuple(sorted(self.live_index.analyze(user_query)))
+        if self._analyzer is None:
+            self._analyzer = self.vectorizer.build_analyzer()
+        vocabulary = self.vectorizer.vocabulary_
+        return tuple(sorted(t for t in self._analyzer(user_query) if t in vocabulary))
+
+    # Nombre max de scores denses (requêtes x documents) gardés en mémoire
+    MAX_SCORE_CELLS = 1 << 22
+
+    # RowFilter gardés (les masques eux-mêmes sont mis en cache par FilterIndex)
+    ROW_FILTER_CACHE = 8
+
+    def search(self, user_query, top_k=5, filter=None):
         """
         Recherche les médicaments les plus similaires à une requête de symptômes.
         """
-        query_vec = self.vectorizer.transform([user_query])
-        similarities = cosine_similarity(query_vec, self.tfidf_matrix)[0]
+        return self.search_batch([user_query], top_k=top_k, filter=filter)[0]
+
+    def filter_mask(self, filter):
+        """
+        Boolean mask of the medications matching a filter expression
+        (see agents.filter_index), or None when every medication matches.
+        """
+        if filter is None:
+            return None
+        if self.live_index is not None:
+            raise ValueError("[RAG] Filters are built with the snapshot and do not support backend='live'")
+        allowed = self.filter_index.mask(filter)
+        return None if allowed.all() else allowed
+
+    def search_batch(self, queries, top_k=5, chunk_size=None, filter=None):
+        """
+        Recherche plusieurs requêtes à la fois.
 
-        # Trier les scores
-        top_indices = similarities.argsort()[::-1][:top_k]
+        Les requêtes sont vectorisées ensemble et scorées par un seul produit
+        matriciel creux par bloc. La taille des blocs est bornée pour que la
+        matrice dense des scores reste sous MAX_SCORE_CELLS.
+
+        `filter` (ex. "category:allergy NOT tag:drowsiness") restreint la
+        recherche avant le scoring : seuls les médicaments retenus sont scorés.
+        """
+        allowed = self.filter_mask(filter)
+        if allowed is not None and not allowed.any():
+            metrics.inc("rag_queries_total", len(queries), backend=self.backend)
+            return [[] for _ in queries]
+
+        # Brute : seules les lignes autorisées de la matrice sont scorées
+        row_filter = None
+        if allowed is not None and self.backend == "brute":
+            row_filter = self._row_filter(allowed)
+
+        if self.live_index is not None:
+            n_docs = len(self.live_index)
+        else:
+            n_docs = row_filter.n_rows if row_filter is not None else self.tfidf_matrix.shape[0]
+        if chunk_size is None and self.sharded_index is not None:
+            # Les workers bornent eux-mêmes leurs blocs : un seul aller-retour
+            chunk_size = max(1, len(queries))
+        elif chunk_size is None:
+            chunk_size = max(1, self.MAX_SCORE_CELLS // max(n_docs, 1))
 
         results = []
-        for i in top_indices:
+        for start in range(0, len(queries), chunk_size):
+            chunk = queries[start:start + chunk_size]
+
+            if self.live_index is not None:
+                with metrics.span("rag_score", backend="live"):
+                    batch_hits = self.live_index.search_batch(chunk, top_k)
+                for hits in batch_hits:
+                    results.append([
+                        {"name": name, "score": score, "data": entry}
+                        for name, score, entry in hits
+                    ])
+                continue
+
+            with metrics.span("rag_transform", backend=self.backend):
+                query_matrix = self.vectorizer.transform(chunk)
+
+            if self.dense_index is not None:
+                with metrics.span("rag_score", backend=self.retrieval):
+                    embeddings = self.dense_index.embed(query_matrix)
+                    for row in range(query_matrix.shape[0]):
+                        results.append(self._search_dense(query_matrix[row], embeddings[row], top_k, allowed))
+                continue
+
+            if self.sharded_index is not None:
+                # Chaque worker renvoie son top-k, fusionnés ici
+                with metrics.span("rag_score", backend="sharded"):
+                    for indices, scores in self.sharded_index.search(query_matrix, top_k, allowed):
+                        results.append(self._format_results(indices, scores))
+                continue
+
+            if self.inverted_index is not None:
+                # MaxScore score et classe en une seule passe
+                with metrics.span("rag_score", backend="inverted"):
+                    for row in range(query_matrix.shape[0]):
+                        indices, scores = self.inverted_index.top_k(query_matrix[row], top_k, allowed)
+                        results.append(self._format_results(indices, scores))
+                continue
+
+            # Les lignes TF-IDF sont normalisées L2 : le produit scalaire est le cosinus
+            with metrics.span("rag_score", backend="brute"):
+                if row_filter is not None:
+                    all_scores = row_filter.scores(query_matrix)
+                else:
+                    all_scores = (self.tfidf_matrix @ query_matrix.T).T.toarray()
+            with metrics.span("rag_rank", backend="brute"):
+                for scores in all_scores:
+                    if row_filter is not None:
+                        results.append(self._format_results(*row_filter.top_k(scores, top_k)))
+                        continue
+                    indices = top_k_indices(scores, top_k)
+                    results.append(self._format_results(indices, scores[indices]))
+
+        metrics.inc("rag_queries_total", len(queries), backend=self.backend)
+
+        return results
+
+    def _lexical_top_k(self, query_vec, k, allowed=None):
+        if self.sharded_index is not None:
+            return self.sharded_index.search(query_vec, k, allowed)[0]
+        if self.inverted_index is not None:
+            return self.inverted_index.top_k(query_vec, k, allowed)
+        if allowed is None:
+            scores = (self.tfidf_matrix @ query_vec.T).toarray().ravel()
+            indices = top_k_indices(scores, k)
+            return indices, scores[indices]
+        row_filter = self._row_filter(allowed)
+        return row_filter.top_k(row_filter.scores(query_vec)[0], k)
+
+    def _row_filter(self, allowed):
+        if allowed.flags.writeable:
+            # Masque modifiable par l'appelant : pas de cache
+            return RowFilter(self.tfidf_matrix, allowed)
+
+        # Clé : l'identité du masque, gardé en référence (son id ne peut pas être réutilisé)
+        key = id(allowed)
+        with self._row_filters_lock:
+            cached = self._row_filters.get(key)
+            if cached is not None:
+                self._row_filters.move_to_end(key)
+                return cached
+
+        row_filter = RowFilter(self.tfidf_matrix, allowed)
+        with self._row_filters_lock:
+            self._row_filters[key] = row_filter
+            while len(self._row_filters) > self.ROW_FILTER_CACHE:
+                self._row_filters.popitem(last=False)
+        return row_filter
+
+    def _search_dense(self, query_vec, embedding, top_k, allowed=None):
+        """
+        Dense or hybrid search for one query (TF-IDF row + LSA embedding).
+
+        Hybrid: the best TF-IDF and the best dense candidates are merged,
+        both cosines are computed exactly for each of them, and they are
+        ranked on hybrid_weight * lexical + (1 - hybrid_weight) * dense.
+        """
+        if self.retrieval == "dense":
+            indices, scores = self.dense_index.search(embedding, top_k, allowed=allowed)
+            return self._format_results(indices, scores)
+
+        n_candidates = top_k * self.HYBRID_CANDIDATES
+        lexical_ids, _ = self._lexical_top_k(query_vec, n_candidates, allowed)
+        dense_ids, _ = self.dense_index.search(embedding, n_candidates, allowed=allowed)
+        candidates = np.union1d(lexical_ids, dense_ids)
+        if len(candidates) == 0:
+            return []
+
+        lexical = (self.tfidf_matrix[candidates] @ query_vec.T).toarray().ravel()
+        dense = self.dense_index.score(candidates, embedding)
+        combined = self.hybrid_weight * lexical + (1 - self.hybrid_weight) * dense
+
+        best = top_k_indices(combined, top_k)
+        results = self._format_results(candidates[best], combined[best])
+        for result, i in zip(results, best):
+            result["lexical_score"] = float(lexical[i])
+            result["dense_score"] = float(dense[i])
+        return results
+
+    def _format_results(self, indices, scores):
+        results = []
+        for i, score in zip(indices, scores):
             name = self.drug_names[i]
-            score = similarities[i]
             results.append({
                 "name": name,
                 "score": float(score),
                 "data": self.data[name]
             })
-
         return results
+
+    # ----------------------------------------------------
+    # MISES À JOUR (backend="live")
+    # ----------------------------------------------------
+    def _require_live(self):
+        if self.live_index is None:
+            raise RuntimeError("[RAG] Index updates require backend='live'")
+
+    def upsert(self, name, entry):
+        """
+        Ajoute ou remplace un médicament sans reconstruire l'index.
+        """
+        self._require_live()
+        self.live_index.upsert(name, entry)
+
+    def remove(self, name):
+        """
+        Supprime un médicament de l'index. Retourne False s'il est absent.
+        """
+        self._require_live()
+        return self.live_index.remove(name)
+
+    def compact(self):
+        self._require_live()
+        self.live_index.compact()
+
+    def close(self):
+        """
+        Arrête les workers du backend sharded (sans effet pour les autres).
+        """
+        if self.sharded_index is not None:
+            self.sharded_index.close()
@@ -1,36 +1,138 @@
-import json
+import threading
+
+from agents import metrics
+from agents.filter_index import parse
+from agents.name_index import FuzzyNameIndex
 from agents.rag_search_agent import RAGSearchAgent
+from agents.result_cache import ResultCache
 
 class RecommendationAgent:
-    def __init__(self, dataset_path="data/enriched/openfda_enriched_500.json"):
+    def __init__(self, dataset_path="data/enriched/openfda_enriched_500.json", rag=None,
+                 cache_size=1024, cache_ttl=None, name_index=None):
         print("[Reco] Initializing Recommendation Agent...")
         self.dataset_path = dataset_path
 
-        # Appel correct du RAGSearchAgent
-        self.rag = RAGSearchAgent(dataset_path)
+        # Réutilise un RAGSearchAgent partagé s'il est fourni
+        self.rag = rag if rag is not None else RAGSearchAgent(dataset_path)
+
+        # Résultats récents, indexés sur la forme normalisée de la requête.
+        # cache_size=0 désactive le cache.
+        self.cache = ResultCache(cache_size, cache_ttl) if cache_size else None
+
+        # Index des noms construit au premier appel de match_name(),
+        # reconstruit après une mise à jour de l'index live
+        self._name_index = name_index
+        self._name_version = self.rag.index_version
+        self._name_lock = threading.Lock()
+
+    @property
+    def data(self):
+        # Le dataset est chargé par le RAG : une seule source, même après un upsert
+        return self.rag.data
 
-        # Charger dataset
-        with open(dataset_path, "r", encoding="utf-8") as f:
-            self.data = json.load(f)
+    def _cache_key(self, symptoms, top_k, filter_tree=None):
+        # Casse, ponctuation, stop words et ordre des termes n'influent pas
+        # sur le score TF-IDF : ils sont retirés de la clé
+        return (self.rag.query_terms(symptoms), top_k, filter_tree)
 
-    def recommend(self, symptoms, top_k=5):
+    def recommend(self, symptoms, top_k=5, filter=None):
         print(f"[Reco] Symptoms input: {symptoms}")
 
-        results = self.rag.search(symptoms, top_k=top_k)
+        with metrics.span("recommend", profile=True):
+            return self.recommend_batch([symptoms], top_k=top_k, verbose=False, filter=filter)[0]
+
+    @metrics.timed("recommend_batch", profile=True)
+    def recommend_batch(self, symptoms_list, top_k=5, verbose=True, filter=None):
+        """
+        Recommandations pour plusieurs requêtes, via RAGSearchAgent.search_batch.
+        Seules les requêtes absentes du cache sont envoyées au RAG.
+        `filter` restreint les médicaments candidats (ex. "category:allergy").
+        """
+        if verbose:
+            print(f"[Reco] Batch of {len(symptoms_list)} queries")
+
+        metrics.inc("recommend_queries_total", len(symptoms_list))
+
+        # Arbre du filtre : même clé de cache pour "A AND B" et "a b"
+        filter_tree = parse(filter) if isinstance(filter, str) else filter
+
+        if self.cache is None:
+            batch_results = self.rag.search_batch(symptoms_list, top_k=top_k, filter=filter_tree)
+            return [
+                [self._to_recommendation(item) for item in results]
+                for results in batch_results
+            ]
+
+        # Vide le cache si le dataset ou l'index live a changé
+        self.cache.check_version(self.rag.index_version)
+
+        keys = [self._cache_key(symptoms, top_k, filter_tree) for symptoms in symptoms_list]
+        found = {}
+        missing = {}
+        for symptoms, key in zip(symptoms_list, keys):
+            if key in found or key in missing:
+                continue
+            cached = self.cache.get(key)
+            if cached is not None:
+                found[key] = cached
+            else:
+                missing[key] = symptoms
+
+        metrics.inc("recommend_cache_misses_total", len(missing))
+
+        if missing:
+            version = self.rag.index_version
+            batch_results = self.rag.search_batch(list(missing.values()), top_k=top_k, filter=filter_tree)
+            for key, results in zip(missing, batch_results):
+                recommendations = [self._to_recommendation(item) for item in results]
+                found[key] = recommendations
+                # Pas de mise en cache si l'index a changé pendant la recherche
+                if self.rag.index_version == version:
+                    self.cache.put(key, recommendations)
+
+        # Copies : l'appelant peut modifier ses résultats sans toucher au cache
+        return [[self._copy_recommendation(reco) for reco in found[key]] for key in keys]
+
+    @property
+    def name_index(self):
+        version = self.rag.index_version
+        if self._name_index is None or self._name_version != version:
+            with self._name_lock:
+                if self._name_index is None or self._name_version != version:
+                    self._name_index = FuzzyNameIndex(self.data)
+                    self._name_version = version
+        return self._name_index
+
+    def match_name(self, text, k=5, min_similarity=0.3):
+        """
+        Dataset medications whose name, generic name or substance is
+        closest to `text` (typed by a user, or read off a box).
+        """
+        matches = self.name_index.lookup(text, k=k, min_similarity=min_similarity)
+        for match in matches:
+            entry = self.data.get(match["name"], {})
+            match["category"] = entry.get("category", "unknown")
+            match["clean_indications"] = entry.get("clean_indications", "")
+        return matches
 
-        recommendations = []
+    def cache_stats(self):
+        return self.cache.stats() if self.cache is not None else None
 
-        for item in results:
-            med_name = item["name"]
-            score = item["score"]
-            med_info = self.data[med_name]
+    def _to_recommendation(self, item):
+        med_name = item["name"]
+        # Entrée renvoyée par le RAG : cohérente même si l'index change entre-temps
+        med_info = item["data"]
 
-            recommendations.append({
-                "name": med_name,
-                "score": score,
-                "category": med_info.get("category", "unknown"),
-                "symptoms": med_info.get("symptoms", []),
-                "clean_indications": med_info.get("clean_indications", "")
-            })
+        return {
+            "name": med_name,
+            "score": item["score"],
+            "category": med_info.get("category", "unknown"),
+            # Copie : ni le cache ni l'appelant ne partagent la liste du dataset
+            "symptoms": list(med_info.get("symptoms", [])),
+            "clean_indications": med_info.get("clean_indications", "")
+        }
 
-        return recommendations
+    @staticmethod
+    def _copy_recommendation(reco):
+        # Copie profonde pour ce schéma : la seule valeur modifiable est la liste
+        return {**reco, "symptoms": list(reco["symptoms"])}
@@ -0,0 +1,92 @@
+import threading
+
+DEFAULT_DATASET = "data/enriched/openfda_enriched_500.json"
+DEFAULT_YOLO_MODEL = "data/models/yolo_best.pt"
+
+
+class AgentRegistry:
+    """
+    Process-wide cache of agents.
+
+    Each agent is built lazily on first use, exactly once, even when several
+    threads ask for it at the same time. Agents built from the same dataset
+    share one RAGSearchAgent, and therefore one read-only copy of the data
+    and of the TF-IDF index.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._agents = {}
+        self._key_locks = {}
+
+    def _get_or_create(self, key, factory):
+        agent = self._agents.get(key)
+        if agent is not None:
+            return agent
+
+        # One lock per key: building the vision model does not block RAG users
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            if key not in self._agents:
+                self._agents[key] = factory()
+            return self._agents[key]
+
+    def rag(self, dataset_path=DEFAULT_DATASET, backend="brute", shards=None):
+        def factory():
+            from agents.rag_search_agent import RAGSearchAgent
+            return RAGSearchAgent(dataset_path, backend=backend, shards=shards)
+
+        return self._get_or_create(("rag", dataset_path, backend, shards), factory)
+
+    def recommendation(self, dataset_path=DEFAULT_DATASET, backend="brute", shards=None):
+        def factory():
+            from agents.recommandation_agent import RecommendationAgent
+            return RecommendationAgent(dataset_path, rag=self.rag(dataset_path, backend, shards))
+
+        return self._get_or_create(("reco", dataset_path, backend, shards), factory)
+
+    def names(self, dataset_path=DEFAULT_DATASET):
+        # Built lazily by the RecommendationAgent, shared with vision users
+        return self.recommendation(dataset_path).name_index
+
+    def vision(self, model_path=DEFAULT_YOLO_MODEL, device="cpu", backend="ultralytics", threads=None):
+        def factory():
+            from agents.vision_agent import VisionAgent
+            return VisionAgent(model_path, device=device, backend=backend, threads=threads)
+
+        return self._get_or_create(("vision", model_path, device, backend, threads), factory)
+
+    def is_loaded(self, kind):
+        return any(key[0] == kind for key in list(self._agents))
+
+    def warm_up(self, recommendation=True, vision=False, background=False):
+        """
+        Builds the default agents ahead of the first request.
+        With background=True, returns the started thread immediately.
+        """
+        def run():
+            try:
+                if recommendation:
+                    self.recommendation()
+                if vision:
+                    self.vision()
+            except Exception as e:
+                print(f"[Registry] Warm-up failed: {e}")
+
+        if not background:
+            run()
+            return None
+
+        thread = threading.Thread(target=run, name="agent-warmup", daemon=True)
+        thread.start()
+        return thread
+
+
+# Shared instance used by main.py and gui_app.py
+registry = AgentRegistry()
+
+
+def get_registry():
+    return registry
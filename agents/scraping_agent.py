@@ -1,34 +1,141 @@
 import requests
 import json
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+from requests.adapters import HTTPAdapter
+
+from agents import metrics
+from agents.rate_limit import TokenBucket, backoff_delay
+
+
+class FetchError(Exception):
+    """
+    A page could not be fetched, even after retries (as opposed to the end
+    of the results, which returns an empty page).
+    """
+
+
+def drop_partial_line(path):
+    """
+    Cuts a half-written last line left by a crash, so records appended to
+    a JSONL file start on a fresh line. Only the tail of the file is read.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        f.seek(end - 1)
+        if f.read(1) == b"\n":
+            return
+
+        # On remonte par blocs depuis la fin, sans lire tout le fichier
+        pos = end
+        while pos > 0:
+            start = max(0, pos - 65536)
+            f.seek(start)
+            newline = f.read(pos - start).rfind(b"\n")
+            if newline != -1:
+                f.truncate(start + newline + 1)
+                return
+            pos = start
+        f.truncate(0)
+
 
 class ScrapingAgent:
     BASE_URL = "https://api.fda.gov/drug/label.json"
 
-    def __init__(self):
+    # OpenFDA: 240 requests per minute per key (or per IP without a key)
+    REQUESTS_PER_MINUTE = 240
+
+    # Nouvelles tentatives d'une page dont _request() a épuisé ses retries
+    PAGE_RETRIES = 2
+
+    def __init__(self, base_url=None, workers=4, requests_per_minute=REQUESTS_PER_MINUTE):
+        self.base_url = base_url or self.BASE_URL
         self.output_dir = Path("data/raw")
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
+        # Pooled keep-alive connections, shared by all fetch threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.workers = workers
+        self.rate_limiter = TokenBucket.per_minute(requests_per_minute, burst=workers)
+
     def _request(self, url, retries=5):
-        """Robust GET request with retry logic."""
+        """
+        Robust GET request with retry logic. Returns the JSON page (an empty
+        page past the last result), or raises FetchError.
+        """
         for attempt in range(1, retries + 1):
+            with metrics.span("scraper_rate_limit_wait"):
+                self.rate_limiter.acquire()
             try:
-                resp = requests.get(url, timeout=10)
+                with metrics.span("scraper_request"):
+                    resp = self.session.get(url, timeout=10)
+                metrics.inc("scraper_responses_total", status=resp.status_code)
                 print(f"[HTTP] Status: {resp.status_code}")
 
                 if resp.status_code == 200:
                     return resp.json()
 
-                time.sleep(attempt * 1.2)
+                # OpenFDA returns 404 when skip goes past the last result
+                if resp.status_code == 404:
+                    return {"results": []}
+
+                retry_after = resp.headers.get("Retry-After")
+                if resp.status_code == 429 and retry_after and retry_after.isdigit():
+                    time.sleep(int(retry_after))
+                else:
+                    time.sleep(backoff_delay(attempt))
 
             except Exception as e:
+                metrics.inc("scraper_errors_total", kind=type(e).__name__)
                 print(f"[ERROR] {e}")
-                time.sleep(attempt * 1.2)
+                time.sleep(backoff_delay(attempt))
 
+        metrics.inc("scraper_failures_total")
         print("[ERROR] Failed after retries.")
-        return None
+        raise FetchError(f"{url} failed after {retries} attempts")
+
+    def _page_url(self, skip, batch_size):
+        query = (
+            "search=purpose:*"     # take all categories for maximum variety
+        )
+        return (
+            f"{self.base_url}?{query}"
+            f"&limit={batch_size}&skip={skip}"
+        )
+
+    @staticmethod
+    def project(entry):
+        """
+        Keeps the fields we use from one OpenFDA label.
+        Returns (brand, record), or None for labels without a brand name.
+        """
+        openfda = entry.get("openfda", {})
+        brand = openfda.get("brand_name", ["UNKNOWN"])[0]
+
+        if brand == "UNKNOWN":
+            return None
+
+        return brand, {
+            "name": brand,
+            "generic_name": openfda.get("generic_name", [""])[0],
+            "substance_name": openfda.get("substance_name", [""])[0],
+            "purpose": entry.get("purpose", [""])[0],
+            "indications_and_usage": entry.get("indications_and_usage", [""])[0],
+            "warnings": entry.get("warnings", [""])[0],
+            "adverse_reactions": entry.get("adverse_reactions", [""])[0],
+            "dosage_and_administration": entry.get("dosage_and_administration", [""])[0],
+        }
 
     def fetch_paginated(self, target_total=500, batch_size=100):
         """
@@ -43,47 +150,147 @@ class ScrapingAgent:
 
             print(f"\n[Batch] skip={skip}, current={len(final_data)}")
 
-            query = (
-                "search=purpose:*"     # take all categories for maximum variety
-            )
-            url = (
-                f"{self.BASE_URL}?{query}"
-                f"&limit={batch_size}&skip={skip}"
-            )
-
-            data = self._request(url)
+            try:
+                data = self._request(self._page_url(skip, batch_size))
+            except FetchError as e:
+                # Pas la fin des résultats : on le signale au lieu de tronquer en silence
+                print(f"[ERROR] Stopping at skip={skip}, dataset incomplete: {e}")
+                break
 
-            if not data or "results" not in data or len(data["results"]) == 0:
+            if "results" not in data or len(data["results"]) == 0:
                 print("[INFO] End of available OpenFDA results.")
                 break
 
             for entry in data["results"]:
-                brand = entry.get("openfda", {}).get("brand_name", ["UNKNOWN"])[0]
-
-                if brand == "UNKNOWN":
+                projected = self.project(entry)
+                if projected is None:
                     continue
 
                 # add clean record
-                final_data[brand] = {
-                    "name": brand,
-                    "generic_name": entry.get("openfda", {}).get("generic_name", [""])[0],
-                    "substance_name": entry.get("openfda", {}).get("substance_name", [""])[0],
-                    "purpose": entry.get("purpose", [""])[0],
-                    "indications_and_usage": entry.get("indications_and_usage", [""])[0],
-                    "warnings": entry.get("warnings", [""])[0],
-                    "adverse_reactions": entry.get("adverse_reactions", [""])[0],
-                    "dosage_and_administration": entry.get("dosage_and_administration", [""])[0],
-                }
+                brand, record = projected
+                final_data[brand] = record
 
                 if len(final_data) >= target_total:
                     break
 
             skip += batch_size
-            time.sleep(1.3)      # avoid rate limiting
 
         print(f"\n[ScrapingAgent] FINAL CLEAN COUNT: {len(final_data)}")
         return final_data
 
+    def fetch_concurrent(self, target_total=500, batch_size=100,
+                         out_path="data/raw/openfda_stream.jsonl", checkpoint_path=None):
+        """
+        Fetches pages in parallel (bounded by `workers` and the rate limiter)
+        and streams records to a JSONL file as they arrive.
+
+        Pages are committed in `skip` order: once all of a page's records are
+        written, the checkpoint is advanced past it. Re-running with the same
+        paths resumes from the last committed `skip`.
+
+        A page that still fails after PAGE_RETRIES more attempts stops the
+        crawl at that page (reported, and resumable), instead of being taken
+        for the end of the results.
+        """
+        out_path = Path(out_path)
+        checkpoint_path = Path(checkpoint_path or str(out_path) + ".ckpt")
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+
+        final_data = {}
+        if out_path.exists():
+            drop_partial_line(out_path)
+            final_data = self.load_jsonl(out_path)
+        skip = self._read_checkpoint(checkpoint_path)
+        if skip:
+            print(f"[ScrapingAgent] Resuming at skip={skip} with {len(final_data)} drugs.")
+
+        print(f"[ScrapingAgent] Fetching ≈{target_total} drugs with {self.workers} workers…")
+
+        done = len(final_data) >= target_total
+        with ThreadPoolExecutor(max_workers=self.workers) as executor, \
+                open(out_path, "a", encoding="utf-8") as out:
+            pending = {}
+            next_submit = skip
+            page_retries = 0
+
+            while not done:
+                # Garder `workers` pages en vol, dans l'ordre des skip
+                while len(pending) < self.workers:
+                    url = self._page_url(next_submit, batch_size)
+                    pending[next_submit] = executor.submit(self._request, url)
+                    next_submit += batch_size
+
+                try:
+                    data = pending.pop(skip).result()
+                except FetchError as e:
+                    if page_retries < self.PAGE_RETRIES:
+                        page_retries += 1
+                        print(f"[WARN] Page skip={skip} failed, retrying ({page_retries}/{self.PAGE_RETRIES})...")
+                        pending[skip] = executor.submit(self._request, self._page_url(skip, batch_size))
+                        continue
+                    metrics.inc("scraper_failed_pages_total")
+                    print(f"[ERROR] Stopping at skip={skip}, dataset incomplete: {e}. "
+                          f"Run again with the same paths to resume.")
+                    break
+                page_retries = 0
+
+                if not data.get("results"):
+                    print("[INFO] End of available OpenFDA results.")
+                    break
+
+                for entry in data["results"]:
+                    projected = self.project(entry)
+                    if projected is None:
+                        continue
+
+                    brand, record = projected
+                    final_data[brand] = record
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+                    if len(final_data) >= target_total:
+                        done = True
+                        break
+                else:
+                    # Page entièrement consommée : le checkpoint peut la dépasser
+                    skip += batch_size
+
+                out.flush()
+                self._write_checkpoint(checkpoint_path, skip, len(final_data))
+                print(f"[Batch] committed skip={skip}, current={len(final_data)}")
+
+            for future in pending.values():
+                future.cancel()
+
+        print(f"\n[ScrapingAgent] FINAL CLEAN COUNT: {len(final_data)}")
+        return final_data
+
+    @staticmethod
+    def _read_checkpoint(path):
+        if not Path(path).exists():
+            return 0
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("next_skip", 0)
+
+    @staticmethod
+    def _write_checkpoint(path, next_skip, count):
+        tmp = Path(str(path) + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"next_skip": next_skip, "count": count}, f)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def load_jsonl(path):
+        """
+        Reads a streamed JSONL crawl back into {brand: record} (last wins).
+        """
+        data = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    data[record["name"]] = record
+        return data
+
     def save(self, data, filename="openfda_500.json"):
         path = self.output_dir / filename
         with open(path, "w", encoding="utf-8") as f:
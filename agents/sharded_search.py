@@ -0,0 +1,346 @@
+import itertools
+import multiprocessing as mp
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from multiprocessing import shared_memory
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from agents import metrics
+from agents.tfidf_index import RowFilter, top_k_indices
+
+# Nombre max de scores denses (requêtes x documents) par bloc et par shard
+MAX_SCORE_CELLS = 1 << 22
+
+# Filtres gardés par chaque worker ; le parent suit les mêmes LRU pour savoir
+# quels masques il n'a plus besoin d'envoyer
+WORKER_FILTERS = 8
+
+
+def _layout(matrix):
+    """
+    Offsets of a CSR matrix's arrays inside one shared memory block.
+    """
+    layout, size = {}, 0
+    for key in ("data", "indices", "indptr"):
+        arr = getattr(matrix, key)
+        layout[key] = (size, arr.dtype.str, arr.shape[0])
+        size += arr.nbytes
+        size += -size % 8
+    return layout, max(size, 8)
+
+
+def _arrays(shm, layout):
+    return {
+        key: np.ndarray((length,), dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+        for key, (offset, dtype, length) in layout.items()
+    }
+
+
+def _view(shm, layout, shape):
+    arrays = _arrays(shm, layout)
+    return csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]), shape=shape, copy=False)
+
+
+def search_shard(matrix, query_matrix, top_k, row_offset, row_filter=None):
+    """
+    Top-k of every query row over one shard. Returns (ids, scores), two
+    (queries x k) arrays; ids are global row numbers. With `row_filter`
+    (a RowFilter over this shard), only the allowed rows are ranked.
+    """
+    n_rows = matrix.shape[0] if row_filter is None else row_filter.n_rows
+    k = min(top_k, matrix.shape[0] if row_filter is None else row_filter.n_allowed)
+    n_queries = query_matrix.shape[0]
+    ids = np.empty((n_queries, k), dtype=np.int64)
+    scores = np.empty((n_queries, k), dtype=np.float64)
+
+    chunk_size = max(1, MAX_SCORE_CELLS // max(n_rows, 1))
+    for start in range(0, n_queries, chunk_size):
+        chunk = query_matrix[start:start + chunk_size]
+        if row_filter is None:
+            block = (matrix @ chunk.T).T.toarray()
+        else:
+            block = row_filter.scores(chunk)
+        for row, row_scores in enumerate(block, start):
+            if row_filter is None:
+                best = top_k_indices(row_scores, k)
+                ids[row] = best + row_offset
+                scores[row] = row_scores[best]
+            else:
+                best_ids, scores[row] = row_filter.top_k(row_scores, k)
+                ids[row] = best_ids + row_offset
+    return ids, scores
+
+
+def _worker_main(conn, shm_name, layout, shape, row_offset):
+    # Processus fils : s'attache au bloc partagé, sans copie du shard
+    shm = shared_memory.SharedMemory(name=shm_name)
+    matrix = _view(shm, layout, shape)
+    # Filtre -> RowFilter ; le masque n'arrive qu'au premier lot qui l'utilise
+    filters = OrderedDict()
+    conn.send(("ready",))
+    try:
+        while True:
+            message = conn.recv()
+            if message[0] == "stop":
+                break
+            _, data, indices, indptr, n_terms, top_k, filter_id, allowed = message
+            row_filter = None
+            if filter_id is not None:
+                if allowed is not None:
+                    filters[filter_id] = RowFilter(matrix, allowed)
+                    if len(filters) > WORKER_FILTERS:
+                        filters.popitem(last=False)
+                filters.move_to_end(filter_id)
+                row_filter = filters[filter_id]
+            query = csr_matrix((data, indices, indptr), shape=(len(indptr) - 1, n_terms))
+            conn.send(("ok",) + search_shard(matrix, query, top_k, row_offset, row_filter))
+    except (EOFError, KeyboardInterrupt):
+        # Le parent est parti
+        pass
+    finally:
+        # Les RowFilter gardent aussi des vues sur le bloc
+        filters.clear()
+        del matrix
+        shm.close()
+
+
+def _shutdown(workers, blocks):
+    for worker in workers:
+        if worker is None:
+            continue
+        process, conn = worker
+        try:
+            conn.send(("stop",))
+        except OSError:
+            pass
+        process.join(timeout=2)
+        if process.is_alive():
+            process.kill()
+            process.join(timeout=2)
+        conn.close()
+    workers.clear()
+    for shm in blocks:
+        try:
+            shm.close()
+        except BufferError:
+            # Des vues du parent existent encore : le bloc sera libéré avec elles
+            pass
+        shm.unlink()
+    blocks.clear()
+
+
+class ShardedSearch:
+    """
+    Brute-force TF-IDF search spread over worker processes.
+
+    The rows of the TF-IDF matrix are cut into `n_shards` contiguous
+    shards of about the same number of non-zeros. Each shard is copied
+    once into a shared memory block; its worker process maps that block
+    instead of receiving a copy. A query batch is sent to every shard,
+    each worker returns its own top-k, and the partial lists are merged.
+    Ties are broken by lowest row number, so results are the same as
+    RAGSearchAgent's brute backend.
+
+    A worker that dies or does not answer within `timeout` seconds is
+    restarted; the batch it was handling is scored in this process from
+    the same shared block, so callers only see a slower request.
+    """
+
+    # Démarrage d'un worker (spawn : nouvel interpréteur + numpy/scipy)
+    START_TIMEOUT = 60.0
+
+    def __init__(self, tfidf_matrix, n_shards=None, timeout=30.0):
+        n_docs = tfidf_matrix.shape[0]
+        self.n_shards = max(1, min(n_shards or os.cpu_count() or 1, n_docs))
+        self.n_terms = tfidf_matrix.shape[1]
+        self.timeout = timeout
+        self.restarts = 0
+        self.fallbacks = 0
+        self._lock = threading.Lock()
+        # spawn : pas de fork d'un processus qui a déjà des threads
+        self._context = mp.get_context("spawn")
+
+        # Coupes équilibrées sur le nombre de non-zéros
+        indptr = np.asarray(tfidf_matrix.indptr)
+        targets = np.linspace(0, indptr[-1], self.n_shards + 1)[1:-1]
+        cuts = np.searchsorted(indptr, targets).tolist()
+        self.bounds = list(zip([0] + cuts, cuts + [n_docs]))
+
+        self._blocks = []
+        self._shards = []
+        self._workers = [None] * self.n_shards
+        # shard -> échéance de démarrage, tant que le worker n'a pas dit "ready"
+        self._booting = {}
+        # Masque de filtre -> (masque, numéro, masques locaux par shard)
+        self._filters = OrderedDict()
+        self._filter_ids = itertools.count()
+        # Numéros des filtres que chaque worker a déjà reçus (même LRU que le worker)
+        self._sent = [OrderedDict() for _ in range(self.n_shards)]
+        self._finalizer = weakref.finalize(self, _shutdown, self._workers, self._blocks)
+        for start, end in self.bounds:
+            part = tfidf_matrix[start:end]
+            layout, size = _layout(part)
+            shm = shared_memory.SharedMemory(create=True, size=size)
+            self._blocks.append(shm)
+            # Remplir avant de créer la vue CSR (scipy tronque data à indptr[-1])
+            for key, arr in _arrays(shm, layout).items():
+                arr[:] = getattr(part, key)
+            self._shards.append((shm.name, layout, part.shape, start, _view(shm, layout, part.shape)))
+
+        for shard in range(self.n_shards):
+            self._start_worker(shard)
+
+        # Attend que chaque worker soit attaché à son shard
+        for shard, (process, conn) in enumerate(self._workers):
+            if not conn.poll(max(0.0, self._booting[shard] - time.monotonic())):
+                self.close()
+                raise TimeoutError(f"[Shards] {process.name} did not start in {self.START_TIMEOUT}s")
+            conn.recv()
+            del self._booting[shard]
+
+        print(f"[Shards] {self.n_shards} worker processes over {n_docs} documents.")
+
+    def _start_worker(self, shard):
+        name, layout, shape, row_offset, _ = self._shards[shard]
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, name, layout, shape, row_offset),
+            name=f"rag-shard-{shard}",
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        self._workers[shard] = (process, parent_conn)
+        self._booting[shard] = time.monotonic() + self.START_TIMEOUT
+
+    def _restart_worker(self, shard):
+        process, conn = self._workers[shard]
+        if process.is_alive():
+            # SIGKILL : un worker bloqué (ou stoppé) ignore SIGTERM
+            process.kill()
+        process.join(timeout=2)
+        conn.close()
+        self.restarts += 1
+        self._sent[shard].clear()
+        metrics.inc("rag_shard_restarts_total", shard=str(shard))
+        print(f"[Shards] Worker {shard} failed (exit code {process.exitcode}), restarting...")
+        self._start_worker(shard)
+
+    def _receive(self, shard, deadline):
+        _, conn = self._workers[shard]
+        # Un worker redémarré a droit à son délai de démarrage
+        deadline = max(deadline, self._booting.get(shard, 0.0))
+        while True:
+            if not conn.poll(max(0.0, deadline - time.monotonic())):
+                raise TimeoutError(f"[Shards] Worker {shard} did not answer in {self.timeout}s")
+            message = conn.recv()
+            if message[0] != "ready":
+                return message
+            self._booting.pop(shard, None)
+
+    def search(self, query_matrix, top_k, allowed=None):
+        """
+        Returns one (doc_indices, scores) pair per query row, best first.
+        `allowed` is an optional boolean mask of the documents to score.
+        """
+        query_matrix = query_matrix.tocsr()
+        query = (query_matrix.data, query_matrix.indices, query_matrix.indptr, self.n_terms, top_k)
+
+        with self._lock:
+            if not self._finalizer.alive:
+                raise RuntimeError("[Shards] Sharded search is closed")
+
+            filter_id, local_masks = self._filter(allowed)
+            failed = set()
+            for shard, (_, conn) in enumerate(self._workers):
+                try:
+                    conn.send(("search",) + query + self._filter_message(shard, filter_id, local_masks))
+                except OSError:
+                    failed.add(shard)
+
+            deadline = time.monotonic() + self.timeout
+            parts = []
+            for shard in range(self.n_shards):
+                if shard not in failed:
+                    try:
+                        _, ids, scores = self._receive(shard, deadline)
+                        parts.append((ids, scores))
+                        continue
+                    except (EOFError, OSError, TimeoutError):
+                        failed.add(shard)
+
+                # Repli : on score ce shard ici, depuis le même bloc partagé
+                self.fallbacks += 1
+                _, _, _, row_offset, view = self._shards[shard]
+                row_filter = None if local_masks is None else RowFilter(view, local_masks[shard])
+                parts.append(search_shard(view, query_matrix, top_k, row_offset, row_filter))
+
+            for shard in failed:
+                self._restart_worker(shard)
+
+        ids = np.concatenate([p[0] for p in parts], axis=1)
+        scores = np.concatenate([p[1] for p in parts], axis=1)
+        k = min(top_k, ids.shape[1])
+
+        results = []
+        for row_ids, row_scores in zip(ids, scores):
+            order = np.lexsort((row_ids, -row_scores))[:k]
+            results.append((row_ids[order], row_scores[order]))
+        return results
+
+    def _filter(self, allowed):
+        """
+        (filter id, per-shard local masks) for a document mask, reused while
+        the same mask object comes back (FilterIndex caches its masks).
+        """
+        if allowed is None:
+            return None, None
+        key = id(allowed)
+        cached = self._filters.get(key)
+        if cached is not None and cached[0] is allowed and not allowed.flags.writeable:
+            self._filters.move_to_end(key)
+            return cached[1], cached[2]
+
+        filter_id = next(self._filter_ids)
+        local_masks = [np.ascontiguousarray(allowed[start:end]) for start, end in self.bounds]
+        # Gardé avec le masque : son id ne peut pas être réutilisé tant qu'il est ici
+        self._filters[key] = (allowed, filter_id, local_masks)
+        while len(self._filters) > WORKER_FILTERS:
+            self._filters.popitem(last=False)
+        return filter_id, local_masks
+
+    def _filter_message(self, shard, filter_id, local_masks):
+        # Le masque ne part qu'une fois par worker : ensuite le numéro suffit
+        if filter_id is None:
+            return None, None
+        sent = self._sent[shard]
+        if filter_id in sent:
+            sent.move_to_end(filter_id)
+            return filter_id, None
+        sent[filter_id] = True
+        if len(sent) > WORKER_FILTERS:
+            sent.popitem(last=False)
+        return filter_id, local_masks[shard]
+
+    def stats(self):
+        return {
+            "shards": self.n_shards,
+            "alive": sum(1 for process, _ in self._workers if process.is_alive()),
+            "restarts": self.restarts,
+            "fallbacks": self.fallbacks,
+        }
+
+    def close(self):
+        """
+        Stops the workers and frees the shared memory blocks.
+        """
+        with self._lock:
+            # Les vues sur les blocs doivent disparaître avant shm.close()
+            self._shards.clear()
+            self._finalizer()
@@ -0,0 +1,372 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    # Windows : verrou par msvcrt
+    fcntl = None
+    import msvcrt
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from agents import metrics
+from agents.filter_index import FilterIndex
+
+# Bump when the on-disk layout changes so old snapshots are rebuilt.
+SNAPSHOT_VERSION = 2
+
+VECTORIZER_PARAMS = {"stop_words": "english"}
+
+# Default token_pattern of scikit-learn's vectorizers
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+
+def document_text(entry):
+    """
+    Text indexed for one medication, built from the enriched fields.
+    """
+    return " ".join([
+        entry.get("clean_indications", ""),
+        " ".join(entry.get("symptoms", [])),
+        " ".join(entry.get("tags", [])),
+        entry.get("category", "")
+    ])
+
+
+@contextmanager
+def index_lock(index_dir):
+    """
+    Exclusive lock on `<index_dir>.lock`, held while an index directory is
+    rebuilt and swapped in, so concurrent processes never write it together.
+    """
+    index_dir = Path(index_dir)
+    index_dir.parent.mkdir(parents=True, exist_ok=True)
+    # Le fichier de verrou reste en place : le supprimer rouvrirait la course
+    with open(index_dir.with_name(index_dir.name + ".lock"), "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK abandonne après ~10 s : on réessaie
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def replace_index_dir(index_dir, write):
+    """
+    Calls write(tmp_dir) on a new, uniquely named directory next to
+    `index_dir`, then swaps it in, so readers never see a half-written
+    index. Callers hold index_lock(index_dir).
+    """
+    index_dir = Path(index_dir)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=index_dir.name + ".tmp-", dir=index_dir.parent))
+    try:
+        # mkdtemp crée le dossier en 0700
+        os.chmod(tmp_dir, 0o755)
+        write(tmp_dir)
+        if index_dir.exists():
+            old_dir = Path(tempfile.mkdtemp(prefix=index_dir.name + ".old-", dir=index_dir.parent))
+            # Remplace le dossier vide créé par mkdtemp (rename atomique)
+            os.replace(index_dir, old_dir)
+            os.replace(tmp_dir, index_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
+        else:
+            os.replace(tmp_dir, index_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def build_corpus(data):
+    """
+    Builds one TF-IDF document per medication.
+    """
+    return [document_text(entry) for entry in data.values()]
+
+
+def default_index_dir(dataset_path):
+    """
+    data/enriched/foo.json -> data/enriched/foo.index/
+    """
+    path = Path(dataset_path)
+    return path.with_name(path.stem + ".index")
+
+
+class TfidfSnapshot:
+    """
+    Fitted TF-IDF index that can be saved to disk and reopened memory-mapped.
+
+    Layout of a snapshot directory:
+        meta.json     format version, dataset hash, shape, vectorizer params
+        vocab.json    terms ordered by column index
+        names.json    drug names ordered by row index
+        idf.npy       IDF weights
+        data.npy, indices.npy, indptr.npy   CSR arrays of the TF-IDF matrix
+        filters.json, filter_rows.npy       metadata posting lists (FilterIndex)
+    """
+
+    ARRAYS = ("idf", "data", "indices", "indptr")
+
+    def __init__(self, vectorizer, matrix, drug_names, dataset_hash, filters=None):
+        self.vectorizer = vectorizer
+        self.matrix = matrix
+        self.drug_names = drug_names
+        self.dataset_hash = dataset_hash
+        self.filters = filters
+
+    @classmethod
+    def build(cls, data, dataset_hash):
+        # scikit-learn n'est importé que pour le fit (~1 s au démarrage)
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        vectorizer = TfidfVectorizer(**VECTORIZER_PARAMS)
+        with metrics.span("rag_fit"):
+            matrix = vectorizer.fit_transform(build_corpus(data)).tocsr()
+            matrix.sort_indices()
+        filters = FilterIndex.build(data)
+        return cls(vectorizer, matrix, list(data.keys()), dataset_hash, filters)
+
+    def save(self, index_dir):
+        """
+        Writes the snapshot into a temporary directory, then swaps it in
+        (see replace_index_dir), under the index lock.
+        """
+        with index_lock(index_dir):
+            replace_index_dir(index_dir, self._write)
+
+    def _write(self, tmp_dir):
+        vocab = [None] * len(self.vectorizer.vocabulary_)
+        for term, col in self.vectorizer.vocabulary_.items():
+            vocab[col] = term
+
+        arrays = {
+            "idf": np.asarray(self.vectorizer.idf_, dtype=np.float64),
+            "data": np.asarray(self.matrix.data, dtype=np.float64),
+            "indices": np.asarray(self.matrix.indices, dtype=np.int32),
+            "indptr": np.asarray(self.matrix.indptr, dtype=np.int32),
+        }
+        for key, arr in arrays.items():
+            np.save(tmp_dir / f"{key}.npy", arr)
+
+        with open(tmp_dir / "vocab.json", "w", encoding="utf-8") as f:
+            json.dump(vocab, f, ensure_ascii=False)
+        with open(tmp_dir / "names.json", "w", encoding="utf-8") as f:
+            json.dump(self.drug_names, f, ensure_ascii=False)
+        self.filters.save(tmp_dir)
+
+        # meta.json is written last: its presence marks a complete snapshot
+        meta = {
+            "version": SNAPSHOT_VERSION,
+            "dataset_sha256": self.dataset_hash,
+            "shape": list(self.matrix.shape),
+            "vectorizer": VECTORIZER_PARAMS,
+        }
+        with open(tmp_dir / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=4)
+
+    @staticmethod
+    def read_meta(index_dir):
+        meta_path = Path(index_dir) / "meta.json"
+        if not meta_path.exists():
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @classmethod
+    def is_fresh(cls, index_dir, dataset_hash):
+        meta = cls.read_meta(index_dir)
+        return (
+            meta is not None
+            and meta.get("version") == SNAPSHOT_VERSION
+            and meta.get("dataset_sha256") == dataset_hash
+            and meta.get("vectorizer") == VECTORIZER_PARAMS
+        )
+
+    @classmethod
+    def load(cls, index_dir, mmap=True):
+        """
+        Opens a snapshot. With mmap=True the CSR arrays stay backed by the
+        page cache, so several worker processes share the same pages.
+        """
+        index_dir = Path(index_dir)
+        meta = cls.read_meta(index_dir)
+        if meta is None:
+            raise FileNotFoundError(f"[Index] No snapshot in {index_dir}")
+
+        mode = "r" if mmap else None
+        arrays = {key: np.load(index_dir / f"{key}.npy", mmap_mode=mode) for key in cls.ARRAYS}
+
+        with open(index_dir / "vocab.json", "r", encoding="utf-8") as f:
+            vocab = json.load(f)
+        with open(index_dir / "names.json", "r", encoding="utf-8") as f:
+            drug_names = json.load(f)
+
+        vectorizer = QueryVectorizer(vocab, arrays["idf"])
+
+        matrix = csr_matrix(
+            (arrays["data"], arrays["indices"], arrays["indptr"]),
+            shape=tuple(meta["shape"]),
+            copy=False
+        )
+
+        filters = FilterIndex.load(index_dir, mmap=mmap)
+        return cls(vectorizer, matrix, drug_names, meta["dataset_sha256"], filters)
+
+    @classmethod
+    def load_or_build(cls, data, dataset_hash, index_dir, mmap=True):
+        """
+        Returns the snapshot in `index_dir`, rebuilding it if it is missing
+        or was built from a different version of the dataset.
+        """
+        if cls.is_fresh(index_dir, dataset_hash):
+            print(f"[Index] Loading TF-IDF snapshot from {index_dir}...")
+            try:
+                return cls.load(index_dir, mmap=mmap)
+            except FileNotFoundError:
+                # Remplacé pendant la lecture : on relit sous le verrou
+                pass
+
+        with index_lock(index_dir):
+            # Un autre processus a pu reconstruire pendant qu'on attendait le verrou
+            if cls.is_fresh(index_dir, dataset_hash):
+                print(f"[Index] Loading TF-IDF snapshot rebuilt by another process from {index_dir}...")
+                return cls.load(index_dir, mmap=mmap)
+
+            print(f"[Index] Snapshot missing or stale, rebuilding {index_dir}...")
+            snapshot = cls.build(data, dataset_hash)
+            replace_index_dir(index_dir, snapshot._write)
+            return cls.load(index_dir, mmap=mmap) if mmap else snapshot
+
+
+class QueryVectorizer:
+    """
+    Transform-only twin of the fitted TfidfVectorizer, rebuilt from a
+    snapshot's vocabulary and IDF weights without importing scikit-learn.
+
+    With unigrams, dropping stop words is the same as ignoring terms that
+    are not in the vocabulary, so transform() gives the same vectors as
+    the original vectorizer: raw counts x IDF, L2-normalized.
+    """
+
+    def __init__(self, vocab, idf):
+        self.vocabulary_ = {term: col for col, term in enumerate(vocab)}
+        self.idf_ = np.asarray(idf)
+
+    def build_analyzer(self):
+        vocabulary = self.vocabulary_
+
+        def analyze(doc):
+            return [t for t in TOKEN_PATTERN.findall(doc.lower()) if t in vocabulary]
+        return analyze
+
+    def transform(self, docs):
+        analyze = self.build_analyzer()
+        data, indices, indptr = [], [], [0]
+        for doc in docs:
+            counts = Counter(self.vocabulary_[t] for t in analyze(doc))
+            cols = sorted(counts)
+            weights = np.array([counts[c] for c in cols], dtype=np.float64) * self.idf_[cols]
+            norm = np.sqrt(np.dot(weights, weights))
+            if norm > 0:
+                weights /= norm
+            data.append(weights)
+            indices.extend(cols)
+            indptr.append(len(indices))
+
+        return csr_matrix(
+            (np.concatenate(data) if data else np.empty(0), np.array(indices, dtype=np.int32), indptr),
+            shape=(len(indptr) - 1, len(self.vocabulary_))
+        )
+
+
+def top_k_indices(scores, k):
+    """
+    Indices of the k highest scores, best first, ties broken by lowest index.
+
+    Uses argpartition (O(n)) instead of a full argsort; only the k selected
+    entries are sorted.
+    """
+    n = scores.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    if k < n:
+        candidates = np.argpartition(scores, n - k)[n - k:]
+        kth = scores[candidates].min()
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)[:k - len(above)]
+        selected = np.concatenate([above, ties])
+    else:
+        selected = np.arange(n)
+
+    order = np.lexsort((selected, -scores[selected]))
+    return selected[order]
+
+
+class RowFilter:
+    """
+    Scoring restricted to the rows of a matrix allowed by a boolean mask.
+
+    When few rows are allowed they are sliced out once and kept, so each
+    query only scores them. When most rows are allowed (above
+    MASK_SCORES_SHARE) the slice would nearly copy the matrix: the whole
+    matrix is scored instead and the other rows get -inf. Build one per
+    mask and reuse it across batches.
+    """
+
+    MASK_SCORES_SHARE = 0.5
+
+    def __init__(self, matrix, allowed):
+        self.allowed = allowed
+        self.n_allowed = int(np.count_nonzero(allowed))
+        if self.n_allowed >= self.MASK_SCORES_SHARE * len(allowed):
+            self.doc_ids = None
+            self.matrix = matrix
+            self.blocked = np.flatnonzero(~allowed)
+        else:
+            self.doc_ids = np.flatnonzero(allowed)
+            self.matrix = matrix[self.doc_ids]
+            self.blocked = None
+
+    @property
+    def n_rows(self):
+        # Colonnes de la matrice de scores
+        return self.matrix.shape[0]
+
+    def scores(self, query_matrix):
+        """
+        Dense (queries x n_rows) scores; blocked rows are -inf.
+        """
+        scores = (self.matrix @ query_matrix.T).T.toarray()
+        if self.blocked is not None:
+            scores[:, self.blocked] = -np.inf
+        return scores
+
+    def top_k(self, scores, k):
+        """
+        (row ids, scores) of the k best allowed rows for one row of scores().
+        """
+        indices = top_k_indices(scores, min(k, self.n_allowed))
+        ids = indices if self.doc_ids is None else self.doc_ids[indices]
+        return ids, scores[indices]
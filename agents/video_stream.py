@@ -0,0 +1,150 @@
+import queue
+import threading
+
+import cv2
+import numpy as np
+
+_END = object()
+
+
+def _close(items):
+    # Generators: runs their finally blocks now rather than at garbage collection
+    close = getattr(items, "close", None)
+    if close is not None:
+        close()
+
+
+def iter_frames(video_path, stride=1):
+    """
+    Yields (frame_index, timestamp_s, frame) from a video file, one decoded
+    frame at a time. With stride > 1, only every stride-th frame is decoded
+    (the others are grabbed and skipped, which is much cheaper).
+    """
+    capture = cv2.VideoCapture(str(video_path))
+    if not capture.isOpened():
+        raise FileNotFoundError(f"[VisionAgent] Cannot open video: {video_path}")
+
+    fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+    index = 0
+    try:
+        while True:
+            if index % stride:
+                if not capture.grab():
+                    break
+                index += 1
+                continue
+            ok, frame = capture.read()
+            if not ok:
+                break
+            yield index, index / fps, frame
+            index += 1
+    finally:
+        capture.release()
+
+
+def video_fps(video_path):
+    capture = cv2.VideoCapture(str(video_path))
+    fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+    capture.release()
+    return fps
+
+
+def thumbnail(frame, size=(64, 36)):
+    """
+    Tiny grayscale copy used to compare frames cheaply.
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+def sample_frames(frames, diff_threshold=8.0, max_gap=2.0, stats=None):
+    """
+    Filters a (index, timestamp, frame) stream, dropping near-duplicates.
+
+    A frame is kept when its thumbnail differs from the last kept one by
+    more than `diff_threshold` (mean absolute grey-level difference, 0-255),
+    or when `max_gap` seconds have passed since the last kept frame.
+    Each kept frame is yielded as (index, timestamp, frame, changed).
+    """
+    last_thumb = None
+    last_time = None
+    try:
+        for index, timestamp, frame in frames:
+            if stats is not None:
+                stats["read"] += 1
+
+            thumb = thumbnail(frame)
+            if last_thumb is None:
+                changed = True
+            else:
+                diff = float(np.abs(thumb - last_thumb).mean())
+                changed = diff > diff_threshold
+                if not changed and timestamp - last_time < max_gap:
+                    continue
+
+            last_thumb, last_time = thumb, timestamp
+            if stats is not None:
+                stats["sampled"] += 1
+            yield index, timestamp, frame, changed
+    finally:
+        # Arrêt anticipé : la source (iter_frames) libère sa capture
+        _close(frames)
+
+
+def prefetch(items, maxsize=8, drop_when_full=False, stats=None):
+    """
+    Runs the `items` generator on a background thread through a bounded
+    queue, so decoding overlaps detection while at most `maxsize` items
+    are held in memory.
+
+    With drop_when_full=True, items produced while the consumer is behind
+    are discarded instead of blocking the producer (live, keep-up mode).
+    """
+    buffer = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+    errors = []
+
+    def produce():
+        try:
+            for item in items:
+                if stop.is_set():
+                    return
+                if drop_when_full:
+                    try:
+                        buffer.put_nowait(item)
+                    except queue.Full:
+                        if stats is not None:
+                            stats["dropped"] += 1
+                else:
+                    # Timeout: notices a consumer that stopped early
+                    while not stop.is_set():
+                        try:
+                            buffer.put(item, timeout=0.1)
+                            break
+                        except queue.Full:
+                            continue
+        except Exception as e:
+            errors.append(e)
+        finally:
+            # Fermé dans ce thread (celui qui l'itère), même si le consommateur s'est arrêté
+            _close(items)
+            while not stop.is_set():
+                try:
+                    buffer.put(_END, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+    thread = threading.Thread(target=produce, name="video-reader", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _END:
+                break
+            yield item
+        if errors:
+            raise errors[0]
+    finally:
+        stop.set()
+        thread.join()
@@ -1,23 +1,69 @@
 import os
-from ultralytics import YOLO
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from agents import metrics
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+# "ultralytics": PyTorch checkpoint (.pt) through ultralytics
+# "onnx": model exported by tools/export_yolo.py, run with onnxruntime
+BACKENDS = ("ultralytics", "onnx")
 
 class VisionAgent:
     """
     Vision Agent for medication name detection using YOLOv8.
     """
 
-    def __init__(self, model_path="models/yolo_best.pt", device="cpu"):
+    def __init__(self, model_path="models/yolo_best.pt", device="cpu", backend="ultralytics", threads=None):
         """
         Initialize the vision agent with a YOLO model.
+        `threads` sets onnxruntime's intra-op threads (onnx backend only).
         """
+        if backend not in BACKENDS:
+            raise ValueError(f"[VisionAgent] Unknown backend: {backend} (expected one of {BACKENDS})")
         if not os.path.exists(model_path):
             raise FileNotFoundError(f"[VisionAgent] Model not found: {model_path}")
 
-        print(f"[VisionAgent] Loading YOLO model from {model_path} on {device}...")
+        print(f"[VisionAgent] Loading YOLO model from {model_path} on {device} ({backend})...")
+
+        # Imports locaux : le backend onnx n'a besoin ni de torch ni d'ultralytics
+        if backend == "onnx":
+            try:
+                from agents.onnx_detector import OnnxYoloDetector
+            except ImportError as e:
+                raise ImportError(
+                    f"[VisionAgent] backend='onnx' needs {e.name}: pip install -r requirements-onnx.txt"
+                ) from e
+            self.model = OnnxYoloDetector(model_path, threads=threads)
+        else:
+            from ultralytics import YOLO
+            self.model = YOLO(model_path)
 
-        self.model = YOLO(model_path)
+        self.backend = backend
         self.device = device
+        self.last_throughput = None
+        self.last_video_stats = None
 
+    def _run_model(self, **kwargs):
+        """
+        One model call, timed. Both backends report per-image preprocess /
+        inference / postprocess times (ms) in result.speed.
+        """
+        with metrics.span("vision_model", backend=self.backend):
+            results = self.model.predict(**kwargs)
+
+        if metrics.enabled():
+            for result in results:
+                speed = getattr(result, "speed", None) or {}
+                for stage in ("preprocess", "inference", "postprocess"):
+                    if speed.get(stage) is not None:
+                        metrics.observe(f"vision_{stage}_seconds", speed[stage] / 1000, backend=self.backend)
+            metrics.inc("vision_images_total", len(results), backend=self.backend)
+        return results
+
+    @metrics.timed("vision_predict", profile=True)
     def predict(self, image_path):
         """
         Predict the medication name from an input image.
@@ -27,25 +73,149 @@ class VisionAgent:
 
         print(f"[VisionAgent] Running detection on {image_path}...")
 
-        results = self.model.predict(source=image_path, device=self.device, verbose=False)
+        results = self._run_model(source=image_path, device=self.device, verbose=False)
 
         if len(results) == 0:
-            return {"detected_name": None, "confidence": 0.0, "raw": results}
+            return {"detected_name": None, "confidence": 0.0, "detections": [], "raw": results}
 
-        result = results[0]
+        summary = self._summarize(results[0])
+        summary["raw"] = results
+        return summary
 
-        if len(result.boxes) == 0:
-            return {"detected_name": None, "confidence": 0.0, "raw": results}
+    @staticmethod
+    def _summarize(result):
+        """
+        All boxes of one YOLO result (best first) plus the best one as
+        detected_name / confidence, as predict() has always returned.
+        """
+        detections = []
+        boxes = result.boxes
+        for cls, conf, xyxy in zip(boxes.cls.tolist(), boxes.conf.tolist(), boxes.xyxy.tolist()):
+            detections.append({
+                "label": result.names.get(int(cls), str(int(cls))),
+                "confidence": float(conf),
+                "box": [round(v, 1) for v in xyxy],
+            })
+        detections.sort(key=lambda d: d["confidence"], reverse=True)
 
-        box = result.boxes[0]
-        conf = float(box.conf[0])
+        if not detections:
+            return {"detected_name": None, "confidence": 0.0, "detections": []}
 
         return {
             "detected_name": "drug-name",   # only 1 class in your dataset
-            "confidence": conf,
-            "raw": results
+            "confidence": detections[0]["confidence"],
+            "detections": detections,
         }
 
+    @staticmethod
+    def list_images(source):
+        """
+        Image paths from a directory (sorted, non-recursive) or a list of paths.
+        """
+        if isinstance(source, (str, os.PathLike)) and os.path.isdir(source):
+            return sorted(
+                str(p) for p in Path(source).iterdir()
+                if p.suffix.lower() in IMAGE_EXTENSIONS
+            )
+        if isinstance(source, (str, os.PathLike)):
+            return [str(source)]
+        return [str(p) for p in source]
+
+    @staticmethod
+    def annotated_paths(paths, annotate_dir):
+        """
+        Output path of each image's annotated copy: its path relative to the
+        common folder of all inputs, so same-named images from different
+        folders do not overwrite each other.
+        """
+        if not paths:
+            return {}
+        folders = [os.path.dirname(os.path.abspath(p)) for p in paths]
+        root = os.path.commonpath(folders)
+        return {p: os.path.join(annotate_dir, os.path.relpath(os.path.abspath(p), root)) for p in paths}
+
+    def predict_images(self, images):
+        """
+        One forward pass over already decoded BGR images; None entries
+        (unreadable images) get an "error" summary.
+        """
+        readable = [img for img in images if img is not None]
+        results = iter(self._run_model(
+            source=readable,
+            device=self.device,
+            batch=len(readable),
+            verbose=False
+        ) if readable else [])
+
+        return [
+            {"error": "unreadable image"} if img is None else self._summarize(next(results))
+            for img in images
+        ]
+
+    def predict_batch(self, source, batch_size=16, workers=4, annotate_dir=None):
+        """
+        Detection over many images: a directory or a list of paths.
+
+        Images are decoded on a thread pool, one batch ahead of the model,
+        and sent to YOLO `batch_size` at a time. Each image gets all its
+        detections; with `annotate_dir`, the boxes drawn from that same
+        forward pass are written there under the image's path relative to
+        the inputs' common folder.
+        Unreadable images get an "error" entry instead of detections.
+        """
+        import cv2
+
+        paths = self.list_images(source)
+        out_paths = self.annotated_paths(paths, annotate_dir) if annotate_dir else {}
+        for folder in {os.path.dirname(p) for p in out_paths.values()}:
+            os.makedirs(folder, exist_ok=True)
+
+        print(f"[VisionAgent] Batch detection on {len(paths)} images (batch_size={batch_size})...")
+
+        batches = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+        outputs = []
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # Décodage du lot suivant pendant l'inférence du lot courant
+            pending = [pool.submit(cv2.imread, p) for p in batches[0]] if batches else []
+            for index, batch in enumerate(batches):
+                images = [future.result() for future in pending]
+                if index + 1 < len(batches):
+                    pending = [pool.submit(cv2.imread, p) for p in batches[index + 1]]
+
+                readable = [(p, img) for p, img in zip(batch, images) if img is not None]
+                results = []
+                if readable:
+                    results = self._run_model(
+                        source=[img for _, img in readable],
+                        device=self.device,
+                        batch=len(readable),
+                        verbose=False
+                    )
+                by_path = {p: r for (p, _), r in zip(readable, results)}
+
+                for path in batch:
+                    result = by_path.get(path)
+                    if result is None:
+                        outputs.append({"path": path, "error": "unreadable image"})
+                        continue
+
+                    summary = self._summarize(result)
+                    summary["path"] = path
+                    if annotate_dir:
+                        out_path = out_paths[path]
+                        cv2.imwrite(out_path, result.plot())
+                        summary["annotated"] = out_path
+                    outputs.append(summary)
+
+        elapsed = time.perf_counter() - start
+        rate = len(paths) / elapsed if elapsed > 0 else 0.0
+        self.last_throughput = rate
+        print(f"[VisionAgent] {len(paths)} images in {elapsed:.2f}s ({rate:.1f} img/s)")
+
+        return outputs
+
     
     def detect(self, image_path):
         """
@@ -54,10 +224,139 @@ class VisionAgent:
         """
         return self.predict(image_path)
 
+    def identify(self, image_path, read_text, name_index, k=3):
+        """
+        Maps each detected box to dataset medications.
+
+        The detector has a single class ("drug-name"): it finds boxes, not
+        brands. `read_text` is any callable turning a BGR crop into text
+        (an OCR engine); that text is looked up in `name_index`
+        (agents.name_index.FuzzyNameIndex). Adds "text" and "matches" to
+        every detection of the predict() summary.
+        """
+        summary = self.predict(image_path)
+        results = summary["raw"]
+        if len(results) == 0:
+            return summary
+
+        image = results[0].orig_img
+        for detection in summary["detections"]:
+            x1, y1, x2, y2 = (int(v) for v in detection["box"])
+            text = read_text(image[y1:y2, x1:x2]) if x2 > x1 and y2 > y1 else ""
+            detection["text"] = text
+            detection["matches"] = name_index.lookup(text, k=k) if text else []
+        return summary
+
+    def predict_video(self, video_path, segment_seconds=2.0, stride=1, diff_threshold=8.0,
+                      max_gap=2.0, batch_size=4, queue_size=8, drop_when_busy=False):
+        """
+        Streaming detection over a video file. Yields one summary per
+        `segment_seconds` of video, as soon as the segment is done.
+
+        Frames are decoded and de-duplicated on a reader thread (see
+        agents.video_stream) and handed over through a bounded queue; only
+        frames that changed, or one every `max_gap` seconds, reach the
+        model. Memory does not depend on the video length: at most
+        `queue_size` frames plus one batch are alive at any time.
+
+        drop_when_busy=True drops sampled frames while the detector is
+        behind instead of slowing the reader down, to keep up with
+        real time on slow CPUs.
+        """
+        from agents.video_stream import iter_frames, prefetch, sample_frames, video_fps
+
+        print(f"[VisionAgent] Streaming detection on {video_path}...")
+
+        stats = {"read": 0, "sampled": 0, "dropped": 0, "detected": 0}
+        fps = video_fps(video_path)
+        frames = sample_frames(iter_frames(video_path, stride), diff_threshold, max_gap, stats)
+        sampled = prefetch(frames, maxsize=queue_size, drop_when_full=drop_when_busy, stats=stats)
+
+        segment = None
+        start = time.perf_counter()
+
+        def new_segment(number):
+            return {
+                "segment": number,
+                "start": number * segment_seconds,
+                "end": (number + 1) * segment_seconds,
+                "frames_analyzed": 0,
+                "frames_with_detection": 0,
+                "max_confidence": 0.0,
+                "max_boxes": 0,
+                "best_frame": None,
+            }
+
+        def run_batch(batch):
+            results = self._run_model(
+                source=[frame for _, _, frame, _ in batch],
+                device=self.device,
+                batch=len(batch),
+                verbose=False
+            )
+            for (index, timestamp, _, _), result in zip(batch, results):
+                yield index, timestamp, self._summarize(result)
+
+        def detections(batch_stream):
+            batch = []
+            for item in batch_stream:
+                batch.append(item)
+                if len(batch) == batch_size:
+                    yield from run_batch(batch)
+                    batch = []
+            if batch:
+                yield from run_batch(batch)
+
+        try:
+            for index, timestamp, summary in detections(sampled):
+                number = int(timestamp // segment_seconds)
+                if segment is not None and number != segment["segment"]:
+                    yield segment
+                    segment = None
+                if segment is None:
+                    segment = new_segment(number)
+
+                segment["frames_analyzed"] += 1
+                if summary["detections"]:
+                    stats["detected"] += 1
+                    segment["frames_with_detection"] += 1
+                    segment["max_boxes"] = max(segment["max_boxes"], len(summary["detections"]))
+                    if summary["confidence"] > segment["max_confidence"]:
+                        segment["max_confidence"] = summary["confidence"]
+                        segment["best_frame"] = index
+
+            if segment is not None:
+                yield segment
+        finally:
+            # Consommateur arrêté (ou fin) : arrête le lecteur et libère la vidéo
+            sampled.close()
+
+        elapsed = time.perf_counter() - start
+        video_seconds = stats["read"] * stride / fps
+        speed = video_seconds / elapsed if elapsed > 0 else 0.0
+        self.last_video_stats = dict(stats, elapsed=elapsed, video_seconds=video_seconds, realtime_factor=speed)
+        print(f"[VisionAgent] {stats['read']} frames read, {stats['sampled']} sampled, "
+              f"{stats['dropped']} dropped, {stats['detected']} with detections; "
+              f"{video_seconds:.1f}s of video in {elapsed:.1f}s ({speed:.1f}x real time)")
+
     def save_prediction(self, image_path, out_path="vision_output.jpg"):
         """
         Saves an image with YOLO predictions drawn on it.
+        Returns the raw YOLO results, as before; see save_summary() for the
+        predict() summary.
         """
-        results = self.model.predict(source=image_path, device=self.device, save=True, save_txt=False)
-        print(f"[VisionAgent] Saved annotated result to {results[0].save_dir}")
-        return results
+        return self.save_summary(image_path, out_path)["raw"]
+
+    def save_summary(self, image_path, out_path="vision_output.jpg"):
+        """
+        Same as save_prediction(), but returns the predict() summary, from
+        the same forward pass as the annotated image.
+        """
+        import cv2
+
+        summary = self.predict(image_path)
+        results = summary["raw"]
+        if len(results) > 0:
+            cv2.imwrite(out_path, results[0].plot())
+            print(f"[VisionAgent] Saved annotated result to {out_path}")
+        return summary
@@ -1,18 +1,25 @@
 import json
 import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import messagebox, filedialog
-from agents.rag_search_agent import RAGSearchAgent
-from agents.recommandation_agent import RecommendationAgent
-from agents.vision_agent import VisionAgent
+from agents.registry import get_registry
 
 # -------------------------
 # GUI APPLICATION
 # -------------------------
 
 class MedicationApp:
-    def __init__(self, root):
+    POLL_MS = 50
+
+    def __init__(self, root, warmup=True):
         self.root = root
+        self.registry = get_registry()
+        # Agent work runs off the Tk thread so the window never freezes
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="agent")
+        # Tâches en cours -> leur message de statut (effacé quand il n'en reste plus)
+        self.in_flight = {}
         root.title("Medication Assistant")
+        root.protocol("WM_DELETE_WINDOW", self.close)
         root.geometry("650x500")
 
         title = tk.Label(root, text="Medication Assistant", font=("Arial", 20, "bold"))
@@ -45,6 +52,50 @@ class MedicationApp:
         self.output_box = tk.Text(root, height=12, width=70)
         self.output_box.pack(padx=20, pady=20)
 
+        self.status = tk.Label(root, text="", anchor="w")
+        self.status.pack(fill="x", padx=20)
+
+        if warmup:
+            self.run_in_background(
+                self.registry.warm_up, None,
+                status="Loading recommendation agent..."
+            )
+
+    # ----------------------------------------------------
+    # BACKGROUND EXECUTION
+    # ----------------------------------------------------
+    def run_in_background(self, func, on_done, *args, status=""):
+        """
+        Runs func(*args) on the executor and calls on_done(result) back on
+        the Tk thread once it finishes.
+        """
+        future = self.executor.submit(func, *args)
+        self.in_flight[future] = status
+        self.status.config(text=status)
+        self.root.after(self.POLL_MS, self._poll, future, on_done)
+
+    def _poll(self, future, on_done):
+        if not future.done():
+            self.root.after(self.POLL_MS, self._poll, future, on_done)
+            return
+
+        del self.in_flight[future]
+        # Le statut reste affiché tant qu'une autre tâche tourne
+        running = [text for text in self.in_flight.values() if text]
+        self.status.config(text=running[-1] if running else "")
+        try:
+            result = future.result()
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            return
+
+        if on_done is not None:
+            on_done(result)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
+
     # ----------------------------------------------------
     # SYMPTOM → RAG RECOMMENDATION
     # ----------------------------------------------------
@@ -54,9 +105,14 @@ class MedicationApp:
             messagebox.showwarning("Error", "Please enter symptoms.")
             return
 
-        agent = RecommendationAgent("data/enriched/openfda_enriched_500.json")
-        results = agent.recommend(symptoms)
+        def work():
+            agent = self.registry.recommendation("data/enriched/openfda_enriched_500.json")
+            return agent.recommend(symptoms)
+
+        status = "Searching..." if self.registry.is_loaded("reco") else "Loading recommendation agent..."
+        self.run_in_background(work, self.show_recommendations, status=status)
 
+    def show_recommendations(self, results):
         self.output_box.delete("1.0", tk.END)
         self.output_box.insert(tk.END, "=== RECOMMENDATIONS ===\n\n")
 
@@ -80,9 +136,14 @@ class MedicationApp:
         if not path:
             return
 
-        agent = VisionAgent("data/models/yolo_best.pt", device="cpu")
-        result = agent.detect(path)
+        def work():
+            agent = self.registry.vision("data/models/yolo_best.pt", device="cpu")
+            return agent.detect(path)
+
+        status = "Running detection..." if self.registry.is_loaded("vision") else "Loading YOLO model..."
+        self.run_in_background(work, self.show_detection, status=status)
 
+    def show_detection(self, result):
         self.output_box.delete("1.0", tk.END)
         self.output_box.insert(tk.END, "=== MEDICATION CHECK ===\n\n")
 
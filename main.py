@@ -1,14 +1,12 @@
+import argparse
 import json
-from agents.rag_search_agent import RAGSearchAgent
-from agents.recommandation_agent import RecommendationAgent
-from agents.vision_agent import VisionAgent
-from tkinter import Tk, filedialog
+from agents.registry import get_registry
 
 def symptom_flow():
     print("\n=== SYMPTOM → RECOMMENDATION ===")
     symptoms = input("Enter your symptoms: ")
 
-    agent = RecommendationAgent("data/enriched/openfda_enriched_500.json")
+    agent = get_registry().recommendation("data/enriched/openfda_enriched_500.json")
     results = agent.recommend(symptoms)
 
     print("\n=== TOP RECOMMENDATIONS ===")
@@ -20,6 +18,9 @@ def symptom_flow():
 def vision_flow():
     print("\n=== MEDICATION IMAGE VERIFICATION ===")
 
+    # Tk uniquement pour le sélecteur de fichier de ce flux
+    from tkinter import Tk, filedialog
+
     Tk().withdraw()
     image_path = filedialog.askopenfilename(
         title="Select medication picture",
@@ -32,7 +33,7 @@ def vision_flow():
 
     print(f"[Vision] Image selected: {image_path}")
 
-    agent = VisionAgent(model_path="data/models/yolo_best.pt", device="cpu")
+    agent = get_registry().vision(model_path="data/models/yolo_best.pt", device="cpu")
     result = agent.detect(image_path)
 
     print("\n=== RESULT ===")
@@ -44,6 +45,14 @@ def vision_flow():
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Medication Assistant CLI")
+    parser.add_argument("--warmup", action="store_true",
+                        help="Load the recommendation agent in the background while the menu is shown")
+    args = parser.parse_args()
+
+    if args.warmup:
+        get_registry().warm_up(background=True)
+
     print("====================================")
     print(" Medication Assistant — Multi-Agent ")
     print("====================================")
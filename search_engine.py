@@ -1,10 +1,39 @@
-import json
+import heapq
+import math
 import re
+from collections import Counter, defaultdict
+
+from agents.dataset_store import load_dataset
 
 class MedicationSearchEngine:
+    """
+    Keyword search over the raw OpenFDA dataset, scored with BM25F.
+
+    Every field is normalized and tokenized once at construction time and
+    stored in an inverted index (term -> [(doc, impact)]). A query only
+    reads the postings of its own terms, so its cost no longer depends on
+    the total text volume of the dataset.
+    """
+
+    # Poids de chaque champ dans le score
+    FIELD_BOOSTS = {
+        "name": 3.0,
+        "generic_name": 2.0,
+        "substance_name": 2.0,
+        "purpose": 1.5,
+        "indications_and_usage": 1.0,
+        "warnings": 0.5,
+    }
+
+    K1 = 1.2
+    B = 0.75
+
     def __init__(self, json_path="data/raw/openfda_500.json"):
-        with open(json_path, "r", encoding="utf-8") as f:
-            self.data = json.load(f)
+        # JSON or .medstore: long fields are only decoded while indexing
+        self.data, _ = load_dataset(json_path)
+
+        self.names = list(self.data.keys())
+        self.postings = self._build_index()
 
     def preprocess_text(self, text):
         if not text:
@@ -13,25 +42,59 @@ class MedicationSearchEngine:
         text = re.sub(r"[^a-z0-9 ]+", " ", text)
         return text
 
+    def tokenize(self, text):
+        return self.preprocess_text(text).split()
+
+    def _build_index(self):
+        n_docs = len(self.names)
+
+        # Term frequencies and lengths per field
+        field_tfs = []
+        field_lengths = {field: [] for field in self.FIELD_BOOSTS}
+        for name in self.names:
+            drug = self.data[name]
+            tfs = {}
+            for field in self.FIELD_BOOSTS:
+                tokens = self.tokenize(drug.get(field, ""))
+                tfs[field] = Counter(tokens)
+                field_lengths[field].append(len(tokens))
+            field_tfs.append(tfs)
+
+        avg_lengths = {
+            field: (sum(lengths) / n_docs if n_docs else 0.0) or 1.0
+            for field, lengths in field_lengths.items()
+        }
+
+        # BM25F: field-weighted, length-normalized term frequency per doc
+        weighted_tfs = defaultdict(list)
+        for doc, tfs in enumerate(field_tfs):
+            doc_terms = defaultdict(float)
+            for field, boost in self.FIELD_BOOSTS.items():
+                norm = 1 - self.B + self.B * field_lengths[field][doc] / avg_lengths[field]
+                for term, tf in tfs[field].items():
+                    doc_terms[term] += boost * tf / norm
+            for term, wtf in doc_terms.items():
+                weighted_tfs[term].append((doc, wtf))
+
+        # Precompute the full per-(term, doc) impact: idf * saturated tf
+        postings = {}
+        for term, entries in weighted_tfs.items():
+            df = len(entries)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            postings[term] = [
+                (doc, idf * wtf * (self.K1 + 1) / (wtf + self.K1))
+                for doc, wtf in entries
+            ]
+
+        return postings
+
     def search(self, query, top_k=5):
-        query = self.preprocess_text(query)
-        results = []
-
-        for name, drug in self.data.items():
-            combined_text = " ".join([
-                drug.get("name", ""),
-                drug.get("generic_name", ""),
-                drug.get("substance_name", ""),
-                drug.get("purpose", ""),
-                drug.get("indications_and_usage", ""),
-                drug.get("warnings", "")
-            ])
-
-            combined_text = self.preprocess_text(combined_text)
-
-            score = sum(combined_text.count(word) for word in query.split())
-            if score > 0:
-                results.append((name, score))
-
-        results.sort(key=lambda x: x[1], reverse=True)
-        return [name for name, _ in results[:top_k]]
+        scores = defaultdict(float)
+
+        for term in set(self.tokenize(query)):
+            for doc, impact in self.postings.get(term, ()):
+                scores[doc] += impact
+
+        # Best score first, dataset order on ties
+        best = heapq.nlargest(top_k, scores.items(), key=lambda x: (x[1], -x[0]))
+        return [self.names[doc] for doc, _ in best]
@@ -0,0 +1,269 @@
+"""
+Long-running local HTTP service on top of the agents.
+
+Endpoints (JSON in, JSON out):
+    POST /recommend   {"symptoms": "headache fever", "top_k": 5}
+                      optional "filter": "category:allergy NOT tag:drowsiness"
+    POST /vision      {"image_base64": "..."}
+                      or {"image_path": "box.jpg"}, relative to --image-dir
+    GET  /health
+    GET  /stats
+    GET  /metrics     Prometheus text (start with --metrics)
+
+Concurrent requests arriving within --batch-wait milliseconds are merged
+into one RecommendationAgent.recommend_batch() or one detector call.
+When all workers are busy and --queue requests are already waiting, new
+requests get 503 with a Retry-After header.
+
+Usage:
+    python server.py --port 8000
+    python server.py --port 8000 --vision --model data/models/yolo_best.pt
+"""
+import argparse
+import base64
+import json
+import os
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from agents import metrics
+from agents.filter_index import parse
+from agents.micro_batch import MicroBatcher, Overloaded
+from agents.registry import DEFAULT_DATASET, DEFAULT_YOLO_MODEL, get_registry
+
+MAX_BODY = 16 * 1024 * 1024
+
+
+class BadRequest(Exception):
+    pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Listen backlog: the default (5) resets connections under bursts
+    request_queue_size = 256
+
+
+class MedicationService:
+    def __init__(self, dataset_path=DEFAULT_DATASET, model_path=DEFAULT_YOLO_MODEL, vision=False,
+                 vision_backend="ultralytics", max_batch=32, batch_wait=0.002, max_queue=256,
+                 workers=2, request_timeout=30.0, backend="brute", shards=None, image_dir=None):
+        self.registry = get_registry()
+        self.dataset_path = dataset_path
+        self.model_path = model_path
+        self.vision_backend = vision_backend
+        self.request_timeout = request_timeout
+        # Seul dossier lisible via "image_path" (None : envoi base64 uniquement)
+        self.image_dir = os.path.realpath(image_dir) if image_dir else None
+
+        # Chargés au démarrage : la première requête ne paie pas l'initialisation
+        self.reco = self.registry.recommendation(dataset_path, backend=backend, shards=shards)
+        self.vision = self.registry.vision(model_path, backend=vision_backend) if vision else None
+
+        self.reco_batcher = MicroBatcher(
+            self._recommend_batch, max_batch, batch_wait, max_queue, workers, name="reco"
+        )
+        self.vision_batcher = MicroBatcher(
+            self.vision.predict_images, max_batch, batch_wait, max_queue, 1, name="vision"
+        ) if vision else None
+
+    def _recommend_batch(self, items):
+        # Un appel batch par couple (top_k, filtre) distinct
+        groups = defaultdict(list)
+        for i, (symptoms, top_k, filter_tree) in enumerate(items):
+            groups[top_k, filter_tree].append(i)
+
+        results = [None] * len(items)
+        for (top_k, filter_tree), positions in groups.items():
+            batch = self.reco.recommend_batch([items[i][0] for i in positions], top_k=top_k,
+                                              verbose=False, filter=filter_tree)
+            for i, recommendations in zip(positions, batch):
+                results[i] = recommendations
+        return results
+
+    def recommend(self, payload):
+        symptoms = payload.get("symptoms")
+        if not isinstance(symptoms, str) or not symptoms.strip():
+            raise BadRequest("'symptoms' must be a non-empty string")
+        top_k = payload.get("top_k", 5)
+        if not isinstance(top_k, int) or not 1 <= top_k <= 100:
+            raise BadRequest("'top_k' must be an integer between 1 and 100")
+        filter_tree = None
+        if payload.get("filter") is not None:
+            if not isinstance(payload["filter"], str):
+                raise BadRequest("'filter' must be a string")
+            # Analysé ici : une erreur de syntaxe donne un 400, pas un échec du batch
+            filter_tree = parse(payload["filter"])
+
+        future = self.reco_batcher.submit((symptoms, top_k, filter_tree), timeout=self.request_timeout)
+        return {"results": self._wait(future)}
+
+    def _wait(self, future):
+        try:
+            return future.result(timeout=self.request_timeout)
+        except TimeoutError:
+            # Encore en file : le batcher ne la calculera pas
+            future.cancel()
+            raise
+
+    def _image_file(self, image_path):
+        if self.image_dir is None:
+            raise BadRequest("'image_path' is disabled (start the server with --image-dir), send 'image_base64'")
+        path = os.path.realpath(os.path.join(self.image_dir, image_path))
+        if os.path.commonpath([path, self.image_dir]) != self.image_dir:
+            raise BadRequest("'image_path' must stay inside the image directory")
+        return path
+
+    def verify(self, payload):
+        if self.vision_batcher is None:
+            raise BadRequest("vision is disabled (start the server with --vision)")
+
+        import cv2
+        import numpy as np
+
+        # Décodage dans le thread de la requête : seul le modèle est batché
+        if "image_base64" in payload:
+            try:
+                raw = base64.b64decode(payload["image_base64"], validate=True)
+            except ValueError:
+                raise BadRequest("'image_base64' is not valid base64")
+            image = cv2.imdecode(np.frombuffer(raw, dtype=np.uint8), cv2.IMREAD_COLOR)
+        elif isinstance(payload.get("image_path"), str):
+            image = cv2.imread(self._image_file(payload["image_path"]))
+        else:
+            raise BadRequest("expected 'image_path' or 'image_base64'")
+
+        if image is None:
+            raise BadRequest("unreadable image")
+
+        future = self.vision_batcher.submit(image, timeout=self.request_timeout)
+        return self._wait(future)
+
+    def stats(self):
+        stats = {"recommend": self.reco_batcher.stats(), "cache": self.reco.cache_stats()}
+        if self.reco.rag.sharded_index is not None:
+            stats["shards"] = self.reco.rag.sharded_index.stats()
+        if self.vision_batcher is not None:
+            stats["vision"] = self.vision_batcher.stats()
+        return stats
+
+    def close(self):
+        self.reco_batcher.close()
+        if self.vision_batcher is not None:
+            self.vision_batcher.close()
+        self.reco.rag.close()
+
+    def handler(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are two writes: without this, keep-alive
+            # clients wait on delayed ACKs (~40 ms per request)
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload, headers=None, content_type="application/json"):
+                body = payload.encode("utf-8") if isinstance(payload, str) else json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == "/health":
+                    self._send(200, {"status": "ok", "vision": service.vision is not None})
+                elif self.path == "/stats":
+                    self._send(200, service.stats())
+                elif self.path == "/metrics":
+                    self._send(200, metrics.export_prometheus(), content_type="text/plain; version=0.0.4")
+                else:
+                    self._send(404, {"error": "not found"})
+
+            def do_POST(self):
+                routes = {"/recommend": service.recommend, "/vision": service.verify}
+                route = routes.get(self.path)
+                if route is None:
+                    self._send(404, {"error": "not found"})
+                    return
+
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    if length > MAX_BODY:
+                        raise BadRequest("request body too large")
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                    if not isinstance(payload, dict):
+                        raise BadRequest("expected a JSON object")
+                    with metrics.span("http_request", endpoint=self.path):
+                        response = route(payload)
+                    self._send(200, response)
+                except (BadRequest, ValueError) as e:
+                    self._send(400, {"error": str(e)})
+                except Overloaded as e:
+                    metrics.inc("http_rejected_total", endpoint=self.path)
+                    self._send(503, {"error": str(e)}, {"Retry-After": "1"})
+                except TimeoutError:
+                    self._send(504, {"error": "request timed out"})
+                except Exception as e:
+                    print(f"[Server] Error on {self.path}: {e}")
+                    self._send(500, {"error": "internal error"})
+
+        return Handler
+
+    def serve(self, host="127.0.0.1", port=8000):
+        httpd = _Server((host, port), self.handler())
+        print(f"[Server] Listening on http://{host}:{port}")
+        return httpd
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Medication assistant HTTP service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--dataset", default=DEFAULT_DATASET)
+    parser.add_argument("--vision", action="store_true", help="Enable the /vision endpoint")
+    parser.add_argument("--model", default=DEFAULT_YOLO_MODEL)
+    parser.add_argument("--vision-backend", default="ultralytics", choices=("ultralytics", "onnx"))
+    parser.add_argument("--image-dir", default=None,
+                        help="Directory /vision may read 'image_path' from (default: base64 uploads only)")
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--batch-wait", type=float, default=2.0, help="Batching window in milliseconds")
+    parser.add_argument("--queue", type=int, default=256, help="Max waiting requests before 503")
+    parser.add_argument("--workers", type=int, default=2, help="Concurrent recommendation batches")
+    parser.add_argument("--backend", default="brute", choices=("brute", "inverted", "sharded"),
+                        help="RAG search backend")
+    parser.add_argument("--shards", type=int, default=None,
+                        help="Worker processes for --backend sharded (default: one per CPU)")
+    parser.add_argument("--metrics", action="store_true", help="Record metrics, served on GET /metrics")
+    parser.add_argument("--profile-slow", type=float, default=None, metavar="MS",
+                        help="Sample the stacks of requests slower than MS milliseconds")
+    parser.add_argument("--profile-dir", default="data/profiles")
+    args = parser.parse_args()
+
+    if args.metrics:
+        metrics.enable()
+    if args.profile_slow is not None:
+        metrics.profile_slow(threshold=args.profile_slow / 1000, out_dir=args.profile_dir)
+
+    service = MedicationService(
+        args.dataset, args.model, vision=args.vision, vision_backend=args.vision_backend,
+        max_batch=args.max_batch, batch_wait=args.batch_wait / 1000, max_queue=args.queue,
+        workers=args.workers, backend=args.backend, shards=args.shards, image_dir=args.image_dir
+    )
+    httpd = service.serve(args.host, args.port)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[Server] Shutting down...")
+    finally:
+        httpd.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import json
+import os
+import sys
+
+import pytest
+
+# Les tests importent agents/ et tools/ depuis la racine du dépôt
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.tfidf_index import TfidfSnapshot  # noqa: E402
+from tools.synthetic_dataset import make_dataset, make_queries  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def dataset():
+    return make_dataset(400, seed=0)
+
+
+@pytest.fixture(scope="session")
+def snapshot(dataset):
+    return TfidfSnapshot.build(dataset, "test")
+
+
+@pytest.fixture(scope="session")
+def queries():
+    return make_queries(40, seed=1) + ["", "zzzunknownterm", "fever fever fever headache"]
+
+
+@pytest.fixture(scope="session")
+def dataset_path(dataset, tmp_path_factory):
+    path = tmp_path_factory.mktemp("data") / "enriched.json"
+    path.write_text(json.dumps(dataset), encoding="utf-8")
+    return str(path)
@@ -0,0 +1,50 @@
+import io
+import json
+import zipfile
+
+import pytest
+
+from agents.bulk_ingest import ChunkedStore, JSONArrayStream, ingest_bulk
+from agents.scraping_agent import ScrapingAgent
+from tools.fake_openfda_server import make_label
+
+
+def test_stream_yields_every_result_across_small_buffers():
+    results = [{"id": i, "text": "x" * (i * 7), "n": [1.5, -2e3, None, True]} for i in range(50)]
+    document = json.dumps({"meta": {"skip": [1, {"a": "}"}]}, "results": results, "after": 12345})
+    for buffer_size in (1, 3, 7, 64, 1 << 16):
+        stream = JSONArrayStream(io.StringIO(document), buffer_size=buffer_size)
+        assert list(stream) == results
+
+
+def test_stream_handles_empty_or_missing_results():
+    assert list(JSONArrayStream(io.StringIO('{"results": []}'))) == []
+    assert list(JSONArrayStream(io.StringIO("{}"))) == []
+    assert list(JSONArrayStream(io.StringIO('{"meta": 1}'))) == []
+
+
+def test_number_at_buffer_boundary_is_not_cut():
+    document = '{"results": [123456789, 42]}'
+    assert list(JSONArrayStream(io.StringIO(document), buffer_size=16)) == [123456789, 42]
+
+
+def test_malformed_document_raises():
+    with pytest.raises(ValueError):
+        list(JSONArrayStream(io.StringIO('{"results": [1 2]}')))
+    with pytest.raises(ValueError):
+        list(JSONArrayStream(io.StringIO('[1, 2]')))
+
+
+def test_ingest_bulk_zip_into_chunks(tmp_path):
+    zip_path = tmp_path / "drug-label-0001-of-0001.json.zip"
+    labels = [make_label(i) for i in range(60)]
+    with zipfile.ZipFile(zip_path, "w") as archive:
+        archive.writestr("drug-label-0001-of-0001.json", json.dumps({"meta": {}, "results": labels}))
+
+    out_dir = tmp_path / "bulk"
+    ingest_bulk([str(zip_path)], out_dir=out_dir, chunk_size=16)
+    records = list(ChunkedStore.iter_records(out_dir))
+    expected = [ScrapingAgent.project(label)[1] for label in labels if ScrapingAgent.project(label)]
+    assert records == expected
+    manifest = json.loads((out_dir / "manifest.json").read_text())
+    assert [part["count"] for part in manifest["parts"]] == [16, 16, 16, len(expected) - 48]
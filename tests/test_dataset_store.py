@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from agents.dataset_store import MedicationStore, convert_json, is_store, load_dataset
+from agents.rag_search_agent import RAGSearchAgent
+
+
+@pytest.fixture(scope="module")
+def store_path(dataset_path, tmp_path_factory):
+    path = tmp_path_factory.mktemp("store") / "enriched.medstore"
+    convert_json(dataset_path, str(path))
+    return str(path)
+
+
+def test_store_round_trips_the_json_source(dataset_path, store_path):
+    data, json_hash = load_dataset(dataset_path)
+    store, store_hash = load_dataset(store_path)
+    assert is_store(store_path) and not is_store(dataset_path)
+    # Même hash : les snapshots d'index sont partagés entre les deux formats
+    assert store_hash == json_hash
+
+    assert list(store) == list(data)
+    for name, entry in data.items():
+        assert store[name].to_dict() == entry
+    store.close()
+
+
+def test_lazy_fields_and_missing_values(tmp_path):
+    data = {
+        "Ä drug": {"name": "Ä drug", "symptoms": ["fièvre"], "extra": {"nested": [1, None]}},
+        "Plain": {"name": "Plain", "symptoms": [], "note": ""},
+        "Mixed": {"name": "Mixed", "note": 42},
+    }
+    source = tmp_path / "data.json"
+    source.write_text(json.dumps(data), encoding="utf-8")
+    convert_json(str(source), str(tmp_path / "data.medstore"))
+
+    store = MedicationStore(str(tmp_path / "data.medstore"), eager=("name",))
+    for name, entry in data.items():
+        assert store[name].to_dict() == entry
+        assert len(store[name]) == len(entry)
+    assert "extra" not in store["Plain"]
+    with pytest.raises(KeyError):
+        store["Mixed"]["symptoms"]
+    assert "Missing" not in store
+    store.close()
+
+
+def test_not_a_store_raises(tmp_path):
+    path = tmp_path / "bad.medstore"
+    path.write_bytes(b"NOTASTORE" + b"\0" * 16)
+    with pytest.raises(ValueError):
+        MedicationStore(str(path))
+
+
+def test_search_on_store_matches_json(dataset_path, store_path, queries, tmp_path):
+    from_json = RAGSearchAgent(dataset_path, index_dir=str(tmp_path / "json_idx"))
+    from_store = RAGSearchAgent(store_path, index_dir=str(tmp_path / "store_idx"))
+    for query in queries:
+        expected = from_json.search(query, top_k=5)
+        results = from_store.search(query, top_k=5)
+        assert [(r["name"], r["score"]) for r in results] == [(r["name"], r["score"]) for r in expected]
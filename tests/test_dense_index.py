@@ -0,0 +1,51 @@
+import os
+
+import numpy as np
+import pytest
+
+from agents.dense_index import DenseIndex
+
+
+@pytest.fixture(scope="module")
+def dense(snapshot):
+    return DenseIndex.build(snapshot.matrix, "test", dim=32, nlist=16)
+
+
+def test_full_probe_equals_exact(dense, snapshot, queries):
+    embeddings = dense.embed(snapshot.vectorizer.transform(queries))
+    for embedding in embeddings:
+        if not embedding.any():
+            continue
+        ids, scores = dense.search(embedding, 10, nprobe=dense.nlist)
+        exact_ids, exact_scores = dense.exact_search(embedding, 10)
+        assert ids.tolist() == exact_ids.tolist()
+        np.testing.assert_allclose(scores, exact_scores, rtol=1e-5)
+
+
+def test_filtered_search_only_returns_allowed(dense, snapshot, queries):
+    allowed = snapshot.filters.mask('category:"sleep aid"')
+    embeddings = dense.embed(snapshot.vectorizer.transform(queries))
+    for embedding in embeddings:
+        if not embedding.any():
+            continue
+        ids, _ = dense.search(embedding, 5, allowed=allowed)
+        assert len(ids) == min(5, int(allowed.sum()))
+        assert allowed[ids].all()
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+def test_saved_index_gives_the_same_results(snapshot, queries, tmp_path, dtype):
+    index_dir = tmp_path / "dense"
+    index = DenseIndex.load_or_build(snapshot.matrix, "v1", index_dir, dtype=dtype)
+    assert DenseIndex.is_fresh(index_dir, "v1", dtype)
+    # Reconstruit à la place de l'ancien, sans dossier temporaire laissé derrière
+    index.save(index_dir)
+    loaded = DenseIndex.load(index_dir)
+    assert sorted(os.listdir(tmp_path)) == ["dense", "dense.lock"]
+
+    embeddings = index.embed(snapshot.vectorizer.transform(queries[:10]))
+    for embedding in embeddings:
+        ids, scores = index.search(embedding, 5)
+        loaded_ids, loaded_scores = loaded.search(embedding, 5)
+        assert ids.tolist() == loaded_ids.tolist()
+        np.testing.assert_allclose(scores, loaded_scores)
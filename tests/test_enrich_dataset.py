@@ -0,0 +1,176 @@
+import json
+import random
+import time
+import types
+
+import pytest
+
+from tools import enrich_dataset
+from tools.enrich_dataset import DatasetEnricher
+from tools.mock_llm_server import MockLLM
+
+
+@pytest.fixture
+def mock_llm(monkeypatch):
+    # Pas de pause entre les tentatives
+    monkeypatch.setattr(enrich_dataset, "time", types.SimpleNamespace(
+        sleep=lambda seconds: None, perf_counter=time.perf_counter, time=time.time))
+    mock = MockLLM()
+    httpd, mock.base_url = mock.serve()
+    yield mock
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def raw_path(tmp_path):
+    raw = {
+        f"Brand {i}": {"name": f"Brand {i}", "indications_and_usage": f"relieves pain number {i}"}
+        for i in range(30)
+    }
+    path = tmp_path / "raw.json"
+    path.write_text(json.dumps(raw), encoding="utf-8")
+    return str(path)
+
+
+def enricher(mock, raw_path, tmp_path, **kwargs):
+    return DatasetEnricher(raw_path, str(tmp_path / "out" / "enriched.json"), base_url=mock.base_url, **kwargs)
+
+
+def test_limits_only_apply_to_concurrent_modes_by_default(mock_llm, raw_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(DatasetEnricher, "REQUESTS_PER_MINUTE", 60000)
+    monkeypatch.setattr(DatasetEnricher, "TOKENS_PER_MINUTE", 10**8)
+    assert not enricher(mock_llm, raw_path, tmp_path).rate_limited
+    assert enricher(mock_llm, raw_path, tmp_path, requests_per_minute=60).rate_limited
+
+    sequential = enricher(mock_llm, raw_path, tmp_path)
+    sequential.run_concurrent(workers=2)
+    assert sequential.rate_limited
+
+
+def test_concurrent_run_resumes_from_checkpoint(mock_llm, raw_path, tmp_path):
+    random.seed(0)
+    checkpoint = tmp_path / "ckpt.jsonl"
+    mock_llm.garbage_rate = 0.8
+    first = enricher(mock_llm, raw_path, tmp_path, requests_per_minute=60000, tokens_per_minute=10**8)
+    output = first.run_concurrent(workers=4, checkpoint_path=str(checkpoint))
+
+    done = DatasetEnricher.load_checkpoint(checkpoint)
+    assert 0 < len(done) < 30
+    for name, entry in output.items():
+        if name in done:
+            assert entry["category"] == "pain relief"
+        else:
+            # Échecs : fallback dans la sortie, absents du checkpoint
+            assert enrich_dataset.is_fallback(entry)
+
+    # Crash pendant l'écriture d'une ligne
+    with open(checkpoint, "a", encoding="utf-8") as f:
+        f.write('{"name": "Brand 0", "enri')
+    mock_llm.garbage_rate = 0.0
+    calls = mock_llm.calls
+    second = enricher(mock_llm, raw_path, tmp_path, requests_per_minute=60000, tokens_per_minute=10**8)
+    output = second.run_concurrent(workers=4, checkpoint_path=str(checkpoint))
+
+    # Seuls les échecs de la première passe sont redemandés
+    assert mock_llm.calls - calls == 30 - len(done)
+    assert not any(enrich_dataset.is_fallback(entry) for entry in output.values())
+    lines = checkpoint.read_text(encoding="utf-8").splitlines()
+    assert sorted(json.loads(line)["name"] for line in lines) == sorted(output)
+
+
+ENRICHED = {"symptoms": ["fever"], "category": "pain relief", "tags": ["otc"], "clean_indications": "Fever."}
+
+
+def test_diff_retries_fallback_entries():
+    raw = {
+        "ok": {"name": "ok", "indications_and_usage": "fever"},
+        "failed": {"name": "failed", "indications_and_usage": "cough"},
+        "edited": {"name": "edited", "indications_and_usage": "new text"},
+        "new": {"name": "new", "indications_and_usage": "rash"},
+    }
+    enriched = {
+        "ok": {**raw["ok"], **ENRICHED},
+        "failed": {**raw["failed"], **enrich_dataset.FALLBACK},
+        "edited": {"name": "edited", "indications_and_usage": "old text", **ENRICHED},
+        "gone": {"name": "gone", **ENRICHED},
+    }
+    assert enrich_dataset.is_fallback(enriched["failed"]) and not enrich_dataset.is_fallback(enriched["ok"])
+    added, changed, removed, unchanged = enrich_dataset.diff_datasets(raw, enriched)
+    assert added == ["new"]
+    assert sorted(changed) == ["edited", "failed"]
+    assert removed == ["gone"]
+    assert unchanged == ["ok"]
+
+
+def test_incremental_run_only_enriches_the_delta(mock_llm, raw_path, tmp_path):
+    first = enricher(mock_llm, raw_path, tmp_path, requests_per_minute=60000, tokens_per_minute=10**8)
+    output = first.run_incremental(workers=4)
+    assert len(output) == 30 and mock_llm.calls == 30
+
+    with open(raw_path, encoding="utf-8") as f:
+        raw = json.load(f)
+    raw["Brand 1"]["indications_and_usage"] = "now relieves headaches"
+    del raw["Brand 2"]
+    raw["Brand 99"] = {"name": "Brand 99", "indications_and_usage": "relieves cough"}
+    with open(raw_path, "w", encoding="utf-8") as f:
+        json.dump(raw, f)
+    # Un échec d'enrichissement précédent doit être retenté
+    output["Brand 3"].update(enrich_dataset.FALLBACK)
+    with open(first.output_path, "w", encoding="utf-8") as f:
+        json.dump(output, f)
+
+    calls = mock_llm.calls
+    second = enricher(mock_llm, raw_path, tmp_path, requests_per_minute=60000, tokens_per_minute=10**8)
+    output = second.run_incremental(workers=4)
+    assert mock_llm.calls - calls == 3
+    assert set(output) == set(raw)
+    assert output["Brand 1"]["indications_and_usage"] == "now relieves headaches"
+    assert not enrich_dataset.is_fallback(output["Brand 3"])
+
+
+def test_keyed_json_complete_answer():
+    text = '```json\n{"a": {"x": 1}, "b": {"x": 2}}\n```'
+    assert enrich_dataset.extract_keyed_json(text, ["a", "b"]) == {"a": {"x": 1}, "b": {"x": 2}}
+
+
+def test_keyed_json_truncated_answer_keeps_complete_entries():
+    # Réponse coupée par max_tokens au milieu de "c"
+    text = '{"a": {"x": 1, "y": [1, 2]}, "b": {"x": "}"}, "c": {"x": [1, 2'
+    assert enrich_dataset.extract_keyed_json(text, ["a", "b", "c"]) == {"a": {"x": 1, "y": [1, 2]}, "b": {"x": "}"}}
+
+
+def test_keyed_json_without_any_key_raises():
+    with pytest.raises(ValueError):
+        enrich_dataset.extract_keyed_json("Sorry, I cannot help with that.", ["a"])
+
+
+def test_batches_fit_the_token_budget(mock_llm, raw_path, tmp_path):
+    small = enricher(mock_llm, raw_path, tmp_path, tokens_per_minute=2000)
+    prompt_cap, output_cap = small.batch_limits()
+    assert prompt_cap + output_cap <= 2000 * small.BATCH_TPM_SHARE
+
+    with open(raw_path, encoding="utf-8") as f:
+        items = list(json.load(f).items())
+    batches = small.plan_batches(items, max_batch=16)
+    assert [name for batch in batches for name, _ in batch] == [name for name, _ in items]
+    overhead = small.estimate_tokens(small.BATCH_HEADER + small.BATCH_FOOTER)
+    for batch in batches:
+        assert len(batch) * small.ITEM_OUTPUT_TOKENS <= output_cap
+        prompt = sum(small.estimate_tokens(small._batch_item("m00", entry)) for _, entry in batch)
+        assert overhead + prompt <= prompt_cap
+
+
+def test_batched_run_recovers_truncated_answers(mock_llm, raw_path, tmp_path):
+    random.seed(0)
+    mock_llm.garbage_rate = 0.3
+    batched = enricher(mock_llm, raw_path, tmp_path, requests_per_minute=60000, tokens_per_minute=10**8)
+    output = batched.run_concurrent(workers=4, batch_size=8)
+
+    assert len(output) == 30
+    assert mock_llm.calls > len(batched.plan_batches(list(output.items()), 8))
+    enriched = [name for name, entry in output.items() if not enrich_dataset.is_fallback(entry)]
+    # Les moitiés valides des réponses tronquées sont gardées, le reste est redemandé
+    assert len(enriched) >= 25
+    for name in enriched:
+        assert output[name]["category"] == "pain relief"
@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from agents.filter_index import FilterIndex, field_values, parse
+from agents.tfidf_index import RowFilter, top_k_indices
+
+
+def test_parse_builds_hashable_trees():
+    tree = parse('category:"Cold & Flu" OR -tag:cough substance:ibu*')
+    assert tree == ("or", ("term", "category", "cold & flu", False),
+                    ("and", ("not", ("term", "tags", "cough", False)),
+                     ("term", "substance_name", "ibu", True)))
+    assert parse("tag:a AND tag:b") == parse("tag:a tag:b")
+    hash(tree)
+
+
+@pytest.mark.parametrize("expression", ["", "color:red", "tag:a OR", "(tag:a", "tag:a)", "&&"])
+def test_parse_rejects_bad_expressions(expression):
+    with pytest.raises(ValueError):
+        parse(expression)
+
+
+@pytest.mark.parametrize("expression", [
+    "category:allergy",
+    "NOT category:allergy",
+    "category:allergy OR tag:fever",
+    'substance:ibuprofen category:"pain relief"',
+    "substance:ACET*",
+    "-(tag:fever OR tag:cough) category:stomach",
+])
+def test_mask_matches_a_linear_scan(dataset, expression):
+    index = FilterIndex.build(dataset)
+
+    def matches(entry, node):
+        kind = node[0]
+        if kind == "term":
+            _, field, value, prefix = node
+            values = field_values(entry, field)
+            return any(v.startswith(value) for v in values) if prefix else value in values
+        if kind == "not":
+            return not matches(entry, node[1])
+        combine = all if kind == "and" else any
+        return combine(matches(entry, child) for child in node[1:])
+
+    tree = parse(expression)
+    expected = np.array([matches(entry, tree) for entry in dataset.values()])
+    mask = index.mask(expression)
+    assert mask.tolist() == expected.tolist()
+    # Masque en cache, en lecture seule
+    assert index.mask(tree) is mask
+    assert not mask.flags.writeable
+
+
+def test_saved_index_gives_the_same_masks(dataset, tmp_path):
+    index = FilterIndex.build(dataset)
+    index.save(tmp_path)
+    loaded = FilterIndex.load(tmp_path)
+    for expression in ("category:allergy", "substance:zinc* OR tag:otc"):
+        assert loaded.mask(expression).tolist() == index.mask(expression).tolist()
+
+
+@pytest.mark.parametrize("expression", ["category:allergy", "NOT category:allergy"])
+def test_row_filter_matches_masked_brute(snapshot, queries, expression):
+    allowed = snapshot.filters.mask(expression)
+    row_filter = RowFilter(snapshot.matrix, allowed)
+    # Filtre étroit : lignes découpées ; filtre large : scores masqués
+    assert (row_filter.doc_ids is None) == (expression.startswith("NOT"))
+
+    query_matrix = snapshot.vectorizer.transform(queries)
+    all_scores = row_filter.scores(query_matrix)
+    for row, scores in enumerate(all_scores):
+        full = (snapshot.matrix @ query_matrix[row].T).toarray().ravel()
+        full[~allowed] = -np.inf
+        expected = top_k_indices(full, 10)
+        ids, best = row_filter.top_k(scores, 10)
+        assert ids.tolist() == expected.tolist()
+        np.testing.assert_allclose(best, full[expected])
+
+
+def test_filtered_search_and_recommendations(dataset_path, dataset, queries, tmp_path):
+    from agents.rag_search_agent import RAGSearchAgent
+    from agents.recommandation_agent import RecommendationAgent
+
+    rag = RAGSearchAgent(dataset_path, index_dir=str(tmp_path / "idx"))
+    reco = RecommendationAgent(dataset_path, rag=rag)
+    for query in queries[:10]:
+        unfiltered = rag.search(query, top_k=len(dataset))
+        expected = [r["name"] for r in unfiltered if dataset[r["name"]]["category"] == "allergy"][:5]
+        assert [r["name"] for r in rag.search(query, top_k=5, filter="category:allergy")] == expected
+        assert [r["name"] for r in reco.recommend(query, top_k=5, filter="category:Allergy")] == expected
+
+    # Même arbre (chaîne ou arbre déjà analysé) : même entrée de cache
+    stats = reco.cache_stats()
+    reco.recommend(queries[0], top_k=5, filter=parse("category:ALLERGY"))
+    assert reco.cache_stats()["entries"] == stats["entries"]
+    assert reco.cache_stats()["hits"] == stats["hits"] + 1
+    with pytest.raises(ValueError):
+        reco.recommend(queries[0], filter="color:red")
@@ -0,0 +1,59 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("tkinter")
+
+from gui_app import MedicationApp  # noqa: E402
+
+
+class FakeRoot:
+    def __init__(self):
+        self.calls = []
+
+    def after(self, ms, func, *args):
+        self.calls.append((func, args))
+
+    def run_pending(self):
+        time.sleep(0.01)
+        calls, self.calls = self.calls, []
+        for func, args in calls:
+            func(*args)
+
+
+class FakeLabel:
+    text = ""
+
+    def config(self, text):
+        self.text = text
+
+
+def make_app():
+    # Sans fenêtre : seuls l'exécuteur, le statut et la boucle after() servent
+    app = MedicationApp.__new__(MedicationApp)
+    app.root = FakeRoot()
+    app.status = FakeLabel()
+    app.executor = ThreadPoolExecutor(max_workers=2)
+    app.in_flight = {}
+    return app
+
+
+def test_status_is_cleared_only_when_every_task_is_done():
+    app = make_app()
+    fast_done, slow_release = [], threading.Event()
+    app.run_in_background(slow_release.wait, None, 5, status="Loading recommendation agent...")
+    app.run_in_background(lambda: "ok", fast_done.append, status="Searching...")
+
+    while not fast_done:
+        app.root.run_pending()
+    # La tâche lente tourne encore : son statut reste affiché
+    assert app.status.text == "Loading recommendation agent..."
+
+    slow_release.set()
+    while app.in_flight:
+        app.root.run_pending()
+    assert app.status.text == ""
+    assert fast_done == ["ok"]
+    app.executor.shutdown()
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from agents.inverted_index import InvertedIndex
+from agents.rag_search_agent import RAGSearchAgent
+from agents.tfidf_index import top_k_indices
+
+
+def brute_top_k(matrix, query_vec, k, allowed=None):
+    scores = (matrix @ query_vec.T).toarray().ravel()
+    if allowed is not None:
+        scores[~allowed] = -np.inf
+        k = min(k, int(allowed.sum()))
+    best = top_k_indices(scores, k)
+    # Seuls les documents qui partagent un terme avec la requête sont atteints
+    best = best[scores[best] > 0]
+    return best, scores[best]
+
+
+@pytest.mark.parametrize("k", [1, 5, 20])
+def test_maxscore_matches_brute(snapshot, queries, k):
+    index = InvertedIndex(snapshot.matrix)
+    query_matrix = snapshot.vectorizer.transform(queries)
+    for row in range(query_matrix.shape[0]):
+        expected_ids, expected_scores = brute_top_k(snapshot.matrix, query_matrix[row], k)
+        ids, scores = index.top_k(query_matrix[row], k)
+        ids, scores = ids[scores > 0], scores[scores > 0]
+        assert ids.tolist() == expected_ids.tolist()
+        np.testing.assert_allclose(scores, expected_scores)
+
+
+def test_postings_are_the_matrix_columns(snapshot):
+    index = InvertedIndex(snapshot.matrix)
+    csc = snapshot.matrix.tocsc()
+    for term in (0, 17, csc.shape[1] - 1):
+        doc_ids, weights = index.postings(term)
+        column = csc[:, term].toarray().ravel()
+        assert doc_ids.tolist() == np.flatnonzero(column).tolist()
+        np.testing.assert_allclose(weights, column[doc_ids])
+        assert index.max_weights[term] == pytest.approx(column.max())
+
+
+def test_inverted_backend_matches_brute_backend(dataset_path, queries, tmp_path):
+    index_dir = str(tmp_path / "idx")
+    brute = RAGSearchAgent(dataset_path, index_dir=index_dir)
+    inverted = RAGSearchAgent(dataset_path, index_dir=index_dir, backend="inverted")
+    for q in queries:
+        expected = [(r["name"], round(r["score"], 12)) for r in brute.search(q, 8)]
+        assert [(r["name"], round(r["score"], 12)) for r in inverted.search(q, 8)] == expected
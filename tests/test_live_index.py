@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from agents.live_index import LiveTfidfIndex
+from agents.tfidf_index import VECTORIZER_PARAMS, build_corpus
+
+
+def refit_scores(data, query):
+    vectorizer = TfidfVectorizer(**VECTORIZER_PARAMS)
+    matrix = vectorizer.fit_transform(build_corpus(data))
+    scores = (matrix @ vectorizer.transform([query]).T).toarray().ravel()
+    return dict(zip(data, scores))
+
+
+def check_same_as_refit(index, data, queries, k=8):
+    results = index.search_batch(queries, top_k=k)
+    for query, hits in zip(queries, results):
+        expected = refit_scores(data, query)
+        best = np.sort(np.fromiter(expected.values(), dtype=np.float64))[::-1][:k]
+        np.testing.assert_allclose([score for _, score, _ in hits], best, atol=1e-9)
+        # Les égalités peuvent être départagées autrement (lignes upsertées en fin d'index)
+        for name, score, entry in hits:
+            assert score == pytest.approx(expected[name], abs=1e-9)
+            assert entry is data[name]
+
+
+def test_live_scores_match_refit_after_updates(dataset, queries):
+    data = dict(list(dataset.items())[:150])
+    index = LiveTfidfIndex(data, compact_threshold=10_000)
+    check_same_as_refit(index, data, queries[:10])
+
+    extra = dict(list(dataset.items())[150:170])
+    for name, entry in extra.items():
+        index.upsert(name, entry)
+        data[name] = entry
+    for name in list(data)[:30]:
+        index.remove(name)
+        del data[name]
+    first = next(iter(data))
+    data[first] = dict(data[first], clean_indications="Used to relieve zorblaxitis and fever.")
+    index.upsert(first, data[first])
+
+    assert len(index) == len(data)
+    assert set(index.entries) == set(data)
+    check_same_as_refit(index, data, queries[:10] + ["zorblaxitis"])
+
+    index.compact()
+    check_same_as_refit(index, data, queries[:10] + ["zorblaxitis"])
+
+
+def test_live_document_frequencies_follow_removals(dataset):
+    data = dict(list(dataset.items())[:20])
+    index = LiveTfidfIndex(data)
+    name = next(iter(data))
+    index.upsert(name, dict(data[name], clean_indications="zorblaxitis"))
+    assert index.search_batch(["zorblaxitis"], top_k=1)[0][0][0] == name
+
+    index.remove(name)
+    # Terme absent de tous les documents vivants : plus aucun résultat positif
+    hits = index.search_batch(["zorblaxitis"], top_k=3)[0]
+    assert all(score == 0 for _, score, _ in hits)
+    assert name not in index.entries
+
+
+def test_live_backend_updates_are_visible_everywhere(dataset_path, dataset, tmp_path):
+    from agents.rag_search_agent import RAGSearchAgent
+
+    index_dir = tmp_path / "idx"
+    rag = RAGSearchAgent(dataset_path, index_dir=str(index_dir), backend="live")
+    # Le backend live ne lit ni n'écrit de snapshot
+    assert not index_dir.exists()
+
+    version = rag.index_version
+    entry = dict(next(iter(dataset.values())), name="Zorblax", clean_indications="Relieves zorblaxitis.")
+    rag.upsert("Zorblax", entry)
+    assert rag.index_version != version
+    assert rag.data["Zorblax"] is entry
+    assert rag.search("zorblaxitis", top_k=1)[0]["name"] == "Zorblax"
+
+    rag.remove("Zorblax")
+    assert "Zorblax" not in rag.data
+    assert all(r["name"] != "Zorblax" for r in rag.search("zorblaxitis", top_k=5))
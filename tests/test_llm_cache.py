@@ -0,0 +1,79 @@
+import threading
+
+from agents.llm_cache import LLMCache
+
+
+def db_bytes(cache):
+    return cache._conn().conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+
+def test_key_covers_every_request_field():
+    base = LLMCache.make_key("m", "prompt", 0.2, 300)
+    assert base == LLMCache.make_key("m", "prompt", 0.2, 300)
+    others = [
+        LLMCache.make_key("m2", "prompt", 0.2, 300),
+        LLMCache.make_key("m", "prompt!", 0.2, 300),
+        LLMCache.make_key("m", "prompt", 0.3, 300),
+        LLMCache.make_key("m", "prompt", 0.2, 301),
+        LLMCache.make_key("m", "prompt", 0.2, 300, "http://127.0.0.1:8766"),
+    ]
+    assert len({base, *others}) == 6
+
+
+def test_hits_misses_and_persistence(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = LLMCache(path)
+    assert cache.get("k") is None
+    cache.put("k", "réponse")
+    assert cache.get("k") == "réponse"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["bytes"] == len("réponse".encode("utf-8"))
+
+    # Une autre instance (un autre processus) relit le même fichier
+    assert LLMCache(path).get("k") == "réponse"
+
+
+def test_bypass_skips_lookups_but_stores(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    LLMCache(path).put("k", "old")
+    refresh = LLMCache(path, bypass=True)
+    assert refresh.get("k") is None
+    assert refresh.get_or_call("k", lambda: "new") == "new"
+    assert LLMCache(path).get("k") == "new"
+
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.sqlite"), max_bytes=1000)
+    for i in range(8):
+        cache.put(f"k{i}", "x" * 100)
+    # k0 est relu : il devient le plus récent
+    assert cache.get("k0") is not None
+    for i in range(8, 12):
+        cache.put(f"k{i}", "x" * 100)
+
+    stats = cache.stats()
+    assert stats["bytes"] <= 1000
+    assert stats["bytes"] == db_bytes(cache)
+    assert cache.get("k0") is not None
+    assert cache.get("k1") is None
+    assert cache.get("k11") is not None
+
+
+def test_size_total_stays_exact_under_concurrent_writers(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.sqlite"), max_bytes=20_000)
+
+    def writer(n):
+        for i in range(60):
+            cache.put(f"{n}-{i % 40}", "y" * (50 + i))
+            if i % 7 == 0:
+                cache.delete(f"{n}-{i % 5}")
+            cache.get(f"{n}-{i % 3}")
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert cache.stats()["bytes"] == db_bytes(cache)
+    assert db_bytes(cache) <= 20_000
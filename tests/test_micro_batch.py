@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pytest
+
+from agents.micro_batch import MicroBatcher, Overloaded
+
+
+def test_results_follow_submission_order():
+    batcher = MicroBatcher(lambda items: [item * 2 for item in items], max_batch=8, max_wait=0.01)
+    try:
+        futures = [batcher.submit(i) for i in range(20)]
+        assert [f.result(timeout=5) for f in futures] == [i * 2 for i in range(20)]
+    finally:
+        batcher.close()
+
+
+def test_cancelled_and_expired_items_are_not_dispatched():
+    release = threading.Event()
+    seen = []
+
+    def handler(items):
+        seen.append(list(items))
+        if items == ["block"]:
+            release.wait(5)
+        return items
+
+    batcher = MicroBatcher(handler, max_batch=8, max_wait=0.01, workers=1)
+    try:
+        blocker = batcher.submit("block")
+        time.sleep(0.05)
+        expired = batcher.submit("expired", timeout=0.01)
+        cancelled = batcher.submit("cancelled")
+        assert cancelled.cancel()
+        kept = batcher.submit("kept")
+        time.sleep(0.05)
+        release.set()
+
+        assert blocker.result(timeout=5) == "block"
+        assert kept.result(timeout=5) == "kept"
+        with pytest.raises(TimeoutError):
+            expired.result(timeout=5)
+        assert seen == [["block"], ["kept"]]
+    finally:
+        batcher.close()
+
+
+def test_short_handler_output_fails_leftover_futures():
+    batcher = MicroBatcher(lambda items: items[:1], max_batch=8, max_wait=0.05)
+    try:
+        futures = [batcher.submit(i) for i in range(3)]
+        assert futures[0].result(timeout=5) == 0
+        for future in futures[1:]:
+            with pytest.raises(RuntimeError):
+                future.result(timeout=5)
+    finally:
+        batcher.close()
+
+
+def test_full_queue_rejects_new_requests():
+    release = threading.Event()
+
+    def handler(items):
+        release.wait(5)
+        return items
+
+    batcher = MicroBatcher(handler, max_batch=1, max_wait=0.0, max_queue=2, workers=1)
+    try:
+        # "running" occupe le worker, "next" attend un worker hors de la file
+        futures = [batcher.submit("running")]
+        time.sleep(0.05)
+        futures.append(batcher.submit("next"))
+        time.sleep(0.05)
+        futures += [batcher.submit("queued 1"), batcher.submit("queued 2")]
+        with pytest.raises(Overloaded):
+            batcher.submit("rejected")
+        release.set()
+        assert [f.result(timeout=5) for f in futures] == ["running", "next", "queued 1", "queued 2"]
+        assert batcher.stats()["items"] == 4
+    finally:
+        batcher.close()
@@ -0,0 +1,66 @@
+from agents.name_index import FuzzyNameIndex, normalize_name, trigrams
+
+
+def test_trigrams_are_padded():
+    grams = trigrams("abc")
+    assert "abc" in grams
+    assert len(grams) >= 3
+
+
+def test_lookup_recovers_names_from_typos(dataset):
+    index = FuzzyNameIndex(dataset)
+    for name in list(dataset)[:40:4]:
+        typo = name[:-2] + name[-1] if len(name) > 6 else name
+        results = index.lookup(typo.upper(), k=5)
+        assert name in [r["name"] for r in results]
+        assert index.lookup(name, k=1)[0]["name"] == name
+
+
+def test_lookup_matches_substances_one_by_one():
+    data = {
+        "Combo": {"name": "Combo", "substance_name": "ZINC OXIDE, OCTINOXATE"},
+        "Other": {"name": "Other", "substance_name": "ASPIRIN"},
+    }
+    index = FuzzyNameIndex(data)
+    assert index.best_match("octinoxate") == "Combo"
+    assert index.best_match("qwxyz") is None
+
+
+def test_candidates_cover_every_name_above_the_threshold(dataset, queries):
+    index = FuzzyNameIndex(dataset)
+    for text in list(dataset)[:20] + queries[:20] + ["ibuprofn", "x"]:
+        query = normalize_name(text)
+        if not query:
+            continue
+        grams = trigrams(query)
+        # Jaccard de tous les noms, sans filtrage par les trigrammes rares
+        brute = {
+            name_id for name_id, name in enumerate(index.names)
+            if len(grams & trigrams(name)) / len(grams | trigrams(name)) >= 0.3
+        }
+        candidates, overlap, n_grams = index._candidates(query, 0.3)
+        found = set() if candidates is None else {
+            int(c) for c, o in zip(candidates, overlap) if o / (n_grams + index.gram_counts[c] - o) >= 0.3
+        }
+        assert found == brute
+
+
+def test_brand_name_ranks_before_substance():
+    data = {
+        "Generic Pack": {"name": "Generic Pack", "substance_name": "IBUPROFEN"},
+        "Ibuprofen": {"name": "Ibuprofen", "substance_name": "IBUPROFEN"},
+    }
+    results = FuzzyNameIndex(data).lookup("ibuprofen", k=5)
+    assert [(r["name"], r["field"]) for r in results] == [("Ibuprofen", "name"), ("Generic Pack", "substance_name")]
+
+
+def test_match_name_follows_live_updates(dataset_path, dataset, tmp_path):
+    from agents.rag_search_agent import RAGSearchAgent
+    from agents.recommandation_agent import RecommendationAgent
+
+    rag = RAGSearchAgent(dataset_path, index_dir=str(tmp_path / "idx"), backend="live")
+    reco = RecommendationAgent(dataset_path, rag=rag)
+    assert all(m["name"] != "Zorblax" for m in reco.match_name("zorblax"))
+    rag.upsert("Zorblax", dict(next(iter(dataset.values())), name="Zorblax"))
+    match = reco.match_name("zorblx", k=1)[0]
+    assert match["name"] == "Zorblax" and "category" in match
@@ -0,0 +1,90 @@
+import sys
+
+import numpy as np
+import pytest
+
+from agents.vision_agent import VisionAgent
+
+
+def test_onnx_backend_without_onnxruntime_names_the_extra(monkeypatch, tmp_path):
+    model = tmp_path / "model.onnx"
+    model.write_bytes(b"")
+    monkeypatch.setitem(sys.modules, "onnxruntime", None)
+    monkeypatch.delitem(sys.modules, "agents.onnx_detector", raising=False)
+    with pytest.raises(ImportError, match="requirements-onnx.txt"):
+        VisionAgent(str(model), backend="onnx")
+
+
+class StubSession:
+    """Returns the same raw YOLO output (4 + classes, anchors) for every image."""
+
+    def __init__(self, output):
+        self.output = output
+        self.batches = []
+
+    def run(self, names, feeds):
+        (tensor,) = feeds.values()
+        self.batches.append(tensor.shape)
+        return [np.repeat(self.output[None], len(tensor), axis=0)]
+
+
+@pytest.fixture
+def onnx_detector():
+    pytest.importorskip("cv2")
+    pytest.importorskip("onnxruntime")
+    from agents import onnx_detector
+    return onnx_detector
+
+
+def make_detector(onnx_detector, output, dynamic_batch=True):
+    detector = onnx_detector.OnnxYoloDetector.__new__(onnx_detector.OnnxYoloDetector)
+    detector.session = StubSession(output)
+    detector.input = type("Input", (), {"name": "images"})()
+    detector.conf, detector.iou, detector.max_det = 0.25, 0.7, 300
+    detector.names = {0: "drug-name"}
+    detector.imgsz = 64
+    detector.dynamic_batch = dynamic_batch
+    return detector
+
+
+def test_nms_keeps_the_best_of_overlapping_boxes(onnx_detector):
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [20, 20, 30, 30]], dtype=np.float32)
+    scores = np.array([0.6, 0.9, 0.8], dtype=np.float32)
+    assert onnx_detector.nms(boxes, scores, 0.5).tolist() == [1, 2]
+
+
+def test_letterbox_pads_to_a_square(onnx_detector):
+    image = np.zeros((32, 64, 3), dtype=np.uint8)
+    padded, gain, pad = onnx_detector.letterbox(image, 64)
+    assert padded.shape == (64, 64, 3) and gain == 1.0 and pad == (0, 16)
+
+
+def test_predict_maps_boxes_back_to_the_image(onnx_detector):
+    # Ancres : centre x, centre y, w, h, score ; la 2e chevauche la 1re
+    output = np.array([
+        [16, 16.5, 48, 40],
+        [32, 32.5, 32, 40],
+        [8, 8, 8, 8],
+        [8, 8, 8, 8],
+        [0.9, 0.5, 0.1, 0.8],
+    ], dtype=np.float32)
+    detector = make_detector(onnx_detector, output)
+    image = np.zeros((32, 64, 3), dtype=np.uint8)
+
+    results = detector.predict([image, image], batch=2)
+    assert detector.session.batches == [(2, 3, 64, 64)]
+    assert len(results) == 2
+    summary = VisionAgent._summarize(results[0])
+    # Lignes 16..48 du letterbox = l'image : y décalé de 16
+    assert [d["confidence"] for d in summary["detections"]] == pytest.approx([0.9, 0.8])
+    assert summary["detections"][0]["box"] == [12.0, 12.0, 20.0, 20.0]
+    assert summary["detections"][1]["box"] == [36.0, 20.0, 44.0, 28.0]
+
+
+def test_fixed_batch_models_run_one_image_at_a_time(onnx_detector):
+    output = np.zeros((5, 4), dtype=np.float32)
+    detector = make_detector(onnx_detector, output, dynamic_batch=False)
+    image = np.zeros((64, 64, 3), dtype=np.uint8)
+    results = detector.predict([image] * 3, batch=3)
+    assert detector.session.batches == [(1, 3, 64, 64)] * 3
+    assert all(len(r.boxes) == 0 for r in results)
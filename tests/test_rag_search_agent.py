@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from agents.rag_search_agent import RAGSearchAgent
+from agents.tfidf_index import top_k_indices
+
+
+def test_top_k_indices_breaks_ties_by_lowest_index():
+    scores = np.array([0.5, 0.9, 0.5, 0.9, 0.1, 0.5])
+    assert top_k_indices(scores, 4).tolist() == [1, 3, 0, 2]
+    assert top_k_indices(scores, 0).tolist() == []
+    assert top_k_indices(scores, 10).tolist() == [1, 3, 0, 2, 5, 4]
+
+
+def test_top_k_indices_matches_a_full_sort():
+    rng = np.random.default_rng(0)
+    scores = rng.integers(0, 20, size=500).astype(float)
+    full = np.lexsort((np.arange(500), -scores))
+    for k in (1, 7, 50, 500):
+        assert top_k_indices(scores, k).tolist() == full[:k].tolist()
+
+
+@pytest.fixture(scope="module")
+def rag(dataset_path, tmp_path_factory):
+    return RAGSearchAgent(dataset_path, index_dir=str(tmp_path_factory.mktemp("index") / "idx"))
+
+
+def as_pairs(results):
+    return [[(r["name"], round(r["score"], 12)) for r in hits] for hits in results]
+
+
+@pytest.mark.parametrize("chunk_size", [None, 1, 7])
+def test_search_batch_matches_single_searches(rag, queries, chunk_size):
+    single = [rag.search(q, top_k=5) for q in queries]
+    assert as_pairs(rag.search_batch(queries, top_k=5, chunk_size=chunk_size)) == as_pairs(single)
+
+
+def test_search_scores_are_cosines(rag, dataset):
+    name = next(iter(dataset))
+    text = dataset[name]["clean_indications"]
+    best = rag.search(text, top_k=1)[0]
+    assert best["data"] is rag.data[best["name"]]
+    assert 0 < best["score"] <= 1 + 1e-9
@@ -0,0 +1,70 @@
+import pytest
+
+from agents.rag_search_agent import RAGSearchAgent
+from agents.recommandation_agent import RecommendationAgent
+from agents.result_cache import ResultCache
+
+
+@pytest.fixture
+def reco(dataset_path, tmp_path):
+    rag = RAGSearchAgent(dataset_path, index_dir=str(tmp_path / "idx"), backend="live")
+    return RecommendationAgent(dataset_path, rag=rag)
+
+
+def test_equivalent_queries_share_one_cache_entry(reco):
+    first = reco.recommend("Fever and headache", top_k=3)
+    for query in ("headache, FEVER", "the fever headache!", "  headache   fever "):
+        assert reco.recommend(query, top_k=3) == first
+
+    stats = reco.cache_stats()
+    assert stats["entries"] == 1
+    assert stats["hits"] == 3 and stats["misses"] == 1
+
+    # top_k fait partie de la clé
+    reco.recommend("fever headache", top_k=5)
+    assert reco.cache_stats()["entries"] == 2
+
+
+def test_batch_deduplicates_and_matches_single_queries(reco, queries):
+    batch = reco.recommend_batch(queries + ["Headache FEVER", "fever headache"], top_k=4, verbose=False)
+    fresh = RecommendationAgent(reco.dataset_path, rag=reco.rag, cache_size=0)
+    assert batch == [fresh.recommend(q, top_k=4) for q in queries + ["Headache FEVER", "fever headache"]]
+    assert batch[-1] == batch[-2]
+
+
+def test_cached_results_are_copies(reco):
+    first = reco.recommend("fever headache", top_k=3)
+    first[0]["symptoms"].append("mutated")
+    first[0]["name"] = "mutated"
+    second = reco.recommend("headache fever", top_k=3)
+    assert second[0]["name"] != "mutated"
+    assert "mutated" not in second[0]["symptoms"]
+    assert second[0]["symptoms"] is not reco.data[second[0]["name"]].get("symptoms")
+
+
+def test_index_update_invalidates_the_cache(reco, dataset):
+    reco.recommend("zorblaxitis", top_k=1)
+    entry = dict(next(iter(dataset.values())), name="Zorblax", clean_indications="Relieves zorblaxitis.")
+    reco.rag.upsert("Zorblax", entry)
+    assert reco.recommend("zorblaxitis", top_k=1)[0]["name"] == "Zorblax"
+    assert reco.cache_stats()["invalidations"] == 1
+
+
+def test_result_cache_lru_and_ttl(monkeypatch):
+    cache = ResultCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    # "b" est le moins récemment utilisé
+    assert cache.get("b") is None and cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+    now = [100.0]
+    monkeypatch.setattr("agents.result_cache.time.monotonic", lambda: now[0])
+    expiring = ResultCache(ttl=10)
+    expiring.put("a", 1)
+    now[0] += 9
+    assert expiring.get("a") == 1
+    now[0] += 2
+    assert expiring.get("a") is None
@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+from agents import scraping_agent
+from agents.scraping_agent import FetchError, ScrapingAgent, drop_partial_line
+from tools.fake_openfda_server import FakeOpenFDA, make_label
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(tmp_path, monkeypatch):
+    # ScrapingAgent crée data/raw dans le dossier courant
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(scraping_agent, "backoff_delay", lambda attempt: 0)
+
+
+@pytest.fixture
+def fake():
+    fake = FakeOpenFDA(total=300)
+    httpd, base_url = fake.serve()
+    fake.base_url = base_url
+    yield fake
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def expected_brands(total):
+    return {f"Brand {i}" for i in range(total) if "brand_name" in make_label(i)["openfda"]}
+
+
+def agent(fake):
+    return ScrapingAgent(base_url=fake.base_url, workers=3, requests_per_minute=60000)
+
+
+def test_concurrent_fetch_reaches_the_end_of_results(fake, tmp_path):
+    out = tmp_path / "crawl.jsonl"
+    data = agent(fake).fetch_concurrent(target_total=1000, batch_size=40, out_path=out)
+    assert set(data) == expected_brands(300)
+    assert ScrapingAgent.load_jsonl(out) == data
+
+
+def test_resume_from_checkpoint_after_a_torn_line(fake, tmp_path):
+    out = tmp_path / "crawl.jsonl"
+    first = agent(fake).fetch_concurrent(target_total=100, batch_size=40, out_path=out)
+    assert len(first) == 100
+    checkpoint = json.loads((tmp_path / "crawl.jsonl.ckpt").read_text())
+    assert checkpoint["count"] == 100
+
+    # Crash au milieu d'une écriture
+    with open(out, "a", encoding="utf-8") as f:
+        f.write('{"name": "Brand 2')
+    requests_before = fake.requests
+    data = agent(fake).fetch_concurrent(target_total=1000, batch_size=40, out_path=out)
+
+    assert set(data) == expected_brands(300)
+    assert ScrapingAgent.load_jsonl(out) == data
+    # Seules les pages après le checkpoint (plus la 404 de fin, et les pages en vol) sont redemandées
+    assert fake.requests - requests_before <= (300 - checkpoint["next_skip"]) // 40 + 1 + 3
+
+
+def test_failed_pages_raise_fetch_error(fake):
+    fake.fail_rate = 1.0
+    with pytest.raises(FetchError):
+        agent(fake)._request(fake.base_url, retries=2)
+
+
+def test_failed_page_stops_the_crawl_without_advancing(fake, tmp_path):
+    out = tmp_path / "crawl.jsonl"
+    fake.fail_rate = 1.0
+    data = agent(fake).fetch_concurrent(target_total=100, batch_size=40, out_path=out)
+    # Pas pris pour la fin des résultats : rien d'écrit, rien de sauté
+    assert data == {}
+    assert not (tmp_path / "crawl.jsonl.ckpt").exists()
+
+    fake.fail_rate = 0.0
+    assert len(agent(fake).fetch_concurrent(target_total=100, batch_size=40, out_path=out)) == 100
+
+
+def test_drop_partial_line_scans_back_in_blocks(tmp_path):
+    path = tmp_path / "records.jsonl"
+    path.write_bytes(b'{"a": 1}\n' + b"x" * 200_000)
+    drop_partial_line(path)
+    assert path.read_bytes() == b'{"a": 1}\n'
+
+    path.write_bytes(b"y" * 70_000)
+    drop_partial_line(path)
+    assert path.read_bytes() == b""
@@ -0,0 +1,75 @@
+import json
+import math
+from collections import Counter
+
+import pytest
+
+from search_engine import MedicationSearchEngine
+
+
+def raw_dataset():
+    return {
+        "Advil": {"name": "Advil", "generic_name": "IBUPROFEN", "purpose": "Pain reliever/fever reducer",
+                  "indications_and_usage": "temporarily relieves minor aches and pains due to headache"},
+        "Tylenol": {"name": "Tylenol", "generic_name": "ACETAMINOPHEN", "purpose": "Fever reducer",
+                    "indications_and_usage": "temporarily reduces fever and relieves headache"},
+        "Claritin": {"name": "Claritin", "generic_name": "LORATADINE", "purpose": "Antihistamine",
+                     "indications_and_usage": "relieves runny nose, sneezing, itchy watery eyes",
+                     "warnings": "do not use with other antihistamines"},
+        "Ibuprofen Kids": {"name": "Ibuprofen Kids", "substance_name": "IBUPROFEN",
+                           "indications_and_usage": "reduces fever in children"},
+    }
+
+
+@pytest.fixture
+def engine(tmp_path):
+    path = tmp_path / "raw.json"
+    path.write_text(json.dumps(raw_dataset()), encoding="utf-8")
+    return MedicationSearchEngine(str(path))
+
+
+def rescan_scores(engine, query):
+    """
+    BM25F computed from scratch over every document (the per-query full
+    rescan the index replaced).
+    """
+    fields = engine.FIELD_BOOSTS
+    docs = [{f: engine.tokenize(engine.data[name].get(f, "")) for f in fields} for name in engine.names]
+    n_docs = len(docs)
+    avg = {f: (sum(len(d[f]) for d in docs) / n_docs) or 1.0 for f in fields}
+
+    def wtf(doc, term):
+        return sum(
+            boost * Counter(doc[f])[term] / (1 - engine.B + engine.B * len(doc[f]) / avg[f])
+            for f, boost in fields.items()
+        )
+
+    scores = {}
+    for doc_id, doc in enumerate(docs):
+        score = 0.0
+        for term in set(engine.tokenize(query)):
+            df = sum(1 for d in docs if wtf(d, term) > 0)
+            w = wtf(doc, term)
+            if w > 0:
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                score += idf * w * (engine.K1 + 1) / (w + engine.K1)
+        if score > 0:
+            scores[engine.names[doc_id]] = score
+    return scores
+
+
+@pytest.mark.parametrize("query", ["fever", "headache fever", "ibuprofen", "itchy eyes", "Advil!"])
+def test_index_matches_full_rescan(engine, query):
+    expected = rescan_scores(engine, query)
+    ranked = sorted(expected, key=lambda name: (-expected[name], engine.names.index(name)))
+    assert engine.search(query, top_k=10) == ranked
+    assert engine.search(query, top_k=2) == ranked[:2]
+
+
+def test_name_field_is_boosted(engine):
+    assert engine.search("ibuprofen", top_k=1) == ["Ibuprofen Kids"]
+
+
+def test_unknown_terms_return_nothing(engine):
+    assert engine.search("zorblaxitis") == []
+    assert engine.search("") == []
@@ -0,0 +1,94 @@
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from server import BadRequest, MedicationService
+
+
+def confined(image_dir):
+    service = MedicationService.__new__(MedicationService)
+    service.image_dir = os.path.realpath(image_dir) if image_dir else None
+    return service
+
+
+def test_image_path_stays_inside_the_image_dir(tmp_path):
+    images = tmp_path / "images"
+    (images / "sub").mkdir(parents=True)
+    (tmp_path / "images-private").mkdir()
+    os.symlink(tmp_path, images / "escape")
+    service = confined(str(images))
+
+    assert service._image_file("box.jpg") == str(images / "box.jpg")
+    assert service._image_file("sub/../box.jpg") == str(images / "box.jpg")
+    for path in ("../secret.jpg", "/etc/passwd", "escape/secret.jpg", "../images-private/box.jpg"):
+        with pytest.raises(BadRequest):
+            service._image_file(path)
+
+
+def test_image_path_disabled_without_image_dir():
+    with pytest.raises(BadRequest, match="image_base64"):
+        confined(None)._image_file("box.jpg")
+
+
+@pytest.fixture(scope="module")
+def base_url(dataset_path):
+    service = MedicationService(dataset_path, batch_wait=0.01)
+    httpd = service.serve(port=0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", service
+    httpd.shutdown()
+    httpd.server_close()
+    service.close()
+
+
+def post(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode("utf-8"), method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_concurrent_requests_match_direct_calls(base_url, queries):
+    url, service = base_url
+    queries = [q for q in queries if q.strip()]
+    responses = [None] * len(queries)
+
+    def call(i):
+        responses[i] = post(f"{url}/recommend", {"symptoms": queries[i], "top_k": 3})
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(queries))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for query, (status, body) in zip(queries, responses):
+        assert status == 200
+        assert body["results"] == service.reco.recommend(query, top_k=3)
+    # Des requêtes concurrentes partagent un lot
+    assert service.reco_batcher.stats()["batches"] < len(queries)
+
+
+@pytest.mark.parametrize("payload, message", [
+    ({"symptoms": "  "}, "symptoms"),
+    ({"symptoms": "fever", "top_k": 0}, "top_k"),
+    ({"symptoms": "fever", "filter": 3}, "filter"),
+])
+def test_invalid_requests_get_400(base_url, payload, message):
+    status, body = post(f"{base_url[0]}/recommend", payload)
+    assert status == 400 and message in body["error"]
+
+
+def test_vision_disabled_and_unknown_routes(base_url):
+    url, _ = base_url
+    assert post(f"{url}/vision", {"image_path": "box.jpg"})[0] == 400
+    assert post(f"{url}/nope", {})[0] == 404
+    with urllib.request.urlopen(f"{url}/health", timeout=10) as response:
+        assert json.loads(response.read()) == {"status": "ok", "vision": False}
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from agents.sharded_search import ShardedSearch
+from agents.tfidf_index import top_k_indices
+
+
+@pytest.fixture(scope="module")
+def sharded(snapshot):
+    sharded = ShardedSearch(snapshot.matrix, n_shards=3)
+    yield sharded
+    sharded.close()
+
+
+def assert_matches_brute(snapshot, query_matrix, results, k, mask=None):
+    assert len(results) == query_matrix.shape[0]
+    for row, (ids, scores) in enumerate(results):
+        full = (snapshot.matrix @ query_matrix[row].T).toarray().ravel()
+        if mask is not None:
+            full[~mask] = -np.inf
+        expected = top_k_indices(full, k)
+        assert ids.tolist() == expected.tolist()
+        np.testing.assert_allclose(scores, full[expected])
+
+
+def test_sharded_matches_brute(sharded, snapshot, queries):
+    assert sharded.bounds[0][0] == 0 and sharded.bounds[-1][1] == snapshot.matrix.shape[0]
+    allowed = snapshot.filters.mask("NOT category:\"pain relief\"")
+    query_matrix = snapshot.vectorizer.transform(queries)
+    # Deux passes : la seconde réutilise le filtre déjà envoyé aux workers
+    for mask in (None, allowed, allowed):
+        assert_matches_brute(snapshot, query_matrix, sharded.search(query_matrix, 5, mask), 5, mask)
+
+
+def test_dead_worker_is_restarted(sharded, snapshot, queries):
+    query_matrix = snapshot.vectorizer.transform(queries)
+    restarts = sharded.restarts
+    process, _ = sharded._workers[1]
+    process.kill()
+    process.join(5)
+
+    # Le lot en cours est calculé dans ce processus, puis le worker revient
+    assert_matches_brute(snapshot, query_matrix, sharded.search(query_matrix, 5), 5)
+    assert sharded.restarts == restarts + 1
+    assert_matches_brute(snapshot, query_matrix, sharded.search(query_matrix, 5), 5)
+    assert sharded.stats()["alive"] == 3
+
+
+def test_closed_search_raises(snapshot, queries):
+    sharded = ShardedSearch(snapshot.matrix[:50], n_shards=2)
+    sharded.close()
+    with pytest.raises(RuntimeError):
+        sharded.search(snapshot.vectorizer.transform(queries[:1]), 5)
+
+
+def test_sharded_backend_matches_brute_backend(dataset_path, queries, tmp_path):
+    from agents.rag_search_agent import RAGSearchAgent
+
+    brute = RAGSearchAgent(dataset_path, index_dir=str(tmp_path / "idx"))
+    sharded = RAGSearchAgent(dataset_path, index_dir=str(tmp_path / "idx"), backend="sharded", shards=2)
+    try:
+        for query in queries:
+            expected = [(r["name"], r["score"]) for r in brute.search(query, top_k=5, filter="NOT tag:otc")]
+            results = sharded.search(query, top_k=5, filter="NOT tag:otc")
+            assert [r["name"] for r in results] == [name for name, _ in expected]
+            np.testing.assert_allclose([r["score"] for r in results], [score for _, score in expected])
+    finally:
+        sharded.close()
@@ -0,0 +1,73 @@
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from agents.tfidf_index import VECTORIZER_PARAMS, TfidfSnapshot, build_corpus
+
+
+def test_snapshot_round_trip_matches_sklearn(dataset, queries, tmp_path):
+    index_dir = tmp_path / "index"
+    TfidfSnapshot.build(dataset, "v1").save(index_dir)
+    loaded = TfidfSnapshot.load(index_dir)
+
+    vectorizer = TfidfVectorizer(**VECTORIZER_PARAMS)
+    matrix = vectorizer.fit_transform(build_corpus(dataset))
+    assert loaded.drug_names == list(dataset)
+    assert abs(loaded.matrix - matrix).max() < 1e-12
+    # QueryVectorizer (sans scikit-learn) donne les mêmes vecteurs
+    assert abs(loaded.vectorizer.transform(queries) - vectorizer.transform(queries)).max() < 1e-12
+
+
+def test_load_or_build_reuses_fresh_and_rebuilds_stale(dataset, tmp_path, monkeypatch):
+    index_dir = tmp_path / "index"
+    TfidfSnapshot.load_or_build(dataset, "v1", index_dir)
+    assert TfidfSnapshot.is_fresh(index_dir, "v1")
+
+    def no_build(*args, **kwargs):
+        raise AssertionError("fresh snapshot rebuilt")
+
+    with monkeypatch.context() as m:
+        m.setattr(TfidfSnapshot, "build", no_build)
+        TfidfSnapshot.load_or_build(dataset, "v1", index_dir)
+
+    # Dataset modifié : hash différent, l'index est reconstruit sur place
+    changed = dict(list(dataset.items())[:50])
+    snapshot = TfidfSnapshot.load_or_build(changed, "v2", index_dir)
+    assert snapshot.matrix.shape[0] == 50
+    assert TfidfSnapshot.is_fresh(index_dir, "v2") and not TfidfSnapshot.is_fresh(index_dir, "v1")
+    assert sorted(os.listdir(tmp_path)) == ["index", "index.lock"]
+
+
+def _load_or_build(data, index_dir, marker_dir):
+    build = TfidfSnapshot.build
+
+    def counted_build(*args, **kwargs):
+        open(os.path.join(marker_dir, str(os.getpid())), "w").close()
+        return build(*args, **kwargs)
+
+    TfidfSnapshot.build = counted_build
+    snapshot = TfidfSnapshot.load_or_build(data, "v2", index_dir)
+    return snapshot.matrix.shape
+
+
+def test_concurrent_rebuilds_do_not_collide(dataset, tmp_path):
+    index_dir = tmp_path / "index"
+    markers = tmp_path / "builds"
+    markers.mkdir()
+    TfidfSnapshot.build(dataset, "v1").save(index_dir)
+
+    data = dict(list(dataset.items())[:200])
+    with ProcessPoolExecutor(6, mp_context=mp.get_context("spawn")) as pool:
+        futures = [pool.submit(_load_or_build, data, str(index_dir), str(markers)) for _ in range(6)]
+        shapes = [f.result(timeout=120) for f in futures]
+
+    assert all(shape[0] == 200 for shape in shapes)
+    # Les autres processus chargent l'index du premier au lieu de le reconstruire
+    assert len(os.listdir(markers)) == 1
+    assert sorted(os.listdir(tmp_path)) == ["builds", "index", "index.lock"]
+    assert TfidfSnapshot.is_fresh(index_dir, "v2")
+    np.testing.assert_array_equal(TfidfSnapshot.load(index_dir).drug_names, list(data))
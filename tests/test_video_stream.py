@@ -0,0 +1,169 @@
+import importlib.util
+import sys
+import threading
+import types
+
+import numpy as np
+import pytest
+
+from agents.vision_agent import VisionAgent
+
+FRAMES = 100
+FPS = 10.0
+
+
+class FakeCapture:
+    """100 frames at 10 fps; the picture changes every 10 frames (one scene per second)."""
+
+    opened = []
+    released = []
+
+    def __init__(self, path):
+        self.index = 0
+        self.opened.append(path)
+
+    def isOpened(self):
+        return True
+
+    def get(self, prop):
+        return FPS
+
+    def grab(self):
+        if self.index >= FRAMES:
+            return False
+        self.index += 1
+        return True
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return True, np.full((36, 64, 3), (self.index - 1) // 10 * 20, dtype=np.uint8)
+
+    def release(self):
+        self.released.append(self)
+
+
+@pytest.fixture
+def video_stream(monkeypatch):
+    FakeCapture.opened, FakeCapture.released = [], []
+    cv2 = types.SimpleNamespace(
+        VideoCapture=FakeCapture, CAP_PROP_FPS=5, COLOR_BGR2GRAY=6, INTER_AREA=3,
+        cvtColor=lambda frame, code: frame[..., 0],
+        resize=lambda frame, size, interpolation=None: frame[:size[1], :size[0]],
+    )
+    monkeypatch.setitem(sys.modules, "cv2", cv2)
+    # Module chargé à neuf sur le faux cv2, retiré de sys.modules après le test
+    spec = importlib.util.find_spec("agents.video_stream")
+    module = importlib.util.module_from_spec(spec)
+    monkeypatch.setitem(sys.modules, "agents.video_stream", module)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_iter_frames_stride_and_release(video_stream):
+    frames = list(video_stream.iter_frames("shelf.mp4", stride=3))
+    assert [index for index, _, _ in frames] == list(range(0, FRAMES, 3))
+    assert frames[1][1] == pytest.approx(0.3)
+    assert len(FakeCapture.released) == 1
+
+
+def test_sample_frames_drops_duplicates(video_stream):
+    stats = {"read": 0, "sampled": 0}
+    frames = video_stream.iter_frames("shelf.mp4")
+    kept = list(video_stream.sample_frames(frames, diff_threshold=5.0, max_gap=0.5, stats=stats))
+    # Un changement de scène par seconde, plus une image après 0,5 s sans changement
+    assert [index for index, _, _, _ in kept] == [i for scene in range(0, FRAMES, 10) for i in (scene, scene + 5)]
+    assert [changed for _, _, _, changed in kept[:4]] == [True, False, True, False]
+    assert stats == {"read": FRAMES, "sampled": len(kept)}
+
+
+def test_early_close_releases_the_capture(video_stream):
+    frames = video_stream.iter_frames("shelf.mp4")
+    stream = video_stream.prefetch(video_stream.sample_frames(frames, diff_threshold=5.0), maxsize=2)
+    assert [next(stream)[0] for _ in range(3)] == [0, 10, 20]
+    stream.close()
+    assert len(FakeCapture.released) == 1
+    assert not any(t.name == "video-reader" for t in threading.enumerate())
+
+
+def test_prefetch_drops_when_the_consumer_is_behind(video_stream):
+    done = threading.Event()
+
+    def items():
+        try:
+            yield from range(50)
+        finally:
+            done.set()
+
+    stats = {"dropped": 0}
+    stream = video_stream.prefetch(items(), maxsize=1, drop_when_full=True, stats=stats)
+    received = [next(stream)]
+    done.wait(5)
+    received += list(stream)
+    assert received == sorted(received)
+    assert len(received) + stats["dropped"] == 50
+    assert len(received) <= 3
+
+
+def test_prefetch_reraises_producer_errors(video_stream):
+    def items():
+        yield 1
+        raise RuntimeError("decoder crashed")
+
+    stream = video_stream.prefetch(items())
+    assert next(stream) == 1
+    with pytest.raises(RuntimeError, match="decoder crashed"):
+        next(stream)
+
+
+class StubModel:
+    """One box when the frame is not black, confidence = grey level / 100."""
+
+    def __init__(self):
+        self.batches = []
+
+    def predict(self, source, device, verbose, batch=1):
+        self.batches.append(len(source))
+        results = []
+        for frame in source:
+            level = float(frame[0, 0, 0])
+            conf = [level / 100] if level else []
+            results.append(types.SimpleNamespace(
+                names={0: "drug-name"},
+                boxes=types.SimpleNamespace(
+                    cls=np.zeros(len(conf)), conf=np.array(conf), xyxy=np.zeros((len(conf), 4))),
+            ))
+        return results
+
+
+@pytest.fixture
+def agent(video_stream):
+    agent = VisionAgent.__new__(VisionAgent)
+    agent.model = StubModel()
+    agent.backend = "ultralytics"
+    agent.device = "cpu"
+    agent.last_video_stats = None
+    return agent
+
+
+def test_predict_video_segments(agent):
+    segments = list(agent.predict_video("shelf.mp4", segment_seconds=2.0, diff_threshold=5.0,
+                                        max_gap=10.0, batch_size=4))
+    assert [s["segment"] for s in segments] == [0, 1, 2, 3, 4]
+    assert [s["frames_analyzed"] for s in segments] == [2] * 5
+    # La première scène est noire : aucune détection
+    assert segments[0]["frames_with_detection"] == 1 and segments[0]["best_frame"] == 10
+    assert segments[4]["max_confidence"] == pytest.approx(1.8)
+    assert agent.model.batches == [4, 4, 2]
+    stats = agent.last_video_stats
+    assert (stats["read"], stats["sampled"], stats["detected"]) == (FRAMES, 10, 9)
+    assert stats["video_seconds"] == pytest.approx(FRAMES / FPS)
+    assert len(FakeCapture.released) == 2     # video_fps() + iter_frames()
+
+
+def test_predict_video_stopped_early_releases_the_capture(agent):
+    segments = agent.predict_video("shelf.mp4", segment_seconds=1.0, diff_threshold=5.0, batch_size=1)
+    assert next(segments)["segment"] == 0
+    segments.close()
+    assert len(FakeCapture.released) == 2
+    assert not any(t.name == "video-reader" for t in threading.enumerate())
@@ -0,0 +1,140 @@
+import os
+import subprocess
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from agents.vision_agent import VisionAgent
+
+
+class FakeArray(list):
+    def tolist(self):
+        return list(self)
+
+
+class FakeResult:
+    def __init__(self, image, confidences):
+        self.orig_img = image
+        self.names = {0: "drug-name"}
+        self.speed = {"preprocess": 1.0, "inference": 2.0, "postprocess": 0.5}
+        self.boxes = types.SimpleNamespace(
+            cls=FakeArray([0] * len(confidences)),
+            conf=FakeArray(confidences),
+            xyxy=FakeArray([[1.0, 2.0, 30.04, 40.06]] * len(confidences)),
+        )
+
+    def plot(self):
+        return self.orig_img
+
+
+class StubModel:
+    """Detections derived from the image content: confidence = pixel value / 100."""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, source, device, verbose, batch=1):
+        images = source if isinstance(source, list) else [np.full((4, 4, 3), 50, dtype=np.uint8)]
+        self.calls.append(len(images))
+        return [FakeResult(img, [float(img[0, 0, 0]) / 100, 0.1] if img[0, 0, 0] else []) for img in images]
+
+
+@pytest.fixture
+def fake_cv2(monkeypatch):
+    written = {}
+
+    def imread(path):
+        # Le nom du fichier porte la valeur des pixels ; "bad" n'est pas lisible
+        stem = os.path.splitext(os.path.basename(path))[0]
+        if stem.startswith("bad"):
+            return None
+        return np.full((4, 4, 3), int(stem.split("_")[-1]), dtype=np.uint8)
+
+    def imwrite(path, image):
+        written[path] = image
+        return True
+
+    module = types.SimpleNamespace(imread=imread, imwrite=imwrite)
+    monkeypatch.setitem(sys.modules, "cv2", module)
+    return written
+
+
+@pytest.fixture
+def agent():
+    agent = VisionAgent.__new__(VisionAgent)
+    agent.model = StubModel()
+    agent.backend = "ultralytics"
+    agent.device = "cpu"
+    agent.last_throughput = None
+    agent.last_video_stats = None
+    return agent
+
+
+def touch(folder, names):
+    paths = []
+    for name in names:
+        path = folder / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"")
+        paths.append(str(path))
+    return paths
+
+
+def test_module_imports_without_cv2():
+    code = "import sys; sys.modules['cv2'] = None; import agents.vision_agent"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", code], cwd=root, check=True)
+
+
+def test_summary_lists_every_box_best_first(agent):
+    summary = VisionAgent._summarize(FakeResult(None, [0.3, 0.9, 0.5]))
+    assert [d["confidence"] for d in summary["detections"]] == [0.9, 0.5, 0.3]
+    assert summary["confidence"] == 0.9 and summary["detected_name"] == "drug-name"
+    assert summary["detections"][0]["box"] == [1.0, 2.0, 30.0, 40.1]
+    assert VisionAgent._summarize(FakeResult(None, [])) == {"detected_name": None, "confidence": 0.0, "detections": []}
+
+
+def test_predict_batch_keeps_order_and_reports_unreadable(agent, fake_cv2, tmp_path):
+    paths = touch(tmp_path, [f"img_{v}.png" for v in (10, 0, 70, 20, 90)] + ["bad.png", "img_30.jpg"])
+    outputs = agent.predict_batch(str(tmp_path), batch_size=3, workers=2)
+
+    assert [o["path"] for o in outputs] == sorted(paths)
+    by_name = {os.path.basename(o["path"]): o for o in outputs}
+    assert by_name["bad.png"] == {"path": os.path.join(str(tmp_path), "bad.png"), "error": "unreadable image"}
+    assert by_name["img_70.png"]["confidence"] == 0.7
+    assert by_name["img_0.png"]["detections"] == []
+    # Les images illisibles ne sont pas envoyées au modèle
+    assert agent.model.calls == [2, 3, 1]
+    assert agent.last_throughput > 0
+
+
+def test_predict_batch_annotations_keep_relative_paths(agent, fake_cv2, tmp_path):
+    paths = touch(tmp_path, ["a/img_10.png", "b/img_10.png"])
+    outputs = agent.predict_batch(paths, batch_size=4, annotate_dir=str(tmp_path / "out"))
+    assert [o["annotated"] for o in outputs] == [
+        str(tmp_path / "out" / "a" / "img_10.png"),
+        str(tmp_path / "out" / "b" / "img_10.png"),
+    ]
+    assert sorted(fake_cv2) == sorted(o["annotated"] for o in outputs)
+
+
+def test_predict_images_skips_unreadable(agent):
+    images = [np.full((4, 4, 3), 40, dtype=np.uint8), None]
+    summaries = agent.predict_images(images)
+    assert summaries[0]["confidence"] == 0.4
+    assert summaries[1] == {"error": "unreadable image"}
+    assert agent.model.calls == [1]
+
+
+def test_save_prediction_returns_raw_results(agent, fake_cv2, tmp_path):
+    (image,) = touch(tmp_path, ["shelf.jpg"])
+    out = str(tmp_path / "annotated.jpg")
+
+    results = agent.save_prediction(image, out)
+    assert isinstance(results, list) and isinstance(results[0], FakeResult)
+    assert out in fake_cv2
+
+    summary = agent.save_summary(image, out)
+    assert summary["confidence"] == 0.5 and summary["raw"][0].orig_img is not None
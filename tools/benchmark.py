@@ -0,0 +1,420 @@
+"""
+Repeatable benchmark suite: synthetic datasets at several scales, index
+build and load time, RSS, single and batch query latency for
+RAGSearchAgent and MedicationSearchEngine, dense index recall and latency,
+and vision throughput.
+
+Every measurement runs in a fresh interpreter, so RSS and load times do
+not depend on what ran before. Results are written as JSON; --compare
+prints the change against an earlier run.
+
+Usage:
+    python -m tools.benchmark --scales 500,5000,50000 --out bench.json
+    python -m tools.benchmark --scales 500,5000,50000,500000 --backends brute,inverted --out bench.json
+    python -m tools.benchmark --scales 5000,50000,500000 --backends brute --skip-engine --dense --out dense.json
+    python -m tools.benchmark --scales 500000 --backends brute,sharded --shards 1,2,4,8 --skip-engine --out shards.json
+    python -m tools.benchmark --scales 500 --vision --out bench.json --compare bench_main.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+N_QUERIES = 200
+BATCH_SIZE = 256
+
+# Metrics where a larger value is better; every other metric is a cost
+HIGHER_IS_BETTER = ("images_per_s", "queries_per_s", "recall_at_10")
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+
+def latency_stats(times):
+    times = sorted(times)
+    return {
+        "mean_ms": statistics.mean(times) * 1000,
+        "p50_ms": times[len(times) // 2] * 1000,
+        "p95_ms": times[min(int(len(times) * 0.95), len(times) - 1)] * 1000,
+    }
+
+
+# ----------------------------------------------------
+# Workers (run in a subprocess)
+# ----------------------------------------------------
+
+def worker_rag_build(dataset, index_dir):
+    from agents.dataset_store import load_dataset
+    from agents.tfidf_index import TfidfSnapshot
+
+    start = time.perf_counter()
+    data, dataset_hash = load_dataset(dataset)
+    loaded = time.perf_counter()
+    snapshot = TfidfSnapshot.build(data, dataset_hash)
+    built = time.perf_counter()
+    snapshot.save(index_dir)
+    saved = time.perf_counter()
+
+    return {
+        "dataset_load_s": loaded - start,
+        "fit_s": built - loaded,
+        "save_s": saved - built,
+        "terms": snapshot.matrix.shape[1],
+        "nnz": int(snapshot.matrix.nnz),
+    }
+
+
+def worker_rag_query(dataset, index_dir, backend, shards=None):
+    from agents.rag_search_agent import RAGSearchAgent
+    from tools.synthetic_dataset import make_queries
+
+    before = rss_mb()
+    start = time.perf_counter()
+    rag = RAGSearchAgent(dataset, index_dir=index_dir, backend=backend, shards=shards)
+    load_s = time.perf_counter() - start
+    rss = rss_mb() - before
+
+    queries = make_queries(N_QUERIES)
+    rag.search(queries[0])      # warm-up
+
+    times = []
+    for query in queries:
+        t = time.perf_counter()
+        rag.search(query, top_k=5)
+        times.append(time.perf_counter() - t)
+
+    batch = make_queries(BATCH_SIZE, seed=2)
+    t = time.perf_counter()
+    rag.search_batch(batch, top_k=5)
+    batch_s = time.perf_counter() - t
+    rag.close()
+
+    return {
+        "load_s": load_s,
+        "rss_mb": rss,
+        "single": latency_stats(times),
+        "batch": {
+            "size": BATCH_SIZE,
+            "total_ms": batch_s * 1000,
+            "per_query_ms": batch_s * 1000 / BATCH_SIZE,
+            "queries_per_s": BATCH_SIZE / batch_s,
+        },
+    }
+
+
+def worker_rag_dense(dataset, index_dir, k=10):
+    import numpy as np
+    from agents.dense_index import DenseIndex, dense_index_dir, quantize_int8
+    from agents.rag_search_agent import RAGSearchAgent
+    from agents.tfidf_index import TfidfSnapshot
+    from tools.synthetic_dataset import make_queries
+
+    snapshot = TfidfSnapshot.load(index_dir)
+    start = time.perf_counter()
+    index = DenseIndex.build(snapshot.matrix, snapshot.dataset_hash)
+    build_s = time.perf_counter() - start
+    index.save(dense_index_dir(index_dir, "float32"))
+
+    codes, scales = quantize_int8(np.asarray(index.vectors))
+    int8 = DenseIndex(index.projection, index.centroids, codes, scales, index.offsets,
+                      index.order, index.dataset_hash)
+    int8.save(dense_index_dir(index_dir, "int8"))
+
+    queries = make_queries(N_QUERIES)
+    embeddings = index.embed(snapshot.vectorizer.transform(queries))
+    embeddings = embeddings[embeddings.any(axis=1)]
+    # Référence : parcours exhaustif des vecteurs float32
+    exact = [set(index.exact_search(e, k)[0].tolist()) for e in embeddings]
+
+    def measure(ivf, nprobe):
+        times, hits = [], 0
+        for e, truth in zip(embeddings, exact):
+            t = time.perf_counter()
+            ids, _ = ivf.search(e, k, nprobe=nprobe)
+            times.append(time.perf_counter() - t)
+            hits += len(truth & set(ids.tolist()))
+        return dict(latency_stats(times), **{f"recall_at_{k}": hits / (k * len(exact))})
+
+    result = {
+        "build_s": build_s,
+        "dim": index.dim,
+        "nlist": index.nlist,
+        "float32_mb": index.vectors.nbytes / 1e6,
+        "int8_mb": (codes.nbytes + scales.nbytes) / 1e6,
+    }
+
+    times = []
+    for e in embeddings:
+        t = time.perf_counter()
+        index.exact_search(e, k)
+        times.append(time.perf_counter() - t)
+    result["exact_float32"] = latency_stats(times)
+
+    for nprobe in sorted({max(1, index.nprobe // 2), index.nprobe, min(index.nlist, index.nprobe * 2)}):
+        result[f"ivf_float32_nprobe{nprobe}"] = measure(index, nprobe)
+        result[f"ivf_int8_nprobe{nprobe}"] = measure(int8, nprobe)
+
+    # Bout en bout par l'agent (transform + recherche + mise en forme)
+    for mode in ("dense", "hybrid"):
+        rag = RAGSearchAgent(dataset, index_dir=index_dir, backend="inverted", retrieval=mode)
+        rag.search(queries[0])      # warm-up
+        times = []
+        for query in queries:
+            t = time.perf_counter()
+            rag.search(query, top_k=5)
+            times.append(time.perf_counter() - t)
+        result[f"agent_{mode}"] = latency_stats(times)
+
+    return result
+
+
+def worker_engine(dataset):
+    from search_engine import MedicationSearchEngine
+    from tools.synthetic_dataset import make_queries
+
+    before = rss_mb()
+    start = time.perf_counter()
+    engine = MedicationSearchEngine(dataset)
+    build_s = time.perf_counter() - start
+    rss = rss_mb() - before
+
+    queries = make_queries(N_QUERIES)
+    times = []
+    for query in queries:
+        t = time.perf_counter()
+        engine.search(query, top_k=5)
+        times.append(time.perf_counter() - t)
+
+    # Pas d'API batch : on mesure la boucle
+    batch = make_queries(BATCH_SIZE, seed=2)
+    t = time.perf_counter()
+    for query in batch:
+        engine.search(query, top_k=5)
+    batch_s = time.perf_counter() - t
+
+    return {
+        "build_s": build_s,
+        "rss_mb": rss,
+        "single": latency_stats(times),
+        "batch": {
+            "size": BATCH_SIZE,
+            "total_ms": batch_s * 1000,
+            "per_query_ms": batch_s * 1000 / BATCH_SIZE,
+            "queries_per_s": BATCH_SIZE / batch_s,
+        },
+    }
+
+
+def worker_vision(model_path, backend, n_images, batch_size):
+    try:
+        import cv2
+        import numpy as np
+        from agents.vision_agent import VisionAgent
+    except ImportError as e:
+        return {"skipped": f"missing dependency: {e.name}"}
+    if not os.path.exists(model_path):
+        return {"skipped": f"model not found: {model_path}"}
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        # Images "boîte" synthétiques : fond bruité + rectangles
+        for i in range(n_images):
+            image = rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)
+            for _ in range(3):
+                x, y = rng.integers(0, 500), rng.integers(0, 350)
+                color = tuple(int(c) for c in rng.integers(0, 255, 3))
+                cv2.rectangle(image, (x, y), (x + 140, y + 120), color, -1)
+            cv2.imwrite(os.path.join(tmp, f"img_{i:05d}.jpg"), image)
+
+        agent = VisionAgent(model_path, backend=backend)
+        agent.predict_batch(tmp, batch_size=batch_size)     # warm-up
+        start = time.perf_counter()
+        agent.predict_batch(tmp, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+
+    return {
+        "backend": backend,
+        "images": n_images,
+        "batch_size": batch_size,
+        "elapsed_s": elapsed,
+        "images_per_s": n_images / elapsed,
+    }
+
+
+WORKERS = {
+    "rag_build": worker_rag_build,
+    "rag_query": worker_rag_query,
+    "rag_dense": worker_rag_dense,
+    "engine": worker_engine,
+    "vision": worker_vision,
+}
+
+
+def run_worker(name, *args):
+    out = subprocess.run(
+        [sys.executable, "-m", "tools.benchmark", "--worker", name, *map(str, args)],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if out.returncode != 0:
+        raise RuntimeError(f"[Bench] Worker {name} failed:\n{out.stderr[-2000:]}")
+    # Last line is the JSON result; everything before is the agents' logging
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+# ----------------------------------------------------
+# Orchestration
+# ----------------------------------------------------
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_scale(size, data_dir, backends, skip_engine, dense=False, shard_counts=()):
+    from tools.synthetic_dataset import write_dataset
+
+    dataset = os.path.join(data_dir, f"synthetic_{size}.json")
+    if not os.path.exists(dataset):
+        print(f"[Bench] Generating {size} medications...")
+        write_dataset(size, dataset)
+
+    result = {"dataset_mb": os.path.getsize(dataset) / 1e6}
+    with tempfile.TemporaryDirectory() as index_dir:
+        print(f"[Bench] {size}: building TF-IDF index...")
+        result["rag_build"] = run_worker("rag_build", dataset, index_dir)
+        for backend in backends:
+            if backend == "sharded":
+                for shards in shard_counts:
+                    print(f"[Bench] {size}: RAG queries (sharded, {shards} workers)...")
+                    result[f"rag_sharded_{shards}"] = run_worker("rag_query", dataset, index_dir, backend, shards)
+                continue
+            print(f"[Bench] {size}: RAG queries ({backend})...")
+            result[f"rag_{backend}"] = run_worker("rag_query", dataset, index_dir, backend)
+        if dense:
+            print(f"[Bench] {size}: dense index (recall, latency)...")
+            result["rag_dense"] = run_worker("rag_dense", dataset, index_dir)
+
+    if not skip_engine:
+        print(f"[Bench] {size}: keyword search engine...")
+        result["search_engine"] = run_worker("engine", dataset)
+    return result
+
+
+def flatten(tree, prefix=""):
+    flat = {}
+    for key, value in tree.items():
+        path = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(current, baseline_path, threshold=0.10):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    old = flatten(baseline.get("results", {}))
+    new = flatten(current["results"])
+    print(f"\n[Bench] Compared with {baseline_path} ({baseline.get('meta', {}).get('commit')}):")
+
+    regressions = 0
+    for key in sorted(new.keys() & old.keys()):
+        if not old[key]:
+            continue
+        change = new[key] / old[key] - 1
+        worse = -change if key.endswith(HIGHER_IS_BETTER) else change
+        flag = ""
+        if worse > threshold and not key.endswith(("terms", "nnz", "size", "images", "dataset_mb", "dim", "nlist")):
+            flag = "  <-- regression"
+            regressions += 1
+        print(f"  {key:55s} {old[key]:12.3f} -> {new[key]:12.3f} ({change:+.1%}){flag}")
+    print(f"[Bench] {regressions} metrics worse by more than {threshold:.0%}")
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == "--worker":
+        name, args = sys.argv[2], sys.argv[3:]
+        if name == "vision":
+            args = [args[0], args[1], int(args[2]), int(args[3])]
+        elif name == "rag_query" and len(args) > 3:
+            args = [args[0], args[1], args[2], int(args[3])]
+        print(json.dumps(WORKERS[name](*args)))
+        return
+
+    parser = argparse.ArgumentParser(description="Benchmark suite.")
+    parser.add_argument("--scales", default="500,5000,50000",
+                        help="Comma-separated dataset sizes (up to 500000)")
+    parser.add_argument("--backends", default="brute,inverted",
+                        help="RAGSearchAgent backends to measure (brute, inverted, live, sharded)")
+    parser.add_argument("--shards", default=None,
+                        help="Comma-separated worker counts for the sharded backend (default: CPU count)")
+    parser.add_argument("--data-dir", default="data/bench", help="Where synthetic datasets are cached")
+    parser.add_argument("--skip-engine", action="store_true", help="Skip MedicationSearchEngine")
+    parser.add_argument("--dense", action="store_true",
+                        help="Also build the dense index and measure its recall and latency")
+    parser.add_argument("--vision", action="store_true", help="Also measure detector throughput")
+    parser.add_argument("--model", default="data/models/yolo_best.pt")
+    parser.add_argument("--vision-backend", default="ultralytics")
+    parser.add_argument("--images", type=int, default=64)
+    parser.add_argument("--vision-batch", type=int, default=16)
+    parser.add_argument("--out", default=None, help="Write results to this JSON file")
+    parser.add_argument("--compare", default=None, help="Earlier results JSON to compare with")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative change reported as a regression by --compare")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.scales.split(",") if s]
+    backends = [b for b in args.backends.split(",") if b]
+    shard_counts = [int(n) for n in (args.shards or str(os.cpu_count() or 1)).split(",") if n]
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "results": {},
+    }
+
+    for size in sizes:
+        report["results"][str(size)] = bench_scale(
+            size, args.data_dir, backends, args.skip_engine, args.dense, shard_counts
+        )
+    if args.vision:
+        print("[Bench] Vision throughput...")
+        report["results"]["vision"] = run_worker(
+            "vision", args.model, args.vision_backend, args.images, args.vision_batch
+        )
+
+    text = json.dumps(report, indent=4)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"[Bench] Results saved to {args.out}")
+    else:
+        print(text)
+
+    if args.compare:
+        compare(report, args.compare, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
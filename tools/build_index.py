@@ -0,0 +1,70 @@
+"""
+Builds the TF-IDF snapshot used by RAGSearchAgent ahead of time.
+
+Usage:
+    python -m tools.build_index
+    python -m tools.build_index --dataset data/enriched/openfda_enriched_500.json --force
+    python -m tools.build_index --dense --dense-dtype int8
+"""
+import argparse
+import time
+
+from agents.dataset_store import load_dataset
+from agents.dense_index import DenseIndex, dense_index_dir
+from agents.tfidf_index import TfidfSnapshot, default_index_dir
+
+
+def build_dense(index_dir, dataset_hash, dtype, force):
+    dense_dir = dense_index_dir(index_dir, dtype)
+    if not force and DenseIndex.is_fresh(dense_dir, dataset_hash, dtype):
+        print(f"[Dense] {dense_dir} is up to date.")
+        return
+
+    snapshot = TfidfSnapshot.load(index_dir)
+    start = time.perf_counter()
+    index = DenseIndex.build(snapshot.matrix, dataset_hash, dtype=dtype)
+    index.save(dense_dir)
+    elapsed = time.perf_counter() - start
+    print(f"[Dense] Saved {dense_dir}: {index.dim} dims, {index.nlist} clusters, "
+          f"{index.vectors.nbytes / 1e6:.1f} MB of {dtype} vectors in {elapsed:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the TF-IDF index snapshot.")
+    parser.add_argument("--dataset", default="data/enriched/openfda_enriched_500.json",
+                        help="Enriched dataset, .json or .medstore")
+    parser.add_argument("--index-dir", default=None,
+                        help="Output directory (default: <dataset>.index next to the dataset)")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the snapshot is fresh")
+    parser.add_argument("--dense", action="store_true",
+                        help="Also build the dense (LSA + IVF) index used by retrieval='dense'/'hybrid'")
+    parser.add_argument("--dense-dtype", default="float32", choices=("float32", "int8"))
+    args = parser.parse_args()
+
+    index_dir = args.index_dir or default_index_dir(args.dataset)
+
+    data, dataset_hash = load_dataset(args.dataset)
+
+    if not args.force and TfidfSnapshot.is_fresh(index_dir, dataset_hash):
+        print(f"[Index] {index_dir} is up to date ({dataset_hash[:12]}).")
+        if args.dense:
+            build_dense(index_dir, dataset_hash, args.dense_dtype, args.force)
+        return
+
+    print(f"[Index] Building snapshot for {len(data)} medications...")
+
+    start = time.perf_counter()
+    snapshot = TfidfSnapshot.build(data, dataset_hash)
+    snapshot.save(index_dir)
+    elapsed = time.perf_counter() - start
+
+    rows, cols = snapshot.matrix.shape
+    print(f"[Index] Saved {index_dir}: {rows} docs x {cols} terms, "
+          f"{snapshot.matrix.nnz} non-zeros in {elapsed:.2f}s")
+
+    if args.dense:
+        build_dense(index_dir, dataset_hash, args.dense_dtype, force=True)
+
+
+if __name__ == "__main__":
+    main()
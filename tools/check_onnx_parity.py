@@ -0,0 +1,140 @@
+"""
+Compares an exported ONNX detector against the original .pt checkpoint on
+the validation set: box/confidence parity, latency, and accuracy against
+the ground-truth labels.
+
+Usage:
+    python -m tools.check_onnx_parity --onnx data/models/yolo_best.onnx
+    python -m tools.check_onnx_parity --onnx data/models/yolo_best.int8.onnx --conf-tol 0.1 --threads 4
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import cv2
+
+from agents.vision_agent import VisionAgent
+
+
+def iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(x2 - x1, 0) * max(y2 - y1, 0)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def match(reference, candidate, threshold=0.5):
+    """
+    Greedy one-to-one matching by IoU. Returns [(ref_idx, cand_idx, iou)].
+    """
+    pairs = sorted(
+        ((iou(r, c), i, j) for i, r in enumerate(reference) for j, c in enumerate(candidate)),
+        reverse=True
+    )
+    used_r, used_c, matches = set(), set(), []
+    for score, i, j in pairs:
+        if score < threshold:
+            break
+        if i in used_r or j in used_c:
+            continue
+        used_r.add(i)
+        used_c.add(j)
+        matches.append((i, j, score))
+    return matches
+
+
+def load_labels(image_path, shape):
+    """
+    Ground-truth boxes (xyxy pixels) from the YOLO label file of an image.
+    """
+    base = os.path.splitext(image_path)[0] + ".txt"
+    label_path = base.replace(f"{os.sep}images{os.sep}", f"{os.sep}labels{os.sep}")
+    if not os.path.exists(label_path):
+        return []
+    h, w = shape[:2]
+    boxes = []
+    with open(label_path, "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) < 5:
+                continue
+            cx, cy, bw, bh = (float(v) for v in parts[1:5])
+            boxes.append([(cx - bw / 2) * w, (cy - bh / 2) * h, (cx + bw / 2) * w, (cy + bh / 2) * h])
+    return boxes
+
+
+def run(agent, image):
+    start = time.perf_counter()
+    result = agent.model.predict(source=[image], device=agent.device, verbose=False)[0]
+    elapsed = time.perf_counter() - start
+    return VisionAgent._summarize(result)["detections"], elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check ONNX vs PyTorch detector parity.")
+    parser.add_argument("--weights", default="data/models/yolo_best.pt")
+    parser.add_argument("--onnx", required=True)
+    parser.add_argument("--images", default="data/yolo/valid/images")
+    parser.add_argument("--threads", type=int, default=None, help="onnxruntime intra-op threads")
+    parser.add_argument("--iou-tol", type=float, default=0.9, help="Minimum IoU between matched boxes")
+    parser.add_argument("--conf-tol", type=float, default=0.05, help="Maximum confidence difference")
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    reference = VisionAgent(args.weights, backend="ultralytics")
+    candidate = VisionAgent(args.onnx, backend="onnx", threads=args.threads)
+
+    paths = VisionAgent.list_images(args.images)[:args.limit]
+    print(f"[Parity] {len(paths)} validation images")
+
+    latencies = {"pt": [], "onnx": []}
+    accuracy = {name: {"tp": 0, "fp": 0, "fn": 0} for name in latencies}
+    worst_iou, worst_conf, count_mismatch = 1.0, 0.0, 0
+
+    for path in paths:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        ref_dets, ref_time = run(reference, image)
+        cand_dets, cand_time = run(candidate, image)
+        latencies["pt"].append(ref_time)
+        latencies["onnx"].append(cand_time)
+
+        if len(ref_dets) != len(cand_dets):
+            count_mismatch += 1
+        for i, j, score in match([d["box"] for d in ref_dets], [d["box"] for d in cand_dets]):
+            worst_iou = min(worst_iou, score)
+            worst_conf = max(worst_conf, abs(ref_dets[i]["confidence"] - cand_dets[j]["confidence"]))
+
+        truth = load_labels(path, image.shape)
+        for name, dets in (("pt", ref_dets), ("onnx", cand_dets)):
+            tp = len(match(truth, [d["box"] for d in dets]))
+            accuracy[name]["tp"] += tp
+            accuracy[name]["fp"] += len(dets) - tp
+            accuracy[name]["fn"] += len(truth) - tp
+
+    # La première image inclut le warm-up : exclue des latences
+    for name, times in latencies.items():
+        times = sorted(times[1:] or times)
+        if not times:
+            continue
+        acc = accuracy[name]
+        precision = acc["tp"] / max(acc["tp"] + acc["fp"], 1)
+        recall = acc["tp"] / max(acc["tp"] + acc["fn"], 1)
+        p95 = times[min(int(len(times) * 0.95), len(times) - 1)]
+        print(f"[Parity] {name:>4}: mean {statistics.mean(times) * 1000:.1f} ms, "
+              f"p95 {p95 * 1000:.1f} ms | precision {precision:.3f}, recall {recall:.3f} (IoU 0.5)")
+
+    print(f"[Parity] Worst matched IoU {worst_iou:.3f}, worst confidence gap {worst_conf:.3f}, "
+          f"{count_mismatch} images with a different box count")
+
+    ok = worst_iou >= args.iou_tol and worst_conf <= args.conf_tol
+    print("[Parity] OK" if ok else "[Parity] FAILED: outside tolerance")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
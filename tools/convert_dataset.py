@@ -0,0 +1,74 @@
+"""
+Converts a JSON dataset into the compact .medstore format, and compares
+load time and memory of both formats.
+
+Usage:
+    python -m tools.convert_dataset data/enriched/openfda_enriched_500.json
+    python -m tools.convert_dataset data/enriched/openfda_enriched_500.json --measure
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from agents.dataset_store import convert_json
+
+# Runs in a fresh interpreter so each format gets its own RSS measurement
+MEASURE_SNIPPET = """
+import json, os, sys, time
+from agents.dataset_store import load_dataset
+from agents.tfidf_index import build_corpus
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+before = rss_mb()
+start = time.perf_counter()
+data, _ = load_dataset(sys.argv[1])
+loaded = time.perf_counter()
+corpus = build_corpus(data)
+done = time.perf_counter()
+print(json.dumps({
+    "load_s": loaded - start,
+    "load_and_corpus_s": done - start,
+    "rss_delta_mb": rss_mb() - before,
+}))
+"""
+
+
+def measure(path):
+    root = Path(__file__).resolve().parent.parent
+    out = subprocess.run(
+        [sys.executable, "-c", MEASURE_SNIPPET, str(path)],
+        cwd=root, capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a JSON dataset to .medstore.")
+    parser.add_argument("json_path")
+    parser.add_argument("--out", default=None, help="Output path (default: same name, .medstore)")
+    parser.add_argument("--measure", action="store_true",
+                        help="Compare load time and RSS of the JSON and .medstore files")
+    args = parser.parse_args()
+
+    out = args.out or str(Path(args.json_path).with_suffix(".medstore"))
+    header = convert_json(args.json_path, out)
+    print(f"[Store] {header['count']} records, {len(header['fields']) - 1} fields -> {out}")
+    print(f"[Store] {os.path.getsize(args.json_path) / 1e6:.1f} MB JSON -> "
+          f"{os.path.getsize(out) / 1e6:.1f} MB store")
+
+    if args.measure:
+        for path in (args.json_path, out):
+            stats = measure(path)
+            print(f"[Measure] {path}: load {stats['load_s'] * 1000:.1f} ms, "
+                  f"load+corpus {stats['load_and_corpus_s'] * 1000:.1f} ms, "
+                  f"RSS +{stats['rss_delta_mb']:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Runs the VisionAgent over a folder (or list) of images in batches.
+
+Usage:
+    python -m tools.detect_batch data/intake_photos
+    python -m tools.detect_batch data/intake_photos --batch-size 32 --annotate-dir runs/annotated --output detections.json
+"""
+import argparse
+import json
+
+from agents.vision_agent import VisionAgent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch medication box detection.")
+    parser.add_argument("sources", nargs="+", help="Image directory, or image files")
+    parser.add_argument("--model", default="data/models/yolo_best.pt")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=4, help="Image decoding threads")
+    parser.add_argument("--annotate-dir", default=None, help="Write images with boxes drawn here")
+    parser.add_argument("--output", default=None, help="Write all detections to this JSON file")
+    args = parser.parse_args()
+
+    source = args.sources[0] if len(args.sources) == 1 else args.sources
+
+    agent = VisionAgent(args.model, device=args.device)
+    outputs = agent.predict_batch(source, batch_size=args.batch_size,
+                                  workers=args.workers, annotate_dir=args.annotate_dir)
+
+    detected = sum(1 for o in outputs if o.get("detected_name"))
+    errors = sum(1 for o in outputs if "error" in o)
+    print(f"[Detect] {detected}/{len(outputs)} images with a medication box, {errors} unreadable, "
+          f"{agent.last_throughput:.1f} img/s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(outputs, f, indent=4)
+        print(f"[Detect] Saved detections to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Streams a shelf video through the VisionAgent and prints one detection
+summary per segment.
+
+Usage:
+    python -m tools.detect_video shelf.mp4
+    python -m tools.detect_video shelf.mp4 --segment 5 --stride 2 --drop-when-busy --output segments.jsonl
+"""
+import argparse
+import json
+from contextlib import closing
+
+from agents.vision_agent import BACKENDS, VisionAgent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Frame-sampled medication detection on a video.")
+    parser.add_argument("video")
+    parser.add_argument("--model", default="data/models/yolo_best.pt")
+    parser.add_argument("--backend", default="ultralytics", choices=BACKENDS)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--segment", type=float, default=2.0, help="Segment length in seconds")
+    parser.add_argument("--stride", type=int, default=1, help="Decode one frame out of N")
+    parser.add_argument("--diff-threshold", type=float, default=8.0,
+                        help="Mean grey-level change (0-255) for a frame to count as new")
+    parser.add_argument("--max-gap", type=float, default=2.0,
+                        help="Analyze at least one frame every N seconds")
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--drop-when-busy", action="store_true",
+                        help="Drop frames while the detector is behind (real-time mode)")
+    parser.add_argument("--output", default=None, help="Write the segment summaries as JSONL")
+    args = parser.parse_args()
+
+    agent = VisionAgent(args.model, backend=args.backend, threads=args.threads)
+    segments = agent.predict_video(
+        args.video,
+        segment_seconds=args.segment,
+        stride=args.stride,
+        diff_threshold=args.diff_threshold,
+        max_gap=args.max_gap,
+        batch_size=args.batch_size,
+        drop_when_busy=args.drop_when_busy
+    )
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else None
+    # closing : Ctrl+C ou une erreur d'écriture libèrent la vidéo tout de suite
+    with closing(segments):
+        try:
+            for segment in segments:
+                found = "medication" if segment["frames_with_detection"] else "nothing"
+                print(f"[Video] {segment['start']:7.1f}s-{segment['end']:7.1f}s: {found} "
+                      f"({segment['frames_with_detection']}/{segment['frames_analyzed']} frames, "
+                      f"max conf {segment['max_confidence']:.2f})")
+                if out:
+                    out.write(json.dumps(segment) + "\n")
+        finally:
+            if out:
+                out.close()
+
+
+if __name__ == "__main__":
+    main()
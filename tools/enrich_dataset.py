@@ -1,13 +1,29 @@
+import argparse
+import hashlib
 import json
 import time
 import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from groq import Groq
 from dotenv import load_dotenv
 import os
 
+from agents import metrics
+from agents.llm_cache import LLMCache
+from agents.rate_limit import TokenBucket
+from agents.scraping_agent import drop_partial_line
+
 load_dotenv()
 
 
+FALLBACK = {
+    "symptoms": [],
+    "category": "unknown",
+    "tags": [],
+    "clean_indications": ""
+}
+
+
 def extract_json(text):
     """Extracts the largest JSON object from a messy LLM output."""
     json_candidates = re.findall(r'\{(?:[^{}]|(?:\{[^{}]*\}))*\}', text, flags=re.DOTALL)
@@ -25,15 +41,223 @@ def extract_json(text):
     raise ValueError("No valid JSON object found in response.")
 
 
+def strip_code_fences(content):
+    content = content.strip()
+
+    # remove code fencing if present
+    if content.startswith("```"):
+        content = content.replace("```json", "").replace("```", "").strip()
+
+    return content
+
+
+def parse_llm_json(content):
+    """Strips code fences from a raw LLM answer and extracts its JSON."""
+    # extract clean JSON
+    return extract_json(strip_code_fences(content))
+
+
+def extract_keyed_json(text, keys):
+    """
+    Extracts {key: value} for the expected keys from a batched LLM output.
+
+    The whole keyed object is tried first. Keys still missing (e.g. when the
+    answer was cut by max_tokens) are then decoded one `"key": {...}` value
+    at a time, so the valid part of a broken answer is kept. Keys that
+    cannot be recovered are absent from the result.
+    """
+    text = strip_code_fences(text)
+    decoder = json.JSONDecoder()
+    found = {}
+
+    for match in re.finditer(r"\{", text):
+        try:
+            obj, _ = decoder.raw_decode(text, match.start())
+        except ValueError:
+            continue
+        if isinstance(obj, dict) and any(key in obj for key in keys):
+            found = {key: obj[key] for key in keys if key in obj}
+            break
+
+    for key in keys:
+        if key in found:
+            continue
+        match = re.search(re.escape(json.dumps(key)) + r"\s*:\s*", text)
+        if match is None:
+            continue
+        try:
+            found[key], _ = decoder.raw_decode(text, match.end())
+        except ValueError:
+            continue
+
+    if not found:
+        raise ValueError("No keyed JSON object found in response.")
+    return found
+
+
+def validate_enrichment(obj):
+    """
+    Returns the enrichment restricted to the expected schema, or None if a
+    field is missing or has the wrong type.
+    """
+    if not isinstance(obj, dict):
+        return None
+    if not isinstance(obj.get("symptoms"), list) or not isinstance(obj.get("tags"), list):
+        return None
+    if not isinstance(obj.get("category"), str) or not isinstance(obj.get("clean_indications"), str):
+        return None
+    return {key: obj[key] for key in FALLBACK}
+
+
+# Raw fields that feed the enrichment prompt
+PROMPT_FIELDS = ("name", "indications_and_usage")
+
+
+def prompt_fingerprint(entry):
+    """Hash of the fields that feed the prompt: same hash, same enrichment input."""
+    payload = json.dumps([entry.get(field, "") for field in PROMPT_FIELDS], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_fallback(entry):
+    """True when an enriched entry only carries the FALLBACK structure (failed enrichment)."""
+    return all(entry.get(key) == value for key, value in FALLBACK.items())
+
+
+def diff_datasets(raw, enriched):
+    """
+    Compares the raw dataset with an existing enriched output.
+    Enriched entries still carry the raw fields they were built from, so
+    their fingerprint is the one of the raw entry at enrichment time.
+    Entries left with the fallback by a failed enrichment count as changed,
+    so they are retried.
+    Returns (added, changed, removed, unchanged) lists of names.
+    """
+    added, changed, unchanged = [], [], []
+    for name, entry in raw.items():
+        if name not in enriched:
+            added.append(name)
+        elif prompt_fingerprint(entry) != prompt_fingerprint(enriched[name]) or is_fallback(enriched[name]):
+            changed.append(name)
+        else:
+            unchanged.append(name)
+    removed = [name for name in enriched if name not in raw]
+    return added, changed, removed, unchanged
+
+
 class DatasetEnricher:
-    def __init__(self, input_path, output_path):
+    MODEL = "llama-3.1-8b-instant"
+    TEMPERATURE = 0.2
+    MAX_TOKENS = 300
+
+    # Limites par défaut des modes concurrents (offre gratuite Groq)
+    REQUESTS_PER_MINUTE = 30
+    TOKENS_PER_MINUTE = 6000
+
+    def __init__(self, input_path, output_path, base_url=None,
+                 requests_per_minute=None, tokens_per_minute=None, cache=None):
         self.input_path = input_path
         self.output_path = output_path
+        self.cache = cache
+        # Fait partie de la clé du cache : un serveur local n'y mélange pas ses réponses
+        self.base_url = base_url
 
-        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+        # base_url permet de viser un serveur local (tools/mock_llm_server.py)
+        api_key = os.getenv("GROQ_API_KEY")
+        if base_url and not api_key:
+            api_key = "local"
+        self.client = Groq(api_key=api_key, base_url=base_url)
+
+        # Limites données explicitement : appliquées à chaque appel. Sinon
+        # seuls les modes concurrents les appliquent ; run() garde sa pause de 0.1 s
+        self.rate_limited = requests_per_minute is not None or tokens_per_minute is not None
+        self.request_limiter = TokenBucket.per_minute(requests_per_minute or self.REQUESTS_PER_MINUTE)
+        self.token_limiter = TokenBucket.per_minute(tokens_per_minute or self.TOKENS_PER_MINUTE)
         print("[LLM] Groq Enricher initialized.")
 
+    @staticmethod
+    def estimate_tokens(text):
+        # ~4 characters per token for English text
+        return len(text) // 4 + 1
+
+    def _throttle(self, prompt, max_tokens):
+        """
+        Waits for a request slot and for the estimated token budget.
+        Returns the number of tokens reserved.
+        """
+        reserved = self.estimate_tokens(prompt) + max_tokens
+        self.request_limiter.acquire()
+        self.token_limiter.acquire(reserved)
+        return reserved
+
+    def _settle_tokens(self, response, reserved):
+        # Charge the difference when the real usage exceeds the estimate
+        usage = getattr(response, "usage", None)
+        used = getattr(usage, "total_tokens", None)
+        if used and used > reserved:
+            self.token_limiter.acquire(used - reserved)
+
+    def complete(self, prompt, max_tokens=None):
+        """
+        One throttled chat-completion call; returns the raw response text.
+        """
+        max_tokens = max_tokens or self.MAX_TOKENS
+        reserved = None
+        if self.rate_limited:
+            with metrics.span("llm_throttle_wait"):
+                reserved = self._throttle(prompt, max_tokens)
+        with metrics.span("llm_call", model=self.MODEL):
+            response = self.client.chat.completions.create(
+                model=self.MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=self.TEMPERATURE,
+                max_tokens=max_tokens
+            )
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            metrics.inc("llm_tokens_total", getattr(usage, "prompt_tokens", 0) or 0, kind="prompt")
+            metrics.inc("llm_tokens_total", getattr(usage, "completion_tokens", 0) or 0, kind="completion")
+        if reserved is not None:
+            self._settle_tokens(response, reserved)
+        return response.choices[0].message.content
+
+    def ask(self, prompt, parse, max_tokens=None):
+        """
+        Cached completion followed by `parse`. Cached and fresh answers go
+        through the same parsing; an answer that fails to parse is evicted.
+        """
+        max_tokens = max_tokens or self.MAX_TOKENS
+        key = LLMCache.make_key(self.MODEL, prompt, self.TEMPERATURE, max_tokens, self.base_url)
+
+        content = self.cache.get(key) if self.cache else None
+        metrics.inc("llm_requests_total", source="cache" if content is not None else "api")
+        if content is None:
+            content = self.complete(prompt, max_tokens)
+            if self.cache:
+                self.cache.put(key, content)
+
+        try:
+            return parse(content)
+        except Exception:
+            metrics.inc("llm_parse_failures_total")
+            # never keep an answer that could not be parsed
+            if self.cache:
+                self.cache.delete(key)
+            raise
+
     def enrich_medicine(self, entry):
+        """
+        Enriches one medication, or returns the fallback structure.
+        """
+        enriched = self.try_enrich_medicine(entry)
+        if enriched is None:
+            return dict(FALLBACK)
+        return enriched
+
+    def try_enrich_medicine(self, entry):
+        """
+        Enriches one medication. Returns None when every attempt failed.
+        """
         name = entry.get("name", "")
         indications = entry.get("indications_and_usage", "")
 
@@ -54,21 +278,7 @@ Return ONLY valid JSON, no explanation.
 
         for attempt in range(3):
             try:
-                response = self.client.chat.completions.create(
-                    model="llama-3.1-8b-instant",
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.2,
-                    max_tokens=300
-                )
-
-                content = response.choices[0].message.content.strip()
-
-                # remove code fencing if present
-                if content.startswith("```"):
-                    content = content.replace("```json", "").replace("```", "").strip()
-
-                # extract clean JSON
-                return extract_json(content)
+                return self.ask(prompt, parse_llm_json)
 
             except Exception as e:
                 print(f"[WARNING] {name} → Attempt {attempt+1} failed: {e}")
@@ -76,12 +286,7 @@ Return ONLY valid JSON, no explanation.
 
         # fallback if totally impossible
         print(f"[FAILED] {name} → Using fallback empty structure.")
-        return {
-            "symptoms": [],
-            "category": "unknown",
-            "tags": [],
-            "clean_indications": ""
-        }
+        return None
 
     def run(self):
         print("[Enricher] Loading dataset...")
@@ -98,20 +303,324 @@ Return ONLY valid JSON, no explanation.
 
             enriched_data[name] = {**entry, **enriched}
 
-            time.sleep(0.1)
+            if not self.rate_limited:
+                time.sleep(0.1)
+
+        self.save(enriched_data)
+        self.report_cache()
 
+    def report_cache(self):
+        if self.cache:
+            stats = self.cache.stats()
+            print(f"[Cache] hits={stats['hits']} misses={stats['misses']} "
+                  f"hit_rate={stats['hit_rate']:.1%} entries={stats['entries']}")
+
+    def save(self, enriched_data):
         print("[Enricher] Saving final enriched dataset...")
         os.makedirs(os.path.dirname(self.output_path), exist_ok=True)
 
-        with open(self.output_path, "w", encoding="utf-8") as f:
+        tmp_path = self.output_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
             json.dump(enriched_data, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, self.output_path)
 
         print(f"[DONE] Saved enriched dataset to {self.output_path}")
 
+    # ----------------------------------------------------
+    # CONCURRENT MODE
+    # ----------------------------------------------------
+    @staticmethod
+    def load_checkpoint(path):
+        """
+        {name: enriched fields} from a checkpoint JSONL file. A line cut by
+        a crash is ignored.
+        """
+        done = {}
+        if not os.path.exists(path):
+            return done
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                done[record["name"]] = record["enriched"]
+        return done
+
+    def run_concurrent(self, workers=4, checkpoint_path=None, batch_size=1):
+        """
+        Enriches medications with `workers` parallel LLM calls, throttled by
+        the request and token limiters, one prompt per medication or
+        `batch_size` per request. Each successful result is appended to the
+        checkpoint as soon as it arrives; re-running skips entries already
+        in the checkpoint. Failed entries get the fallback in the output but
+        stay out of the checkpoint, so the next run retries them.
+        """
+        checkpoint_path = checkpoint_path or self.output_path + ".ckpt.jsonl"
+        # Appels parallèles : toujours sous les limites de l'API
+        self.rate_limited = True
+
+        print("[Enricher] Loading dataset...")
+        with open(self.input_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        done = self.load_checkpoint(checkpoint_path)
+        todo = [name for name in data if name not in done]
+        print(f"[Enricher] {len(data)} medications, {len(done)} already in checkpoint, "
+              f"{len(todo)} to enrich with {workers} workers.")
+
+        os.makedirs(os.path.dirname(checkpoint_path) or ".", exist_ok=True)
+        drop_partial_line(checkpoint_path)
+        failed = set()
+        processed = 0
+        start = time.perf_counter()
+
+        with open(checkpoint_path, "a", encoding="utf-8") as ckpt:
+            def commit(name, enriched):
+                nonlocal processed
+                processed += 1
+                if enriched is None:
+                    failed.add(name)
+                else:
+                    done[name] = enriched
+                    ckpt.write(json.dumps({"name": name, "enriched": enriched},
+                                          ensure_ascii=False) + "\n")
+                    ckpt.flush()
+                print(f"[{processed}/{len(todo)}] Processed: {name}")
+
+            self.enrich_many(data, todo, workers, batch_size, on_result=commit)
+
+        elapsed = time.perf_counter() - start
+        print(f"[Enricher] {len(todo)} medications in {elapsed:.1f}s, {len(failed)} failed.")
+
+        enriched_data = {
+            name: {**entry, **done.get(name, FALLBACK)}
+            for name, entry in data.items()
+        }
+        self.save(enriched_data)
+        self.report_cache()
+        return enriched_data
+
+    # ----------------------------------------------------
+    # BATCHED MODE
+    # ----------------------------------------------------
+    BATCH_PROMPT_TOKENS = 6000     # prompt budget per batched request (upper bound)
+    BATCH_OUTPUT_TOKENS = 4096     # max_tokens cap for a batched request (upper bound)
+    ITEM_OUTPUT_TOKENS = 250       # expected answer size per medication
+    # Part du budget de tokens par minute qu'une seule requête batchée peut réserver
+    BATCH_TPM_SHARE = 0.5
+
+    BATCH_HEADER = """
+You are a medical NLP expert. Extract structured information from each medication description below.
+"""
+
+    BATCH_FOOTER = """
+Return ONE JSON object whose keys are the ids above (m1, m2, ...).
+Each value is a JSON object with:
+- symptoms: list of symptoms mentioned
+- category: one medical category (pain relief, cold & flu, antibacterial, skin care, allergy, fever, stomach, etc.)
+- tags: 5–10 relevant keywords
+- clean_indications: a short normalized rewritten version (one sentence)
+
+Return ONLY valid JSON, no explanation.
+"""
+
+    @staticmethod
+    def _batch_item(item_id, entry):
+        return (
+            f"\n### ID: {item_id}\n"
+            f"MEDICATION NAME: {entry.get('name', '')}\n"
+            f"INDICATIONS: {entry.get('indications_and_usage', '')}\n"
+        )
+
+    def batch_limits(self):
+        """
+        (prompt tokens, max_tokens) caps of one batched request, derived from
+        the tokens-per-minute budget: prompt + answer stay within
+        BATCH_TPM_SHARE of it, so a request never goes over the per-minute
+        limit the API enforces.
+        """
+        budget = int(self.token_limiter.capacity * self.BATCH_TPM_SHARE)
+        output_cap = max(self.ITEM_OUTPUT_TOKENS, min(self.BATCH_OUTPUT_TOKENS, budget // 2))
+        prompt_cap = max(1, min(self.BATCH_PROMPT_TOKENS, budget - output_cap))
+        return prompt_cap, output_cap
+
+    def plan_batches(self, items, max_batch=16):
+        """
+        Groups (name, entry) pairs so that each batch fits the prompt token
+        budget and its expected answer fits the output cap (batch_limits()).
+        """
+        prompt_cap, output_cap = self.batch_limits()
+        max_items = max(1, min(max_batch, output_cap // self.ITEM_OUTPUT_TOKENS))
+        overhead = self.estimate_tokens(self.BATCH_HEADER + self.BATCH_FOOTER)
+
+        batches, current, tokens = [], [], overhead
+        for name, entry in items:
+            cost = self.estimate_tokens(self._batch_item("m00", entry))
+            if current and (len(current) >= max_items or tokens + cost > prompt_cap):
+                batches.append(current)
+                current, tokens = [], overhead
+            current.append((name, entry))
+            tokens += cost
+
+        if current:
+            batches.append(current)
+        return batches
+
+    def enrich_batch(self, items):
+        """
+        Enriches several (name, entry) pairs with one request.
+        Items whose sub-result is missing or invalid are split in halves and
+        retried; a single item falls back to the one-medication prompt.
+        Returns {name: enrichment or None}.
+        """
+        if len(items) == 1:
+            name, entry = items[0]
+            return {name: self.try_enrich_medicine(entry)}
+
+        ids = [f"m{i + 1}" for i in range(len(items))]
+        prompt = self.BATCH_HEADER + "".join(
+            self._batch_item(item_id, entry) for item_id, (_, entry) in zip(ids, items)
+        ) + self.BATCH_FOOTER
+        max_tokens = min(self.batch_limits()[1], self.ITEM_OUTPUT_TOKENS * len(items))
+
+        try:
+            parsed = self.ask(prompt, lambda content: extract_keyed_json(content, ids), max_tokens)
+        except Exception as e:
+            print(f"[WARNING] Batch of {len(items)} failed: {e}")
+            parsed = {}
+
+        results, failed = {}, []
+        for item_id, (name, entry) in zip(ids, items):
+            enriched = validate_enrichment(parsed.get(item_id))
+            if enriched is None:
+                failed.append((name, entry))
+            else:
+                results[name] = enriched
+
+        if failed:
+            print(f"[WARNING] {len(failed)}/{len(items)} invalid sub-results, retrying them.")
+            mid = (len(failed) + 1) // 2
+            for part in (failed[:mid], failed[mid:]):
+                if part:
+                    results.update(self.enrich_batch(part))
+
+        return results
+
+    def enrich_many(self, data, names, workers=1, batch_size=1, on_result=None):
+        """
+        Enriches `names` from `data`, one prompt per medication or packed in
+        batches. `on_result(name, enrichment or None)` is called from this
+        thread as each result arrives. Returns {name: enrichment}, with the
+        fallback for failures.
+        """
+        items = [(name, data[name]) for name in names]
+        if batch_size > 1:
+            batches = self.plan_batches(items, batch_size)
+            print(f"[Enricher] {len(items)} medications in {len(batches)} batched requests.")
+        else:
+            # Un lot d'un seul médicament passe par le prompt individuel
+            batches = [[item] for item in items]
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = [executor.submit(self.enrich_batch, batch) for batch in batches]
+            for future in as_completed(futures):
+                for name, enriched in future.result().items():
+                    results[name] = enriched
+                    if on_result is not None:
+                        on_result(name, enriched)
+
+        return {name: results.get(name) or dict(FALLBACK) for name in names}
+
+    # ----------------------------------------------------
+    # INCREMENTAL MODE
+    # ----------------------------------------------------
+    def run_incremental(self, workers=1, batch_size=1):
+        """
+        Re-enriches only the medications whose prompt fields changed or that
+        are new since the last enriched output; removed ones are dropped and
+        unchanged ones keep their enrichment (with refreshed raw fields).
+        """
+        self.rate_limited = True
+        print("[Enricher] Loading dataset...")
+        with open(self.input_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        previous = {}
+        if os.path.exists(self.output_path):
+            with open(self.output_path, "r", encoding="utf-8") as f:
+                previous = json.load(f)
+
+        added, changed, removed, unchanged = diff_datasets(data, previous)
+        print(f"[Enricher] {len(added)} added, {len(changed)} changed, "
+              f"{len(removed)} removed, {len(unchanged)} unchanged.")
+
+        fresh = self.enrich_many(data, added + changed, workers, batch_size)
+
+        enriched_data = {}
+        for name, entry in data.items():
+            if name in fresh:
+                enriched = fresh[name]
+            else:
+                enriched = {key: previous[name].get(key, value) for key, value in FALLBACK.items()}
+            enriched_data[name] = {**entry, **enriched}
+
+        self.save(enriched_data)
+        self.report_cache()
+        return enriched_data
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Enrich the raw OpenFDA dataset with an LLM.")
+    parser.add_argument("--input", default="data/raw/openfda_500.json")
+    parser.add_argument("--output", default="data/enriched/openfda_enriched_500.json")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Parallel LLM calls (0 = original sequential mode)")
+    parser.add_argument("--rpm", type=int, default=None,
+                        help="Requests per minute (default: 30 with --workers/--batch-size/--incremental, "
+                             "unlimited in sequential mode)")
+    parser.add_argument("--tpm", type=int, default=None,
+                        help="Tokens per minute (default: 6000 with --workers/--batch-size/--incremental, "
+                             "unlimited in sequential mode)")
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="Medications packed per LLM request (1 = one prompt per medication)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only enrich new or changed medications, reusing the existing output")
+    parser.add_argument("--base-url", default=None,
+                        help="Chat-completions server to use instead of Groq (e.g. the mock server)")
+    parser.add_argument("--cache", default="data/cache/llm_cache.sqlite",
+                        help="LLM response cache file")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the response cache")
+    parser.add_argument("--refresh-cache", action="store_true",
+                        help="Ignore cached answers but store the fresh ones")
+    parser.add_argument("--metrics-out", default=None,
+                        help="Record LLM call metrics and write them here (.json or Prometheus text)")
+    args = parser.parse_args()
+
+    if args.metrics_out:
+        metrics.enable()
+
+    cache = None if args.no_cache else LLMCache(args.cache, bypass=args.refresh_cache)
+
     enricher = DatasetEnricher(
-        input_path="data/raw/openfda_500.json",
-        output_path="data/enriched/openfda_enriched_500.json"
+        input_path=args.input,
+        output_path=args.output,
+        base_url=args.base_url,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        cache=cache
     )
-    enricher.run()
+    if args.incremental:
+        enricher.run_incremental(workers=max(1, args.workers), batch_size=args.batch_size)
+    elif args.workers > 0 or args.batch_size > 1:
+        # Batché ou non, le mode concurrent garde le checkpoint et la reprise
+        enricher.run_concurrent(workers=max(1, args.workers), checkpoint_path=args.checkpoint,
+                                batch_size=args.batch_size)
+    else:
+        enricher.run()
+
+    if args.metrics_out:
+        metrics.dump(args.metrics_out)
+        print(f"[Metrics] Saved to {args.metrics_out}")
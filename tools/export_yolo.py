@@ -0,0 +1,90 @@
+"""
+Exports the trained YOLO checkpoint to ONNX for the VisionAgent "onnx"
+backend, optionally with an INT8-quantized copy.
+
+Usage:
+    python -m tools.export_yolo
+    python -m tools.export_yolo --weights data/models/yolo_best.pt --int8 --calib-dir data/yolo/valid/images
+"""
+import argparse
+import os
+import shutil
+
+import cv2
+from ultralytics import YOLO
+
+from agents.onnx_detector import preprocess
+from agents.vision_agent import VisionAgent
+
+
+def export_onnx(weights, out_path, imgsz=640):
+    model = YOLO(weights)
+    # Batch dimension left dynamic so predict_batch can send whole batches
+    exported = model.export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True, opset=17)
+    if os.path.abspath(exported) != os.path.abspath(out_path):
+        shutil.move(exported, out_path)
+    print(f"[Export] ONNX model saved to {out_path}")
+    return out_path
+
+
+def quantize_int8(fp32_path, out_path, calib_dir, calib_images=100, imgsz=640):
+    """
+    Static INT8 quantization (QDQ, per-channel weights), calibrated on real
+    images so activation ranges match what the detector actually sees.
+    """
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    paths = VisionAgent.list_images(calib_dir)[:calib_images]
+    if not paths:
+        raise FileNotFoundError(f"[Export] No calibration images in {calib_dir}")
+
+    class ImageReader(CalibrationDataReader):
+        def __init__(self, input_name):
+            self.input_name = input_name
+            self.paths = iter(paths)
+
+        def get_next(self):
+            for path in self.paths:
+                image = cv2.imread(path)
+                if image is not None:
+                    return {self.input_name: preprocess(image, imgsz)[0]}
+            return None
+
+    import onnxruntime as ort
+    input_name = ort.InferenceSession(fp32_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    print(f"[Export] Calibrating INT8 model on {len(paths)} images...")
+    quantize_static(
+        fp32_path, out_path, ImageReader(input_name),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+    )
+    print(f"[Export] INT8 model saved to {out_path}")
+    return out_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the YOLO detector to ONNX.")
+    parser.add_argument("--weights", default="data/models/yolo_best.pt")
+    parser.add_argument("--out", default=None, help="ONNX path (default: next to the weights)")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--int8", action="store_true", help="Also write an INT8-quantized model")
+    parser.add_argument("--calib-dir", default="data/yolo/valid/images")
+    parser.add_argument("--calib-images", type=int, default=100)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.weights):
+        raise FileNotFoundError(f"Modèle introuvable : {args.weights}")
+
+    out_path = args.out or os.path.splitext(args.weights)[0] + ".onnx"
+    export_onnx(args.weights, out_path, args.imgsz)
+
+    if args.int8:
+        int8_path = os.path.splitext(out_path)[0] + ".int8.onnx"
+        quantize_int8(out_path, int8_path, args.calib_dir, args.calib_images, args.imgsz)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Local stand-in for https://api.fda.gov/drug/label.json, used to exercise
+ScrapingAgent without touching the real API.
+
+Usage:
+    python -m tools.fake_openfda_server --port 8765 --total 1000 --fail-rate 0.1
+
+    agent = ScrapingAgent(base_url="http://127.0.0.1:8765/drug/label.json")
+    agent.fetch_concurrent(target_total=500)
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def make_label(i):
+    label = {
+        "openfda": {
+            "brand_name": [f"Brand {i}"],
+            "generic_name": [f"GENERIC {i % 50}"],
+            "substance_name": [f"SUBSTANCE {i % 30}"],
+        },
+        "purpose": [f"Purpose {i % 7}: pain reliever fever reducer"],
+        "indications_and_usage": [f"temporarily relieves minor aches and pains ({i})"],
+        "warnings": ["Do not use with other drugs containing acetaminophen."],
+        "dosage_and_administration": ["adults: take 2 tablets every 6 hours"],
+    }
+    # Some labels have no brand name, like the real API
+    if i % 13 == 0:
+        del label["openfda"]["brand_name"]
+    return label
+
+
+class FakeOpenFDA:
+    def __init__(self, total=1000, fail_rate=0.0, rate_limit=None, latency=0.0):
+        self.total = total
+        self.fail_rate = fail_rate
+        self.rate_limit = rate_limit      # max requests per second, None = unlimited
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._window = []
+
+    def _over_limit(self):
+        if self.rate_limit is None:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            self._window = [t for t in self._window if now - t < 1.0]
+            if len(self._window) >= self.rate_limit:
+                return True
+            self._window.append(now)
+        return False
+
+    def handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload, headers=None):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+
+                if server.latency:
+                    time.sleep(server.latency)
+                if server._over_limit():
+                    return self._send(429, {"error": "rate limited"}, {"Retry-After": "1"})
+                if random.random() < server.fail_rate:
+                    return self._send(500, {"error": "injected failure"})
+
+                params = parse_qs(urlparse(self.path).query)
+                limit = int(params.get("limit", ["100"])[0])
+                skip = int(params.get("skip", ["0"])[0])
+
+                if skip >= server.total:
+                    return self._send(404, {"error": {"code": "NOT_FOUND"}})
+
+                results = [make_label(i) for i in range(skip, min(skip + limit, server.total))]
+                self._send(200, {"meta": {"results": {"skip": skip, "limit": limit,
+                                                      "total": server.total}},
+                                 "results": results})
+
+        return Handler
+
+    def serve(self, host="127.0.0.1", port=0):
+        """
+        Starts the server in a daemon thread and returns (httpd, base_url).
+        """
+        httpd = ThreadingHTTPServer((host, port), self.handler())
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        base_url = f"http://{host}:{httpd.server_address[1]}/drug/label.json"
+        return httpd, base_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenFDA label endpoint.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--total", type=int, default=1000)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=None)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    fake = FakeOpenFDA(args.total, args.fail_rate, args.rate_limit, args.latency)
+    httpd = ThreadingHTTPServer(("127.0.0.1", args.port), fake.handler())
+    print(f"[FakeOpenFDA] Serving {args.total} labels on "
+          f"http://127.0.0.1:{args.port}/drug/label.json")
+    httpd.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+Ingests OpenFDA bulk label exports (downloaded zip files) into a chunked
+JSONL store, with memory use independent of the corpus size.
+
+Download the files listed under "drug/label" at
+https://open.fda.gov/data/downloads/ first, then:
+
+    python -m tools.ingest_bulk downloads/drug-label-*.json.zip --out data/raw/bulk
+"""
+import argparse
+import resource
+import time
+
+from agents.bulk_ingest import ingest_bulk
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream OpenFDA bulk label files into a chunked store.")
+    parser.add_argument("zips", nargs="+", help="drug-label-*.json.zip files")
+    parser.add_argument("--out", default="data/raw/bulk")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    total = ingest_bulk(args.zips, args.out, args.chunk_size)
+    elapsed = time.perf_counter() - start
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"[Bulk] {total} records in {elapsed:.1f}s, peak RSS {peak_mb:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
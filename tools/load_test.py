@@ -0,0 +1,136 @@
+"""
+Concurrent load generator for server.py. Reports throughput, error
+counts and latency percentiles.
+
+Usage:
+    python -m tools.load_test --concurrency 32 --requests 5000
+    python -m tools.load_test --endpoint vision --image DJ.jpg --concurrency 8 --requests 200
+"""
+import argparse
+import base64
+import json
+import random
+import threading
+import time
+
+import requests
+
+from agents.dataset_store import load_dataset
+from agents.registry import DEFAULT_DATASET
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(p / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def sample_queries(dataset_path, count, seed=0):
+    """
+    Realistic symptom queries: random picks from the dataset's own symptoms.
+    """
+    data, _ = load_dataset(dataset_path)
+    symptoms = []
+    for name in data:
+        values = data[name].get("symptoms", [])
+        if isinstance(values, str):
+            values = [values]
+        symptoms.extend(v for v in values if isinstance(v, str) and v.strip())
+    if not symptoms:
+        symptoms = ["headache fever", "cough", "allergy"]
+
+    rng = random.Random(seed)
+    return [" ".join(rng.sample(symptoms, min(2, len(symptoms)))) for _ in range(count)]
+
+
+def run(url, payloads, concurrency):
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    cursor = iter(payloads)
+
+    def worker():
+        session = requests.Session()
+        while True:
+            with lock:
+                payload = next(cursor, None)
+            if payload is None:
+                return
+            start = time.perf_counter()
+            try:
+                status = session.post(url, json=payload, timeout=60).status_code
+            except requests.RequestException:
+                status = "error"
+            elapsed = time.perf_counter() - start
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    latencies.append(elapsed)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, sorted(latencies), statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for server.py")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--endpoint", default="recommend", choices=("recommend", "vision"))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--dataset", default=DEFAULT_DATASET, help="Source of the symptom queries")
+    parser.add_argument("--image", default=None, help="Image uploaded to /vision")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    if args.endpoint == "vision":
+        if not args.image:
+            parser.error("--image is required for the vision endpoint")
+        with open(args.image, "rb") as f:
+            payloads = [{"image_base64": base64.b64encode(f.read()).decode("ascii")}] * args.requests
+    else:
+        payloads = [{"symptoms": q, "top_k": args.top_k} for q in sample_queries(args.dataset, args.requests)]
+
+    url = f"{args.url.rstrip('/')}/{args.endpoint}"
+    print(f"[Load] {args.requests} requests to {url} with {args.concurrency} clients...")
+    elapsed, latencies, statuses = run(url, payloads, args.concurrency)
+
+    report = {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "statuses": {str(k): v for k, v in statuses.items()},
+        "latency_ms": {
+            f"p{p}": round(percentile(latencies, p) * 1000, 2) for p in (50, 90, 95, 99)
+        },
+    }
+    if latencies:
+        report["latency_ms"]["max"] = round(latencies[-1] * 1000, 2)
+
+    try:
+        report["server"] = requests.get(f"{args.url.rstrip('/')}/stats", timeout=5).json()
+    except (requests.RequestException, ValueError):
+        pass
+
+    if args.json:
+        print(json.dumps(report, indent=4))
+        return
+
+    lat = report["latency_ms"]
+    print(f"[Load] {report['throughput_rps']} req/s over {report['elapsed_s']}s, statuses {report['statuses']}")
+    print(f"[Load] latency p50 {lat['p50']} ms, p90 {lat['p90']} ms, p95 {lat['p95']} ms, p99 {lat['p99']} ms")
+    if "server" in report:
+        batches = report["server"].get(args.endpoint if args.endpoint == "vision" else "recommend", {})
+        print(f"[Load] server: {batches.get('batches')} batches, mean size {batches.get('mean_batch', 0):.1f}, "
+              f"{batches.get('rejected')} rejected")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Local stand-in for the Groq chat-completions endpoint, used to exercise
+the enricher without API keys or quota.
+
+It answers every prompt with a small, valid enrichment JSON derived from
+the MEDICATION NAME line of the prompt.
+
+Usage:
+    python -m tools.mock_llm_server --port 8766 --latency 0.2 --fail-rate 0.05
+    python -m tools.enrich_dataset --base-url http://127.0.0.1:8766 --workers 8 --rpm 6000 --tpm 1000000
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_enrichment(name):
+    words = [w.lower() for w in re.findall(r"[A-Za-z]+", name)] or ["drug"]
+    return {
+        "symptoms": ["pain", "fever"],
+        "category": "pain relief",
+        "tags": words[:5] + ["otc"],
+        "clean_indications": f"{name} temporarily relieves minor pain and fever."
+    }
+
+
+def answer(prompt):
+    batch = re.findall(r"### ID: (\S+)\nMEDICATION NAME: (.*)", prompt)
+    if batch:
+        # Several medications in one prompt: one keyed object per id
+        return json.dumps({item_id: fake_enrichment(name) for item_id, name in batch})
+
+    names = re.findall(r"MEDICATION NAME: (.*)", prompt)
+    return json.dumps(fake_enrichment(names[0] if names else "unknown"))
+
+
+class MockLLM:
+    def __init__(self, latency=0.0, fail_rate=0.0, garbage_rate=0.0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.garbage_rate = garbage_rate
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                with server._lock:
+                    server.calls += 1
+
+                if server.latency:
+                    time.sleep(server.latency)
+                if random.random() < server.fail_rate:
+                    return self._send(503, {"error": {"message": "injected failure"}})
+
+                prompt = request["messages"][-1]["content"]
+                content = answer(prompt)
+                if random.random() < server.garbage_rate:
+                    content = content[: len(content) // 2]
+
+                prompt_tokens = len(prompt) // 4
+                completion_tokens = len(content) // 4
+                self._send(200, {
+                    "id": f"mock-{server.calls}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "mock"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop"
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens
+                    }
+                })
+
+        return Handler
+
+    def serve(self, host="127.0.0.1", port=0):
+        """
+        Starts the server in a daemon thread and returns (httpd, base_url).
+        """
+        httpd = ThreadingHTTPServer((host, port), self.handler())
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        return httpd, f"http://{host}:{httpd.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock chat-completions server.")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--garbage-rate", type=float, default=0.0,
+                        help="Fraction of answers truncated into invalid JSON")
+    args = parser.parse_args()
+
+    mock = MockLLM(args.latency, args.fail_rate, args.garbage_rate)
+    httpd = ThreadingHTTPServer(("127.0.0.1", args.port), mock.handler())
+    print(f"[MockLLM] Serving on http://127.0.0.1:{args.port}/openai/v1/chat/completions")
+    httpd.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
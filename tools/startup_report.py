@@ -0,0 +1,131 @@
+"""
+Startup-time report: how long each entry path takes to get going, and
+which imports that time goes to.
+
+Every scenario runs in a fresh interpreter with `python -X importtime`;
+import times are grouped by top-level package (self time, so nothing is
+counted twice). The first run of each scenario is a warm-up (page cache,
+.pyc files, TF-IDF snapshot) and is not counted.
+
+Usage:
+    python -m tools.startup_report
+    python -m tools.startup_report --scenarios cli_menu,symptom_flow --repeat 5 --out startup.json
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+DATASET = "data/enriched/openfda_enriched_500.json"
+
+SCENARIOS = {
+    # Interpreter alone: subtracted mentally from everything else
+    "python": "pass",
+    # Time to the CLI menu / the GUI window
+    "cli_menu": "import main",
+    "gui_window": "import gui_app",
+    # What choosing each path adds
+    "symptom_flow": (
+        "from agents.registry import get_registry; "
+        f"get_registry().recommendation({DATASET!r}).recommend('headache fever')"
+    ),
+    "vision_flow": "import agents.vision_agent",
+}
+
+
+def parse_importtime(stderr):
+    """
+    -X importtime lines -> {module: (self_us, cumulative_us, depth)}.
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return modules
+
+
+def run_once(code):
+    start = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - start
+    if out.returncode != 0:
+        lines = [l for l in out.stderr.splitlines() if not l.startswith("import time:")]
+        raise RuntimeError("[Startup] Scenario failed:\n" + "\n".join(lines[-20:]))
+    return wall, parse_importtime(out.stderr)
+
+
+def measure(code, repeat):
+    run_once(code)      # warm-up
+
+    walls, imports_ms, by_package = [], [], defaultdict(list)
+    for _ in range(repeat):
+        wall, modules = run_once(code)
+        walls.append(wall * 1000)
+        imports_ms.append(sum(self_us for self_us, _, _ in modules.values()) / 1000)
+
+        packages = defaultdict(int)
+        for name, (self_us, _, _) in modules.items():
+            packages[name.split(".")[0]] += self_us
+        for package, self_us in packages.items():
+            by_package[package].append(self_us / 1000)
+
+    packages = {p: statistics.median(times) for p, times in by_package.items()}
+    return {
+        "wall_ms": statistics.median(walls),
+        "imports_ms": statistics.median(imports_ms),
+        "modules": len(modules),
+        "packages_ms": dict(sorted(packages.items(), key=lambda item: -item[1])),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time breakdown of the entry paths.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario (median is reported)")
+    parser.add_argument("--top", type=int, default=8, help="Packages listed per scenario")
+    parser.add_argument("--out", default=None, help="Write the report to this JSON file")
+    args = parser.parse_args()
+
+    report = {}
+    for name in [s for s in args.scenarios.split(",") if s]:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario: {name}")
+        print(f"[Startup] {name}...")
+        try:
+            report[name] = measure(SCENARIOS[name], args.repeat)
+        except RuntimeError as e:
+            # Ex. : tkinter ou cv2 absent sur cette machine
+            print(e)
+            report[name] = {"error": str(e).splitlines()[-1]}
+
+    print()
+    for name, result in report.items():
+        if "error" in result:
+            print(f"{name:14s} failed: {result['error']}")
+            continue
+        print(f"{name:14s} {result['wall_ms']:8.0f} ms wall, {result['imports_ms']:7.0f} ms in "
+              f"{result['modules']} imports")
+        for package, ms in list(result["packages_ms"].items())[:args.top]:
+            print(f"    {package:28s} {ms:8.1f} ms")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+        print(f"\n[Startup] Report saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Generates synthetic enriched datasets in the same schema as
+data/enriched/openfda_enriched_500.json, at any size, for benchmarks.
+
+Usage:
+    python -m tools.synthetic_dataset 50000 --out data/bench/synthetic_50000.json
+"""
+import argparse
+import json
+import os
+import random
+
+CATEGORIES = {
+    "pain relief": ["headache", "fever", "muscle pain", "back pain", "toothache", "menstrual cramps", "arthritis"],
+    "cold & flu": ["cough", "nasal congestion", "sore throat", "runny nose", "sneezing", "chills", "fever"],
+    "allergy": ["sneezing", "itchy eyes", "runny nose", "hives", "watery eyes", "hay fever"],
+    "skin care": ["acne", "eczema", "dry skin", "rash", "sunburn", "itching", "psoriasis", "blemishes"],
+    "stomach": ["heartburn", "indigestion", "nausea", "diarrhea", "constipation", "bloating", "gas"],
+    "antibacterial": ["minor cuts", "scrapes", "burns", "skin infection", "germs on hands"],
+    "eye care": ["red eyes", "dry eyes", "eye irritation", "itchy eyes"],
+    "oral care": ["cavities", "gingivitis", "plaque", "sensitive teeth", "bad breath"],
+    "sleep aid": ["insomnia", "sleeplessness", "difficulty falling asleep"],
+    "smoking cessation": ["nicotine withdrawal", "cigarette cravings"],
+}
+
+SUBSTANCES = [
+    "ACETAMINOPHEN", "IBUPROFEN", "NAPROXEN SODIUM", "ASPIRIN", "DEXTROMETHORPHAN HYDROBROMIDE",
+    "GUAIFENESIN", "PHENYLEPHRINE HYDROCHLORIDE", "LORATADINE", "CETIRIZINE HYDROCHLORIDE",
+    "DIPHENHYDRAMINE HYDROCHLORIDE", "SALICYLIC ACID", "BENZOYL PEROXIDE", "HYDROCORTISONE",
+    "ZINC OXIDE", "CALCIUM CARBONATE", "FAMOTIDINE", "LOPERAMIDE HYDROCHLORIDE", "BISMUTH SUBSALICYLATE",
+    "BENZALKONIUM CHLORIDE", "ETHYL ALCOHOL", "TETRAHYDROZOLINE HYDROCHLORIDE", "SODIUM FLUORIDE",
+    "DOXYLAMINE SUCCINATE", "NICOTINE POLACRILEX", "TITANIUM DIOXIDE", "OCTINOXATE",
+]
+
+SYLLABLES = ["ra", "to", "mex", "ol", "in", "ab", "zep", "pro", "fen", "cil", "dol", "vir",
+             "sta", "tin", "lor", "pam", "ex", "al", "qui", "nor", "dex", "cor", "lyn", "vo"]
+
+FILLER = ("temporarily relieves minor symptoms do not use if you have ever had an allergic reaction "
+          "ask a doctor before use stop use and ask a doctor if symptoms persist keep out of reach "
+          "of children adults and children 12 years and over take tablets every hours with water "
+          "do not exceed doses in 24 hours store at room temperature").split()
+
+
+def _brand(rng):
+    word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+    suffix = rng.choice(["", "", " Extra Strength", " PM", " Plus", " Max", " Kids", " Gel"])
+    return word + suffix
+
+
+def _text(rng, n_words, rare_vocab):
+    # Mostly common label wording, plus rare terms with log-uniform ranks
+    # (frequency ~ 1/rank) so the vocabulary grows with the dataset like
+    # real labels do
+    words = []
+    for _ in range(n_words):
+        if rng.random() < 0.15:
+            rank = int(rare_vocab ** rng.random())
+            words.append(f"term{rank}")
+        else:
+            words.append(rng.choice(FILLER))
+    return " ".join(words)
+
+
+def make_entry(rng, name, rare_vocab):
+    category = rng.choice(list(CATEGORIES))
+    symptoms = rng.sample(CATEGORIES[category], rng.randint(1, min(3, len(CATEGORIES[category]))))
+    substance = ", ".join(rng.sample(SUBSTANCES, rng.choice([1, 1, 1, 2, 3])))
+    generic = substance.split(",")[0]
+    tags = symptoms + category.split() + rng.sample(["medication", "otc", "relief", "treatment", "remedy"], 2)
+    tags += _text(rng, 2, rare_vocab).split()
+
+    return {
+        "name": name,
+        "generic_name": generic,
+        "substance_name": substance,
+        "purpose": f"Purpose {category} {' '.join(symptoms)}",
+        "indications_and_usage": f"Uses temporarily relieves {', '.join(symptoms)} " + _text(rng, 20, rare_vocab),
+        "warnings": "Warnings " + _text(rng, 60, rare_vocab),
+        "adverse_reactions": _text(rng, 15, rare_vocab) if rng.random() < 0.3 else "",
+        "dosage_and_administration": "Directions " + _text(rng, 30, rare_vocab),
+        "symptoms": symptoms,
+        "category": category,
+        "tags": tags,
+        "clean_indications": f"Used to relieve {' and '.join(symptoms)}. " + _text(rng, 8, rare_vocab),
+    }
+
+
+def make_dataset(size, seed=0):
+    """
+    {name: entry} with `size` unique brand names, deterministic for a seed.
+    """
+    rng = random.Random(seed)
+    rare_vocab = max(1000, size * 2)
+    data = {}
+    while len(data) < size:
+        name = _brand(rng)
+        if name in data:
+            name = f"{name} {len(data)}"
+        data[name] = make_entry(rng, name, rare_vocab)
+    return data
+
+
+def make_queries(count, seed=1):
+    """
+    Symptom queries in the style users type them.
+    """
+    rng = random.Random(seed)
+    symptoms = sorted({s for values in CATEGORIES.values() for s in values})
+    return [" ".join(rng.sample(symptoms, rng.randint(1, 3))) for _ in range(count)]
+
+
+def write_dataset(size, out_path, seed=0):
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    data = make_dataset(size, seed)
+    tmp = out_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, out_path)
+    return out_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic enriched dataset.")
+    parser.add_argument("size", type=int)
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    out = args.out or f"data/bench/synthetic_{args.size}.json"
+    write_dataset(args.size, out, args.seed)
+    print(f"[Synthetic] {args.size} medications -> {out} ({os.path.getsize(out) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()